@@ -1,20 +1,28 @@
 from dotenv import load_dotenv
 import os
+import socket
 
 load_dotenv()
 
 class Config:
     AUTO_RIA_START_URL = os.getenv("AUTO_RIA_START_URL")
+    CRAWL_PLAN_FILE = os.getenv("CRAWL_PLAN_FILE")  # TOML план обхода с несколькими стартовыми URL (вместо AUTO_RIA_START_URL)
+    PLAN_MAX_CONCURRENT_SEEDS = int(os.getenv("PLAN_MAX_CONCURRENT_SEEDS", 0))  # Сколько seed'ов плана обходить одновременно (0 - все)
     
     PG_HOST = os.getenv("PG_HOST")
     PG_DBNAME = os.getenv("PG_DBNAME")
     PG_USER = os.getenv("PG_USER")
     PG_PASSWORD = os.getenv("PG_PASSWORD")
     PG_PORT = int(os.getenv("PG_PORT", 5432)) # Convert to int, default 5432
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))  # Максимум соединений в пуле asyncpg
+    LAST_SEEN_REFRESH_HOURS = int(os.getenv("LAST_SEEN_REFRESH_HOURS", 24))  # Как часто обновлять last_seen у неизмененных объявлений
+    SNAPSHOTS_ENABLED = os.getenv("SNAPSHOTS_ENABLED", "true").lower() == "true"  # Писать историю цены/пробега/телефона в auto_ria_ad_snapshots
 
-    SCRAPE_TIME = os.getenv("SCRAPE_TIME") # e.g., "01:00"
+    SCRAPE_TIME = os.getenv("SCRAPE_TIME") # e.g., "01:00" or "every 15m"
     DUMP_TIME = os.getenv("DUMP_TIME")     # e.g., "03:00"
     AUTO_SCRAPE_TIME = os.getenv("AUTO_SCRAPE_TIME") # e.g., "30" for 30 seconds, "60" for 1 minute
+    EXIT_AFTER_DUMP = os.getenv("EXIT_AFTER_DUMP", "false").lower() == "true"  # Завершать процесс после дампа (перезапуск через restart policy)
+    SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", 20))  # Сколько секунд дообрабатывать загруженные страницы при остановке
 
     # Новые параметры производительности
     SEMAPHORE_LIMIT = int(os.getenv("SEMAPHORE_LIMIT", 2))  # Максимум одновременных запросов
@@ -27,6 +35,88 @@ class Config:
     CONNECTION_LIMIT_PER_HOST = int(os.getenv("CONNECTION_LIMIT_PER_HOST", 20))  # Лимит на хост
     CONNECTION_TIMEOUT = int(os.getenv("CONNECTION_TIMEOUT", 30))  # Общий таймаут
     CONNECT_TIMEOUT = int(os.getenv("CONNECT_TIMEOUT", 10))  # Таймаут подключения
+    HTTP_TRANSPORT = os.getenv("HTTP_TRANSPORT", "aiohttp").lower()  # "aiohttp" или "httpx" (HTTP/2, нужен httpx[http2])
+    DNS_CACHE_TTL = int(os.getenv("DNS_CACHE_TTL", 300))  # Время жизни кэша DNS в секундах
+    DNS_RESOLVER = os.getenv("DNS_RESOLVER", "async").lower()  # "async" - aiodns (если установлен), "threaded" - системный
+    CONNECTION_WARMUP = int(os.getenv("CONNECTION_WARMUP", 4))  # Соединений на сессию, открываемых до начала обхода (0 - без прогрева)
+    CONNECTION_WARMUP_URLS = [url.strip() for url in os.getenv("CONNECTION_WARMUP_URLS", "https://auto.ria.com/robots.txt").split(',') if url.strip()]  # Легкие URL хостов сайта и API телефонов
+    KEEPALIVE_TIMEOUT = float(os.getenv("KEEPALIVE_TIMEOUT", 30))  # Сколько держать простаивающее соединение открытым
+    RATE_LIMIT = float(os.getenv("RATE_LIMIT", 0))  # Общий лимит запросов в секунду на запуск (0 - без ограничения)
+    RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", 5))  # Сколько запросов можно сделать подряд без паузы
+
+    # Пул HTTP сессий (у каждой свои cookies и соединения; CONNECTION_LIMIT действует на сессию)
+    SESSION_POOL_SIZE = int(os.getenv("SESSION_POOL_SIZE", 3))  # Число сессий в пуле
+    SESSION_WARMUP_URL = os.getenv("SESSION_WARMUP_URL", "https://auto.ria.com/uk/")  # Страница прогрева (пусто - без прогрева)
+    SESSION_RETIRE_AFTER = int(os.getenv("SESSION_RETIRE_AFTER", 3))  # Ответов 403/429 подряд до замены сессии
+
+    # Режим демона (--daemon): частый опрос первых страниц листинга в дополнение к расписанию
+    DAEMON_ENABLED = os.getenv("DAEMON_ENABLED", "false").lower() == "true"  # То же, что флаг --daemon
+    DAEMON_URL = os.getenv("DAEMON_URL") or os.getenv("AUTO_RIA_START_URL")  # Листинг с сортировкой по новизне
+    DAEMON_PAGES = int(os.getenv("DAEMON_PAGES", 2))  # Сколько первых страниц опрашивать
+    DAEMON_MIN_INTERVAL = float(os.getenv("DAEMON_MIN_INTERVAL", 30))  # Минимальный интервал опроса в секундах
+    DAEMON_MAX_INTERVAL = float(os.getenv("DAEMON_MAX_INTERVAL", 300))  # Максимальный интервал, когда новых объявлений нет
+    DAEMON_LEDGER_INTERVAL = float(os.getenv("DAEMON_LEDGER_INTERVAL", 3600))  # Как часто писать итоги демона в журнал запусков, в секундах
+
+    # Автоподбор параметров (--tune): короткие пробные обходы без записи в БД
+    TUNE_URL = os.getenv("TUNE_URL") or os.getenv("AUTO_RIA_START_URL")  # Листинг для проб (можно локальный тестовый сервер)
+    TUNE_PAGES = int(os.getenv("TUNE_PAGES", 1))  # Страниц листинга на одну пробу
+    TUNE_MAX_PROBES = int(os.getenv("TUNE_MAX_PROBES", 12))  # Максимум проб за запуск
+    TUNE_MAX_ERROR_RATE = float(os.getenv("TUNE_MAX_ERROR_RATE", 0.05))  # Допустимая доля ошибок (403/429/5xx, неудачные объявления)
+    TUNE_ENV_FILE = os.getenv("TUNE_ENV_FILE", ".env")  # Куда записать лучшие параметры
+
+    # Распределенный обход (режим --worker): листинг делится на шарды в таблице auto_ria_shards
+    WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"  # Имя воркера в очереди шардов
+    # Профиль sharded в docker-compose (COMPOSE_PROFILES=sharded): основной процесс не обходит AUTO_RIA_START_URL
+    SHARDED_SWEEP = 'sharded' in os.getenv("COMPOSE_PROFILES", "").split(',')
+    SHARD_SWEEP_ID = os.getenv("SHARD_SWEEP_ID")  # Идентификатор обхода, по умолчанию - текущая дата
+    SHARD_TOTAL_PAGES = int(os.getenv("SHARD_TOTAL_PAGES", 500))  # Сколько страниц листинга делить на шарды
+    SHARD_PAGES = int(os.getenv("SHARD_PAGES", 10))  # Страниц в одном шарде
+    SHARD_HEARTBEAT_INTERVAL = float(os.getenv("SHARD_HEARTBEAT_INTERVAL", 30))  # Период heartbeat в секундах
+    SHARD_HEARTBEAT_TIMEOUT = float(os.getenv("SHARD_HEARTBEAT_TIMEOUT", 180))  # Через сколько секунд без heartbeat шард забирает другой воркер
+
+    # Состояние обхода (frontier) и точки продолжения после падения
+    FRONTIER_ENABLED = os.getenv("FRONTIER_ENABLED", "true").lower() == "true"  # Хранить frontier и checkpoint в PostgreSQL
+    FRONTIER_MAX_ATTEMPTS = int(os.getenv("FRONTIER_MAX_ATTEMPTS", 3))  # Сколько раз пытаться обработать упавшее объявление
+    FRONTIER_RETRY_LIMIT = int(os.getenv("FRONTIER_RETRY_LIMIT", 500))  # Максимум URL в повторном проходе за запуск
+    CHECKPOINT_MAX_AGE_HOURS = int(os.getenv("CHECKPOINT_MAX_AGE_HOURS", 24))  # Более старый checkpoint игнорируется, обход начинается заново
+
+    # Пропуск известных объявлений: "full" - вся таблица в память при старте, "lazy" - запрос по каждой странице листинга
+    DEDUPE_MODE = os.getenv("DEDUPE_MODE", "full").lower()  # lazy - первый запрос без ожидания загрузки всех URL (удобно для небольших запусков)
+    DEDUPE_CACHE_SIZE = int(os.getenv("DEDUPE_CACHE_SIZE", 20000))  # Ответов "есть/нет в БД" в LRU режима lazy
+
+    # Обновление известных объявлений (цена, снятие с продажи)
+    REFRESH_ENABLED = os.getenv("REFRESH_ENABLED", "false").lower() == "true"  # Перепроверять известные объявления вместе с обходом
+    REFRESH_DAILY_BUDGET = int(os.getenv("REFRESH_DAILY_BUDGET", 500))  # Максимум проверок известных объявлений в сутки
+    REFRESH_MIN_AGE_HOURS = int(os.getenv("REFRESH_MIN_AGE_HOURS", 24))  # Не проверять объявление чаще раза в N часов
+    REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", 2))  # Одновременных запросов обновления
+    REFRESH_RECENCY_WEIGHT = float(os.getenv("REFRESH_RECENCY_WEIGHT", 7.0))  # Приоритет свежих объявлений (цена чаще меняется в первые дни)
+    REFRESH_PRICE_BAND = os.getenv("REFRESH_PRICE_BAND", "5000-30000")  # Ходовой ценовой диапазон USD
+    REFRESH_BAND_WEIGHT = float(os.getenv("REFRESH_BAND_WEIGHT", 2.0))  # Множитель приоритета для ходового диапазона
+
+    # Кэш телефонов (API /users/phones - самый ограничиваемый запрос)
+    PHONE_CACHE_ENABLED = os.getenv("PHONE_CACHE_ENABLED", "true").lower() == "true"  # Использовать кэш телефонов по объявлению и продавцу
+    PHONE_CACHE_FILE = os.getenv("PHONE_CACHE_FILE", "dumps/phone_cache.json")  # Файл для сохранения кэша между запусками
+    PHONE_CACHE_TTL_HOURS = float(os.getenv("PHONE_CACHE_TTL_HOURS", 168))  # Время жизни записи кэша в часах
+    PHONE_CACHE_MAX_ENTRIES = int(os.getenv("PHONE_CACHE_MAX_ENTRIES", 50000))  # Максимум записей (старые вытесняются)
+
+    # Отложенное получение телефонов: "inline" - при разборе объявления, "deferred" - отдельным этапом
+    PHONE_ENRICHMENT = os.getenv("PHONE_ENRICHMENT", "inline").lower()
+    PHONE_RATE_LIMIT = float(os.getenv("PHONE_RATE_LIMIT", 0.5))  # Запросов к API телефонов в секунду
+    PHONE_RATE_BURST = int(os.getenv("PHONE_RATE_BURST", 2))  # Запросов подряд без ожидания
+    PHONE_WORKERS = int(os.getenv("PHONE_WORKERS", 2))  # Одновременных запросов телефонов
+    PHONE_ENRICH_BATCH = int(os.getenv("PHONE_ENRICH_BATCH", 50))  # Объявлений за одну выборку из очереди
+    PHONE_MAX_ATTEMPTS = int(os.getenv("PHONE_MAX_ATTEMPTS", 3))  # Попыток на объявление
+    PHONE_ENRICH_POLL = float(os.getenv("PHONE_ENRICH_POLL", 5))  # Пауза при пустой очереди, в секундах
+
+    # Логирование: JSON строки через очередь и фоновый поток, частые события сэмплируются
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # "json" - одна JSON строка на запись, "text" - только сообщение
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()  # DEBUG включает события по каждому объявлению
+    LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")  # Доли событий, например "ad_processed=0.05,phone_cache_hit=0.1"
+
+    # Параметры парсинга
+    PARSE_MODE = os.getenv("PARSE_MODE", "partial").lower()  # "partial" - только нужные контейнеры, "full" - полное дерево
+    STREAM_EARLY_CUTOFF = os.getenv("STREAM_EARLY_CUTOFF", "true").lower() == "true"  # Прекращать чтение листинга/токенов телефона после нужных маркеров
+    STREAM_DRAIN_LIMIT = int(os.getenv("STREAM_DRAIN_LIMIT", 131072))  # Байт остатка тела, дочитываемых после маркера ради keep-alive (0 - сразу закрывать соединение)
 
     COMMON_HEADERS = {
         'User-Agent': 'Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build=MRA58N) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Mobile Safari/537.36',
@@ -0,0 +1,93 @@
+import re
+import tomllib
+from dataclasses import dataclass
+from typing import Optional
+
+from scraper.config import Config
+
+
+@dataclass
+class CrawlSeed:
+    """Стартовый URL плана обхода со своими ограничениями"""
+    name: str
+    url: str
+    priority: int = 0
+    rate: Optional[float] = None  # Запросов в секунду для этого seed (None - без ограничения)
+    burst: int = 1
+    concurrency: Optional[int] = None  # Одновременных запросов (None - SEMAPHORE_LIMIT)
+    max_pages: Optional[int] = None
+    schedule: Optional[str] = None  # Время запуска HH:MM или интервал "every 15m" (None - SCRAPE_TIME)
+
+
+SEED_FIELDS = set(CrawlSeed.__dataclass_fields__)
+
+
+INTERVAL_SCHEDULE_RE = re.compile(r'^every\s+(\d+)\s*([mh])$', re.IGNORECASE)
+
+
+def parse_schedule(value):
+    """Расписание -> (триггер APScheduler, параметры).
+
+    "HH:MM" - ежедневно в это время, "every 15m" / "every 2h" - с интервалом.
+    """
+    match = INTERVAL_SCHEDULE_RE.match(str(value).strip())
+    if match:
+        amount = int(match.group(1))
+        if amount <= 0:
+            raise ValueError(f"Invalid schedule '{value}': interval must be positive")
+        unit = 'minutes' if match.group(2).lower() == 'm' else 'hours'
+        return 'interval', {unit: amount}
+    try:
+        hour, minute = map(int, str(value).split(':'))
+    except ValueError:
+        raise ValueError(f"Invalid schedule '{value}', expected HH:MM or 'every <N>m|h'")
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Invalid schedule '{value}', expected HH:MM or 'every <N>m|h'")
+    return 'cron', {'hour': hour, 'minute': minute}
+
+
+def parse_crawl_plan(plan):
+    """Список seed'ов из разобранного TOML (таблицы [[seed]]), по убыванию приоритета"""
+    seeds = []
+    for index, entry in enumerate(plan.get('seed', []), start=1):
+        name = entry.get('name') or f"seed-{index}"
+        unknown = set(entry) - SEED_FIELDS
+        if unknown:
+            raise ValueError(f"Seed '{name}': unknown keys {sorted(unknown)}")
+        if not entry.get('url'):
+            raise ValueError(f"Seed '{name}': 'url' is required")
+        if entry.get('schedule') is not None:
+            try:
+                parse_schedule(entry['schedule'])
+            except ValueError as e:
+                raise ValueError(f"Seed '{name}': {e}")
+        seeds.append(CrawlSeed(**{**entry, 'name': name}))
+
+    urls = [seed.url for seed in seeds]
+    if len(set(urls)) != len(urls):
+        # Checkpoint обхода хранится по стартовому URL
+        raise ValueError("Crawl plan contains duplicate seed URLs")
+    return sorted(seeds, key=lambda seed: -seed.priority)
+
+
+def load_crawl_plan(path=None):
+    """Загрузка плана обхода из TOML файла (CRAWL_PLAN_FILE).
+
+    Без файла план состоит из одного seed с AUTO_RIA_START_URL.
+    """
+    path = path or Config.CRAWL_PLAN_FILE
+    if not path:
+        if not Config.AUTO_RIA_START_URL:
+            return []
+        return [CrawlSeed(name='default', url=Config.AUTO_RIA_START_URL)]
+
+    with open(path, 'rb') as f:
+        return parse_crawl_plan(tomllib.load(f))
+
+
+def group_seeds_by_schedule(seeds):
+    """Seed'ы, сгруппированные по времени запуска (без schedule - по SCRAPE_TIME)"""
+    groups = {}
+    for seed in seeds:
+        groups.setdefault(seed.schedule or Config.SCRAPE_TIME, []).append(seed)
+    return groups
@@ -0,0 +1,115 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+
+from scraper.config import Config
+
+
+# Доля записываемых событий по умолчанию (остальные события пишутся все)
+DEFAULT_SAMPLE_RATES = {
+    'ad_processed': 0.05,
+    'ad_skipped': 0.01,
+    'phone_cache_hit': 0.05,
+    'phone_tokens_missing': 0.2,
+}
+
+# Стандартные атрибуты LogRecord - все остальное пришло через extra и пишется как поле события
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_listener = None
+
+
+def parse_sample_rates(value):
+    """Строка "event=0.1,other=1" -> {event: 0.1, other: 1.0} поверх значений по умолчанию"""
+    rates = dict(DEFAULT_SAMPLE_RATES)
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        event, _, rate = item.partition('=')
+        rates[event.strip()] = float(rate)
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON строка на запись: время, уровень, логгер, событие, сообщение и поля"""
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю rate событий с полем event (ошибки и предупреждения не отбрасываются)"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        rate = self.rates.get(getattr(record, 'event', None), 1.0)
+        return rate >= 1.0 or record.levelno >= logging.WARNING or random.random() < rate
+
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который передает в очередь запись с полями события и traceback.
+
+    Стандартный prepare подставляет в msg уже отформатированную строку и обнуляет
+    exc_info. Здесь traceback форматируется в exc_text до постановки в очередь
+    (объекты traceback в поток слушателя не передаются), а msg остается сообщением.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def setup_logging():
+    """Логгер "scraper": записи уходят в очередь, в stdout их пишет фоновый поток.
+
+    Запись в stdout (лог-драйвер Docker) больше не блокирует event loop.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(sys.stdout)
+    if Config.LOG_FORMAT == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = RecordQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(parse_sample_rates(Config.LOG_SAMPLING)))
+
+    logger = logging.getLogger('scraper')
+    logger.setLevel(Config.LOG_LEVEL)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+    # Дописать оставшиеся в очереди записи при выходе
+    atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    return logging.getLogger(name)
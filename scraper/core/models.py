@@ -0,0 +1,86 @@
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:  # orjson - необязательное ускорение сериализации
+    orjson = None
+
+
+_INDENT_RE = re.compile(r'^ +', re.MULTILINE)
+
+# Порядок колонок таблицы auto_ria_ads (без служебных datetime_found и т.п.)
+AD_COLUMNS = (
+    "url",
+    "title",
+    "price_usd",
+    "odometer",
+    "username",
+    "phone_number",
+    "image_url",
+    "images_count",
+    "car_number",
+    "car_vin",
+)
+
+
+@dataclass(slots=True)
+class AdRecord:
+    """Данные одного объявления (компактная замена словаря на 10 ключей)"""
+    url: str
+    title: Optional[str] = None
+    price_usd: Optional[int] = None
+    odometer: Optional[int] = None
+    username: Optional[str] = None
+    phone_number: Optional[int] = None
+    image_url: Optional[str] = None
+    images_count: Optional[int] = None
+    car_number: Optional[str] = None
+    car_vin: Optional[str] = None
+    # Токены API телефонов для отложенного обогащения (PHONE_ENRICHMENT=deferred), в AD_COLUMNS не входят
+    phone_hash: Optional[str] = None
+    phone_expires: Optional[int] = None
+
+    def as_tuple(self):
+        """Значения в порядке колонок БД (AD_COLUMNS) - готовая строка для executemany"""
+        return (
+            self.url,
+            self.title,
+            self.price_usd,
+            self.odometer,
+            self.username,
+            self.phone_number,
+            self.image_url,
+            self.images_count,
+            self.car_number,
+            self.car_vin,
+        )
+
+    def content_hash(self):
+        """Хеш содержимого (все поля, кроме URL) для обнаружения изменений при повторном скрапинге"""
+        payload = '\x1f'.join('\x00' if value is None else str(value) for value in self.as_tuple()[1:])
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+    def to_dict(self):
+        return dict(zip(AD_COLUMNS, self.as_tuple()))
+
+    @classmethod
+    def from_dict(cls, data):
+        """Создание записи из словаря старого формата"""
+        return cls(**{name: data.get(name) for name in AD_COLUMNS})
+
+
+def dumps_ad_records(records):
+    """Быстрая сериализация списка AdRecord в JSON (orjson, если установлен).
+
+    Результат один и тот же с orjson и без него: колонки AD_COLUMNS и отступ 4, как в прежних дампах.
+    """
+    data = [record.to_dict() for record in records]
+    if orjson is not None:
+        # orjson умеет только отступ 2 - удваиваем его (переводов строк внутри значений JSON нет)
+        text = orjson.dumps(data, option=orjson.OPT_INDENT_2).decode('utf-8')
+        return _INDENT_RE.sub(lambda match: match.group(0) * 2, text)
+    return json.dumps(data, ensure_ascii=False, indent=4)
@@ -0,0 +1,117 @@
+import json
+import os
+import time
+from collections import OrderedDict
+
+from scraper.config import Config
+
+
+class PhoneCache:
+    """Кэш ответов API телефонов с TTL и ограничением размера (LRU).
+
+    Телефоны хранятся по id объявления и по ссылке на профиль продавца:
+    у дилера сотни объявлений с одним номером.
+    """
+
+    def __init__(self, ttl_seconds, max_entries):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (phones, stored_at)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        phones, stored_at = entry
+        if now - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return phones
+
+    def _put(self, key, phones, stored_at):
+        self._entries[key] = (phones, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def lookup(self, ad_id=None, seller_key=None):
+        """Телефоны из кэша по id объявления или продавцу (None - нужно идти в API)"""
+        now = time.time()
+        for key in (ad_id and f"ad:{ad_id}", seller_key and f"seller:{seller_key}"):
+            if key:
+                phones = self._get(key, now)
+                if phones is not None:
+                    self.hits += 1
+                    return list(phones)
+        self.misses += 1
+        return None
+
+    def store(self, phones, ad_id=None, seller_key=None):
+        if not phones:
+            # Пустой ответ может быть временным сбоем - не кэшируем
+            return
+        now = time.time()
+        if ad_id:
+            self._put(f"ad:{ad_id}", list(phones), now)
+        if seller_key:
+            self._put(f"seller:{seller_key}", list(phones), now)
+
+    def load(self, path):
+        """Загрузка сохраненного кэша (просроченные записи отбрасываются)"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('entries', [])
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"⚠️ Could not load phone cache from {path}: {e}")
+            return
+        now = time.time()
+        for key, phones, stored_at in entries:
+            if now - stored_at <= self.ttl_seconds:
+                self._put(key, phones, stored_at)
+
+    def save(self, path):
+        """Атомарное сохранение кэша в JSON"""
+        now = time.time()
+        entries = [[key, phones, stored_at] for key, (phones, stored_at) in self._entries.items()
+                   if now - stored_at <= self.ttl_seconds]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def summary(self):
+        return f"{len(self)} entries, {self.hits} hits, {self.misses} misses"
+
+
+_phone_cache = None
+
+
+def get_phone_cache():
+    """Общий кэш телефонов процесса (загружается из PHONE_CACHE_FILE при первом обращении)"""
+    global _phone_cache
+    if _phone_cache is None:
+        _phone_cache = PhoneCache(Config.PHONE_CACHE_TTL_HOURS * 3600, Config.PHONE_CACHE_MAX_ENTRIES)
+        if Config.PHONE_CACHE_FILE:
+            _phone_cache.load(Config.PHONE_CACHE_FILE)
+    return _phone_cache
+
+
+def save_phone_cache():
+    if _phone_cache is None or not Config.PHONE_CACHE_FILE:
+        return
+    try:
+        _phone_cache.save(Config.PHONE_CACHE_FILE)
+        print(f"📞 Phone cache saved: {_phone_cache.summary()}")
+    except OSError as e:
+        print(f"⚠️ Could not save phone cache to {Config.PHONE_CACHE_FILE}: {e}")
@@ -0,0 +1,60 @@
+import random
+from collections import deque
+
+
+class AdaptivePollInterval:
+    """Интервал опроса листинга: сокращается, когда появляются новые объявления, и растет, когда их нет"""
+
+    def __init__(self, minimum, maximum, shrink=2.0, grow=1.5):
+        self.minimum = float(minimum)
+        self.maximum = max(float(maximum), self.minimum)
+        self.shrink = shrink
+        self.grow = grow
+        self.current = self.minimum
+
+    def update(self, found_new):
+        """Следующий интервал в секундах после опроса, нашедшего (или нет) новые объявления"""
+        if found_new:
+            self.current = max(self.minimum, self.current / self.shrink)
+        else:
+            self.current = min(self.maximum, self.current * self.grow)
+        return self.current
+
+
+class LatencyStats:
+    """Последние window значений задержки (секунды) и их перцентили"""
+
+    def __init__(self, window=500):
+        self.values = deque(maxlen=window)
+
+    def add(self, value):
+        self.values.append(value)
+
+    def percentile(self, p):
+        if not self.values:
+            return None
+        ordered = sorted(self.values)
+        return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class LatencySample(LatencyStats):
+    """Равномерная выборка (reservoir) из всех значений: перцентили за весь запуск при ограниченной памяти"""
+
+    def __init__(self, size=5000, rng=None):
+        self.values = []
+        self.size = size
+        self.count = 0
+        self.random = rng or random.Random()
+
+    def add(self, value):
+        self.count += 1
+        if len(self.values) < self.size:
+            self.values.append(value)
+        else:
+            # Каждое из count значений остается в выборке с вероятностью size / count
+            index = self.random.randrange(self.count)
+            if index < self.size:
+                self.values[index] = value
@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+
+class RateLimiter:
+    """Ограничение частоты запросов (token bucket): rate запросов в секунду, до burst подряд"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(int(burst), 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Ожидание разрешения на один запрос"""
+        # Lock выстраивает ожидающих в очередь, иначе они будут просыпаться одновременно
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def __repr__(self):
+        return f"RateLimiter({self.rate:g}/s, burst {self.burst})"
+
+
+class _LimitedRequest:
+    def __init__(self, limiter, request):
+        self._limiter = limiter
+        self._request = request
+
+    async def __aenter__(self):
+        await self._limiter.acquire()
+        return await self._request.__aenter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return await self._request.__aexit__(exc_type, exc, tb)
+
+
+class RateLimitedSession:
+    """Сессия с ограничением частоты запросов поверх общей HTTP сессии.
+
+    Повторяет интерфейс, который использует скрапер (get/cookie_jar/transport_name),
+    поэтому передается в функции загрузки вместо исходной сессии.
+    """
+
+    def __init__(self, session, limiter):
+        self._session = session
+        self.limiter = limiter
+        self.cookie_jar = session.cookie_jar
+        self.transport_name = getattr(session, 'transport_name', 'aiohttp')
+
+    def get(self, url, **kwargs):
+        return _LimitedRequest(self.limiter, self._session.get(url, **kwargs))
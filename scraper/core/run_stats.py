@@ -0,0 +1,105 @@
+import contextvars
+import datetime
+import time
+
+from scraper.config import Config
+from scraper.core.polling import LatencySample, LatencyStats
+from scraper.core.transport import current_transport_stats
+
+# Параметры, с которыми сравниваются запуски (снимок пишется в auto_ria_runs.config)
+TUNING_PARAMS = (
+    'SEMAPHORE_LIMIT', 'BATCH_SIZE', 'BATCH_DELAY', 'PAGE_DELAY',
+    'CONNECTION_LIMIT', 'CONNECTION_LIMIT_PER_HOST', 'SESSION_POOL_SIZE',
+    'RATE_LIMIT', 'HTTP_TRANSPORT', 'PARSE_MODE', 'PHONE_ENRICHMENT', 'DEDUPE_MODE',
+)
+
+
+class RunStats:
+    """Счетчики одного запуска для отчета и таблицы auto_ria_runs"""
+
+    def __init__(self, mode='scrape'):
+        self.mode = mode
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.started = time.monotonic()
+        self.first_ad = None
+        self.pages = 0
+        self.ads_discovered = 0
+        self.ads_new = 0
+        self.ads_skipped = 0
+        self.ads_failed = 0
+        self.phone_attempts = 0
+        self.phone_found = 0
+        self.parse_times = LatencySample()
+        self.db_rows = 0
+        self.db_seconds = 0.0
+
+    def record_batch(self, ok, skipped, failed):
+        self.ads_new += ok
+        self.ads_skipped += skipped
+        self.ads_failed += failed
+
+    def record_phone(self, found):
+        self.phone_attempts += 1
+        self.phone_found += bool(found)
+
+    def record_first_ad(self):
+        if self.first_ad is None:
+            self.first_ad = time.monotonic()
+
+    def time_to_first_ad(self):
+        return self.first_ad - self.started if self.first_ad is not None else None
+
+    def record_db_write(self, rows, started):
+        self.db_rows += rows
+        self.db_seconds += time.monotonic() - started
+
+    def as_row(self):
+        """Строка auto_ria_runs: счетчики запуска + байты и задержки из статистики транспорта"""
+        transport_stats = current_transport_stats().values()
+        fetch_times = LatencyStats(window=None)
+        for stats in transport_stats:
+            for latency in stats.latencies.values:
+                fetch_times.add(latency)
+
+        def ms(stats, p):
+            value = stats.percentile(p)
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            'mode': self.mode,
+            'started_at': self.started_at,
+            'finished_at': datetime.datetime.now(datetime.timezone.utc),
+            'pages': self.pages,
+            'ads_discovered': self.ads_discovered,
+            'ads_new': self.ads_new,
+            'ads_skipped': self.ads_skipped,
+            'ads_failed': self.ads_failed,
+            'phone_success_rate': round(self.phone_found / self.phone_attempts, 3) if self.phone_attempts else None,
+            'bytes_in': sum(stats.bytes_in for stats in transport_stats),
+            'fetch_p50_ms': ms(fetch_times, 50),
+            'fetch_p95_ms': ms(fetch_times, 95),
+            'parse_p50_ms': ms(self.parse_times, 50),
+            'parse_p95_ms': ms(self.parse_times, 95),
+            'db_rows': self.db_rows,
+            'db_rows_per_sec': round(self.db_rows / self.db_seconds, 1) if self.db_seconds else None,
+            'config': {name: getattr(Config, name, None) for name in TUNING_PARAMS},
+        }
+
+
+# Счетчики текущего запуска хранятся в contextvar: у одновременных запусков в одном event loop
+# (группы расписания, демон) они свои, дочерние задачи (gather, create_task) наследуют их
+_current = contextvars.ContextVar('run_stats', default=None)
+
+
+def reset_run_stats(mode='scrape'):
+    """Новые счетчики для текущего запуска (вместе с reset_transport_stats, в задаче запуска)"""
+    stats = RunStats(mode)
+    _current.set(stats)
+    return stats
+
+
+def get_run_stats():
+    stats = _current.get()
+    if stats is None:
+        stats = reset_run_stats()
+    return stats
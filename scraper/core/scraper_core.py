@@ -1,225 +1,482 @@
 import aiohttp
 import asyncio
-from bs4 import BeautifulSoup
+import codecs
+import time
+from bs4 import BeautifulSoup, SoupStrainer
 import re
 import json
+import logging
 from urllib.parse import urljoin
 from scraper.config import Config
+from scraper.core.log import get_logger
+from scraper.core.models import AdRecord
+from scraper.core.phone_cache import get_phone_cache
+from scraper.core.run_stats import get_run_stats
+from scraper.core.structured_data import extract_structured_ad_data
+from scraper.core.transport import (
+    get_transport_stats, record_response, response_charset, response_wire_bytes, session_transport_name
+)
+from scraper.core.url_utils import ad_key, normalize_ad_url
+
+logger = get_logger(__name__)
+
+
+def _tag_classes(attrs):
+    """Список классов тега из сырых атрибутов парсера"""
+    value = attrs.get('class') or ''
+    return value.split() if isinstance(value, str) else list(value)
+
+
+def build_container_strainer(targets=(), ids=(), tag_names=(), attr_names=()):
+    """SoupStrainer, который строит только поддеревья нужных контейнеров.
+
+    targets - пары (тег, класс), ids - значения id, tag_names - теги целиком,
+    attr_names - теги, у которых есть хотя бы один из атрибутов.
+    """
+    def match(name, attrs):
+        if name in tag_names:
+            return True
+        if ids and attrs.get('id') in ids:
+            return True
+        if attr_names and any(attr in attrs for attr in attr_names):
+            return True
+        if targets:
+            classes = _tag_classes(attrs)
+            return any(name == tag and class_name in classes for tag, class_name in targets)
+        return False
+
+    return SoupStrainer(match)
+
+
+# Контейнеры листинга: блоки с карточками и все ссылки (пагинация, newauto, автосалоны)
+# Блоки результатов поиска: ссылки a.address учитываются только внутри них
+LISTING_RESULT_IDS = ('catalogSearchAT', 'searchResults')
+
+LISTING_PAGE_STRAINER = build_container_strainer(
+    ids=LISTING_RESULT_IDS,
+    tag_names=('a',)
+)
+
+# Контейнеры страницы нового автомобиля (newauto)
+NEWAUTO_PAGE_STRAINER = build_container_strainer(targets=(
+    ('h1', 'auto-head_title'),
+    ('div', 'auto-price'),
+    ('section', 'description_by_autosalon'),
+    ('div', 'seller_info_name'),
+    ('span', 'conversion_phone_newcars'),
+    ('div', 'image-gallery-slide'),
+    ('label', 'panoram-tab-item'),
+    ('section', 'vin_checked'),
+))
+
+# Контейнеры обычного объявления
+REGULAR_AD_STRAINER = build_container_strainer(
+    targets=(
+        ('a', 'sellerPro'),
+        ('div', 'seller_info_name'),
+        ('span', 'state-num'),
+        ('div', 'car-number'),
+        ('span', 'label-vin'),
+        ('span', 'vin-code'),
+        ('a', 'show-all'),
+    ),
+    # script и элементы с data-hash/data-expires - токены телефона для режима deferred
+    tag_names=('h1', 'picture', 'img', 'script'),
+    attr_names=('data-hash', 'data-expires')
+)
+
+# Элементы с токенами для API телефонов
+PHONE_TOKEN_STRAINER = build_container_strainer(
+    tag_names=('script',),
+    attr_names=('data-hash', 'data-expires')
+)
+
+# Поля, без которых частичного дерева недостаточно и нужен полный парсинг.
+# Только те, что заполняет extract_targeted_regular_fields: цену и пробег
+# частичное дерево не дает, их отсутствие не должно вызывать повторный разбор
+REQUIRED_AD_FIELDS = ('title', 'username')
+
+
+# Маркеры раннего завершения потокового чтения:
+# на листинге достаточно дочитать до ссылки на следующую страницу (карточки идут раньше),
+# для токенов телефона - до первого элемента с data-hash и data-expires
+LISTING_STOP_RE = re.compile(r'<a\b[^>]*\bjs-next\b[^>]*>', re.IGNORECASE)
+PHONE_TOKEN_STOP_RE = re.compile(r'<[^>]*\bdata-(?:hash|expires)=[^>]*\bdata-(?:hash|expires)=[^>]*>', re.IGNORECASE)
+
+# Размер куска при потоковом чтении и сколько символов хвоста хранить для поиска маркера на стыке кусков
+STREAM_CHUNK_SIZE = 16384
+STREAM_OVERLAP = 4096
+
+
+def make_soup(html_content, strainer=None):
+    """Построение дерева: частичного (по strainer) или полного, в зависимости от PARSE_MODE"""
+    if strainer is not None and Config.PARSE_MODE == 'partial':
+        return BeautifulSoup(html_content, 'html.parser', parse_only=strainer)
+    return BeautifulSoup(html_content, 'html.parser')
 
 
 async def fetch_html_with_aiohttp(session, url):
     """Асинхронное получение HTML с помощью aiohttp"""
     try:
+        started = time.monotonic()
         async with session.get(url, headers=Config.COMMON_HEADERS) as response:
+            stats = record_response(session, started, response)
             response.raise_for_status()
+            body = await response.read()
+            stats.record_bytes(response_wire_bytes(response, len(body)))
             return await response.text()
     except aiohttp.ClientError as e:
-        print(f"Error fetching {url} with aiohttp: {e}")
+        get_transport_stats(session_transport_name(session)).record_error()
+        logger.warning(f"Error fetching {url} with aiohttp: {e}", extra={'event': 'fetch_error', 'url': url})
         return None
     except Exception as e:
-        print(f"Unexpected error fetching {url}: {e}")
+        get_transport_stats(session_transport_name(session)).record_error()
+        logger.error(f"Unexpected error fetching {url}: {e}", extra={'event': 'fetch_error', 'url': url})
+        return None
+
+# Статусы, по которым объявление считается снятым с продажи
+REMOVED_AD_STATUSES = (404, 410)
+
+async def fetch_ad_page_with_status(session, url):
+    """Получение страницы объявления для обновления: (status, html).
+
+    Для снятых объявлений (404/410 или редирект со страницы объявления на листинг)
+    возвращается (status, None); при ошибке сети - (None, None).
+    """
+    try:
+        started = time.monotonic()
+        async with session.get(url, headers=Config.COMMON_HEADERS) as response:
+            stats = record_response(session, started, response)
+            final_url = str(getattr(response, 'url', url))
+            if response.status in REMOVED_AD_STATUSES:
+                return response.status, None
+            if not final_url.split('?')[0].endswith('.html'):
+                # Удаленное объявление перенаправляет на страницу поиска
+                return 410, None
+            response.raise_for_status()
+            body = await response.read()
+            stats.record_bytes(response_wire_bytes(response, len(body)))
+            return response.status, await response.text()
+    except aiohttp.ClientError as e:
+        get_transport_stats(session_transport_name(session)).record_error()
+        logger.warning(f"Error fetching {url} for refresh: {e}", extra={'event': 'fetch_error', 'url': url})
+        return None, None
+    except Exception as e:
+        get_transport_stats(session_transport_name(session)).record_error()
+        logger.error(f"Unexpected error fetching {url} for refresh: {e}", extra={'event': 'fetch_error', 'url': url})
+        return None, None
+
+async def _drain_body(content, limit):
+    """Дочитывание остатка тела после маркера, не больше limit байт: (прочитано, дочитано ли до конца).
+
+    Полностью прочитанный ответ возвращает соединение в пул keep-alive;
+    если остаток больше limit, чтение прекращается и соединение закрывается.
+    """
+    drained = 0
+    async for chunk in content.iter_chunked(STREAM_CHUNK_SIZE):
+        drained += len(chunk)
+        if drained > limit:
+            return drained, False
+    return drained, True
+
+
+async def fetch_html_until(session, url, stop_pattern):
+    """Потоковое получение HTML с остановкой чтения, как только найден stop_pattern.
+
+    Тело читается кусками из response.content и декодируется инкрементально;
+    если маркер не встретился, возвращается весь документ. Остаток после маркера
+    до STREAM_DRAIN_LIMIT байт дочитывается без декодирования, чтобы соединение
+    вернулось в пул.
+    """
+    if not Config.STREAM_EARLY_CUTOFF:
+        return await fetch_html_with_aiohttp(session, url)
+
+    try:
+        started = time.monotonic()
+        async with session.get(url, headers=Config.COMMON_HEADERS) as response:
+            stats = record_response(session, started, response)
+            response.raise_for_status()
+            decoder = None
+            parts = []
+            tail = ''
+            decoded_bytes = 0
+            complete = False
+            async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                if decoder is None:
+                    # Без charset в заголовках кодировка определяется по первому куску, как в response.text()
+                    decoder = codecs.getincrementaldecoder(response_charset(response, chunk))(errors='replace')
+                decoded_bytes += len(chunk)
+                text = decoder.decode(chunk)
+                parts.append(text)
+                window = tail + text
+                if stop_pattern.search(window):
+                    # Найденный тег уже целиком в буфере - дальше только дочитываем небольшой остаток
+                    break
+                tail = window[-STREAM_OVERLAP:]
+            else:
+                complete = True
+                if decoder is not None:
+                    parts.append(decoder.decode(b'', final=True))
+            if not complete and Config.STREAM_DRAIN_LIMIT > 0:
+                drained, complete = await _drain_body(response.content, Config.STREAM_DRAIN_LIMIT)
+                decoded_bytes += drained
+            stats.record_bytes(response_wire_bytes(response, decoded_bytes, complete))
+            return ''.join(parts)
+    except aiohttp.ClientError as e:
+        get_transport_stats(session_transport_name(session)).record_error()
+        logger.warning(f"Error streaming {url} with aiohttp: {e}", extra={'event': 'fetch_error', 'url': url})
+        return None
+    except Exception as e:
+        get_transport_stats(session_transport_name(session)).record_error()
+        logger.error(f"Unexpected error streaming {url}: {e}", extra={'event': 'fetch_error', 'url': url})
+        return None
+
+# Ссылки на объявления в списках автосалонов (auto-<марка>-<модель>-<id>.html)
+AUTOSALON_AD_RE = re.compile(r'auto-.*-\d+\.html')
+
+
+def classify_listing_link(link, href):
+    """Тип ссылки листинга: 'used', 'newauto', 'autosalon' или None (не объявление)"""
+    classes = link.get('class') or ()
+    if 'address' in classes:
+        # a.address встречается и вне выдачи (шапка, блоки рекомендаций)
+        if link.find_parent(id=LISTING_RESULT_IDS) is not None:
+            return 'used'
         return None
+    if '/newauto/' in href and ('proposition_link' in classes or '/newauto/auto-' in href):
+        return 'newauto'
+    if '/auto-' in href and '/autosalons/' not in href and AUTOSALON_AD_RE.search(href):
+        return 'autosalon'
+    return None
+
+
+def extract_listing_links(soup, page_url):
+    """URL объявлений и следующей страницы листинга за один проход по ссылкам.
+
+    Ссылки нормализуются (абсолютный URL без параметров), повторы отбрасываются
+    с сохранением порядка появления на странице.
+    """
+    ad_urls = {}  # dict как упорядоченное множество
+    next_page_url = None
+    for link in soup.find_all('a', href=True):
+        href = link['href']
+        classes = link.get('class') or ()
+        if 'js-next' in classes and 'page-link' in classes:
+            if next_page_url is None:
+                next_page_url = urljoin(page_url, href)
+            continue
+        if classify_listing_link(link, href):
+            ad_urls.setdefault(normalize_ad_url(href, page_url), None)
+    return list(ad_urls), next_page_url
+
 
 async def collect_ad_urls_from_page(session, page_url):
     """Асинхронный сбор URL объявлений со страницы"""
-    html_content = await fetch_html_with_aiohttp(session, page_url)
+    html_content = await fetch_html_until(session, page_url, LISTING_STOP_RE)
     if not html_content:
         return [], None # Return empty list of urls and no next page url
 
-    soup = BeautifulSoup(html_content, 'html.parser')
-    ad_urls = []
-
-    # Try to find ads using the structure for the initial page
-    catalog_search_at_div = soup.find('div', class_='span8 box-panel', id='catalogSearchAT')
-    if catalog_search_at_div:
-        ad_links = catalog_search_at_div.find_all('a', class_='address')
-        for link in ad_links:
-            href = link.get('href')
-            if href:
-                ad_urls.append(href)
-    else:
-        # If not found, try to find ads using the structure for subsequent pages
-        search_results_div = soup.find('div', id='searchResults')
-        if search_results_div:
-            # The provided HTML snippet shows section with class 'ticket-item new__ticket' containing the address link
-            # We need to find the actual 'a' tag with class 'address' within these sections
-            ad_sections = search_results_div.find_all('section', class_=re.compile(r'ticket-item'))
-            for section in ad_sections:
-                link = section.find('a', class_='address')
-                if link:
-                    href = link.get('href')
-                    if href:
-                        ad_urls.append(href)
-
-    # Дополнительно ищем ссылки на новые автомобили (newauto)
-    # Ищем ссылки в карточках предложений
-    proposition_links = soup.find_all('a', class_='proposition_link')
-    for link in proposition_links:
-        href = link.get('href')
-        if href and '/newauto/' in href:
-            ad_urls.append(href)
-    
-    # Также ищем прямые ссылки на newauto в различных контейнерах
-    newauto_links = soup.find_all('a', href=re.compile(r'/newauto/auto-'))
-    for link in newauto_links:
-        href = link.get('href')
-        if href and href not in ad_urls:
-            ad_urls.append(href)
-
-    # Ищем ссылки в списках автосалонов
-    autosalon_ad_links = soup.find_all('a', href=re.compile(r'auto-.*-\d+\.html'))
-    for link in autosalon_ad_links:
-        href = link.get('href')
-        if href and href not in ad_urls:
-            # Проверяем, что это не ссылка на автосалон, а на объявление
-            if '/auto-' in href and not '/autosalons/' in href:
-                ad_urls.append(href)
+    soup = make_soup(html_content, LISTING_PAGE_STRAINER)
+    return extract_listing_links(soup, page_url)
 
-    next_page_url = None
-    next_page_link = soup.find('a', class_='page-link js-next')
-    if next_page_link:
-        next_page_url = next_page_link.get('href')
+AD_ID_RE = re.compile(r'_(\d+)\.html')
 
-    return ad_urls, next_page_url
+# Паттерны токенов телефона в JavaScript коде страницы
+PHONE_HASH_PATTERNS = [
+    r'''hash["']?\s*:\s*["']([^'"]+)["']''',
+    r'''["']hash["']?\s*:\s*["']([^'"]+)["']''',
+    r'''hash\s*=\s*["']([^'"]+)["']''',
+    r'''data-hash\s*=\s*["']([^'"]+)["']''',
+]
+PHONE_EXPIRES_PATTERNS = [
+    r'''expires["']?\s*:\s*(\d+)''',
+    r'''["']expires["']?\s*:\s*(\d+)''',
+    r'''expires\s*=\s*(\d+)''',
+    r'''data-expires\s*=\s*["']?(\d+)["']?''',
+]
+PHONE_KEYS = ['phoneFormatted', 'phone', 'number', 'phoneNumber']
 
-async def get_phone_from_ria(session, ad_url):
-    """Асинхронное получение номера телефона через API (улучшенная версия)"""
-    try:
-        # Fetch the ad page HTML first to get hash and expires
-        async with session.get(ad_url, headers=Config.COMMON_HEADERS) as response:
-            response.raise_for_status()
-            content = await response.text()
-            
-        soup = BeautifulSoup(content, 'html.parser')
-        
-        hash_val = None
-        expires_val = None
-
-        # Метод 1: Поиск в data-атрибутах элементов
-        elements_with_data = soup.find_all(attrs={'data-hash': True})
-        for elem in elements_with_data:
-            hash_val = elem.get('data-hash')
-            expires_val = elem.get('data-expires')
-            if hash_val and expires_val:
-                break
 
-        # Метод 2: Поиск в JavaScript коде
-        if not hash_val or not expires_val:
-            scripts = soup.find_all('script')
-            for script in scripts:
-                if script.string:
-                    script_content = script.string
-                    
-                    # Различные паттерны для поиска hash и expires
-                    hash_patterns = [
-                        r'''hash["']?\s*:\s*["']([^'"]+)["']''',
-                        r'''["']hash["']?\s*:\s*["']([^'"]+)["']''',
-                        r'''hash\s*=\s*["']([^'"]+)["']''',
-                        r'''data-hash\s*=\s*["']([^'"]+)["']''',
-                    ]
-                    
-                    expires_patterns = [
-                        r'''expires["']?\s*:\s*(\d+)''',
-                        r'''["']expires["']?\s*:\s*(\d+)''',
-                        r'''expires\s*=\s*(\d+)''',
-                        r'''data-expires\s*=\s*["']?(\d+)["']?''',
-                    ]
-                    
-                    # Ищем hash
-                    if not hash_val:
-                        for pattern in hash_patterns:
-                            match = re.search(pattern, script_content)
-                            if match:
-                                hash_val = match.group(1)
-                                break
-                    
-                    # Ищем expires
-                    if not expires_val:
-                        for pattern in expires_patterns:
-                            match = re.search(pattern, script_content)
-                            if match:
-                                expires_val = match.group(1)
-                                break
-                    
-                    # Если нашли оба значения, прекращаем поиск
-                    if hash_val and expires_val:
-                        break
+def extract_ad_id(ad_url):
+    match = AD_ID_RE.search(ad_url)
+    return match.group(1) if match else None
+
+
+def extract_seller_key(soup):
+    """Ссылка на профиль продавца/дилера (ключ кэша телефонов) или None.
+
+    Ссылка берется только из блока продавца: ссылки профиля в шапке (вход, кабинет) одинаковы
+    на всех страницах, и по ним кэш отдал бы всем объявлениям один телефон.
+    """
+    seller_link = soup.find('a', class_='sellerPro', href=True)
+    if seller_link is None:
+        seller_info = soup.find('div', class_='seller_info_name')
+        seller_link = seller_info.find('a', href=True) if seller_info is not None else None
+    if seller_link is None:
+        return None
+    return urljoin("https://auto.ria.com", seller_link['href']).split('?')[0].rstrip('/')
+
+
+def extract_phone_tokens(soup):
+    """Токены hash/expires для API телефонов со страницы объявления: (hash, expires)"""
+    hash_val = None
+    expires_val = None
 
-        # Метод 3: Поиск в кнопках и ссылках с телефонами
-        if not hash_val or not expires_val:
-            phone_elements = soup.find_all(['button', 'a', 'span'], class_=re.compile(r'phone|contact', re.IGNORECASE))
-            for elem in phone_elements:
+    # Метод 1: Поиск в data-атрибутах элементов
+    elements_with_data = soup.find_all(attrs={'data-hash': True})
+    for elem in elements_with_data:
+        hash_val = elem.get('data-hash')
+        expires_val = elem.get('data-expires')
+        if hash_val and expires_val:
+            break
+
+    # Метод 2: Поиск в JavaScript коде
+    if not hash_val or not expires_val:
+        scripts = soup.find_all('script')
+        for script in scripts:
+            if script.string:
+                script_content = script.string
+                
+                # Ищем hash
                 if not hash_val:
-                    hash_val = elem.get('data-hash')
+                    for pattern in PHONE_HASH_PATTERNS:
+                        match = re.search(pattern, script_content)
+                        if match:
+                            hash_val = match.group(1)
+                            break
+                
+                # Ищем expires
                 if not expires_val:
-                    expires_val = elem.get('data-expires')
+                    for pattern in PHONE_EXPIRES_PATTERNS:
+                        match = re.search(pattern, script_content)
+                        if match:
+                            expires_val = match.group(1)
+                            break
+                
+                # Если нашли оба значения, прекращаем поиск
                 if hash_val and expires_val:
                     break
 
-        # Метод 4: Поиск в любых элементах с data-hash или data-expires
-        if not hash_val:
-            hash_elem = soup.find(attrs={'data-hash': True})
-            if hash_elem:
-                hash_val = hash_elem.get('data-hash')
-        
-        if not expires_val:
-            expires_elem = soup.find(attrs={'data-expires': True})
-            if expires_elem:
-                expires_val = expires_elem.get('data-expires')
+    # Метод 3: Поиск в кнопках и ссылках с телефонами
+    if not hash_val or not expires_val:
+        phone_elements = soup.find_all(['button', 'a', 'span'], class_=re.compile(r'phone|contact', re.IGNORECASE))
+        for elem in phone_elements:
+            if not hash_val:
+                hash_val = elem.get('data-hash')
+            if not expires_val:
+                expires_val = elem.get('data-expires')
+            if hash_val and expires_val:
+                break
+
+    # Метод 4: Поиск в любых элементах с data-hash или data-expires
+    if not hash_val:
+        hash_elem = soup.find(attrs={'data-hash': True})
+        if hash_elem:
+            hash_val = hash_elem.get('data-hash')
+    
+    if not expires_val:
+        expires_elem = soup.find(attrs={'data-expires': True})
+        if expires_elem:
+            expires_val = expires_elem.get('data-expires')
+
+    return hash_val, expires_val
+
+
+def parse_phone_api_response(phone_json):
+    """Список телефонов из ответа API (поддерживаются разные форматы)"""
+    items = []
+    if isinstance(phone_json, dict):
+        if 'phones' in phone_json:
+            items = phone_json['phones']
+        elif 'phone' in phone_json:
+            return [str(phone_json['phone'])]
+    elif isinstance(phone_json, list):
+        items = phone_json
+
+    extracted_phones = []
+    for item in items:
+        if isinstance(item, str):
+            extracted_phones.append(item)
+        elif isinstance(item, dict):
+            # Пробуем различные ключи для номера телефона
+            for key in PHONE_KEYS:
+                if key in item and item[key]:
+                    extracted_phones.append(str(item[key]))
+                    break
+    return extracted_phones
+
+
+def phone_to_bigint(phones_list):
+    """Первый телефон списка в виде числа для колонки BIGINT"""
+    if not phones_list:
+        return None
+    cleaned_phone = re.sub(r'[^\d]', '', phones_list[0])
+    try:
+        return int(cleaned_phone)
+    except ValueError:
+        return None
+
+
+async def fetch_phones_from_api(session, ad_url, ad_id, hash_val, expires_val):
+    """Запрос к API телефонов. None - ошибка запроса (в отличие от пустого списка)"""
+    phone_url = f"https://auto.ria.com/users/phones/{ad_id}?hash={hash_val}&expires={expires_val}"
+    try:
+        started = time.monotonic()
+        async with session.get(phone_url, headers=Config.COMMON_HEADERS) as phone_response:
+            stats = record_response(session, started, phone_response)
+            phone_response.raise_for_status()
+            stats.record_bytes(response_wire_bytes(phone_response, len(await phone_response.read())))
+            phones = parse_phone_api_response(await phone_response.json())
+            get_run_stats().record_phone(phones)
+            return phones
+    except aiohttp.ClientError as e:
+        get_transport_stats(session_transport_name(session)).record_error()
+        logger.warning(f"Error fetching phone API for {ad_url}: {e}", extra={'event': 'phone_api_error', 'url': ad_url})
+    except json.JSONDecodeError as e:
+        logger.warning(f"Error decoding phone API JSON for {ad_url}: {e}", extra={'event': 'phone_api_error', 'url': ad_url})
+    return None
+
+
+async def fetch_phone_tokens(session, ad_url):
+    """Загрузка страницы объявления только до токенов телефона: (hash, expires)"""
+    # читаем только до первого элемента с data-hash/data-expires
+    content = await fetch_html_until(session, ad_url, PHONE_TOKEN_STOP_RE)
+    if not content:
+        return None, None
+    return extract_phone_tokens(make_soup(content, PHONE_TOKEN_STRAINER))
+
+
+async def get_phone_from_ria(session, ad_url, seller_key=None):
+    """Асинхронное получение номера телефона через API (улучшенная версия).
+
+    Сначала проверяется кэш телефонов по id объявления и продавцу (seller_key).
+    """
+    ad_id = extract_ad_id(ad_url)
+    phone_cache = get_phone_cache() if Config.PHONE_CACHE_ENABLED else None
+    if phone_cache is not None:
+        cached_phones = phone_cache.lookup(ad_key(ad_url), seller_key)
+        if cached_phones is not None:
+            logger.debug(f"📞 Phone cache hit for {ad_url}", extra={'event': 'phone_cache_hit', 'url': ad_url})
+            return cached_phones
+
+    try:
+        hash_val, expires_val = await fetch_phone_tokens(session, ad_url)
 
         # Если нашли hash и expires, делаем запрос к API
         if hash_val and expires_val:
-            ad_id_match = re.search(r'_(\d+)\.html', ad_url)
-            if ad_id_match:
-                ad_id = ad_id_match.group(1)
-                phone_url = f"https://auto.ria.com/users/phones/{ad_id}?hash={hash_val}&expires={expires_val}"
-                
-                try:
-                    async with session.get(phone_url, headers=Config.COMMON_HEADERS) as phone_response:
-                        phone_response.raise_for_status()
-                        phone_json = await phone_response.json()
-                        
-                        extracted_phones = []
-                        
-                        # Обрабатываем различные форматы ответа API
-                        if isinstance(phone_json, dict):
-                            if 'phones' in phone_json:
-                                for item in phone_json['phones']:
-                                    if isinstance(item, str):
-                                        extracted_phones.append(item)
-                                    elif isinstance(item, dict):
-                                        # Пробуем различные ключи для номера телефона
-                                        phone_keys = ['phoneFormatted', 'phone', 'number', 'phoneNumber']
-                                        for key in phone_keys:
-                                            if key in item and item[key]:
-                                                extracted_phones.append(str(item[key]))
-                                                break
-                            elif 'phone' in phone_json:
-                                extracted_phones.append(str(phone_json['phone']))
-                        elif isinstance(phone_json, list):
-                            for item in phone_json:
-                                if isinstance(item, str):
-                                    extracted_phones.append(item)
-                                elif isinstance(item, dict):
-                                    phone_keys = ['phoneFormatted', 'phone', 'number', 'phoneNumber']
-                                    for key in phone_keys:
-                                        if key in item and item[key]:
-                                            extracted_phones.append(str(item[key]))
-                                            break
-                        
-                        return extracted_phones
-                        
-                except aiohttp.ClientError as e:
-                    print(f"Error fetching phone API for {ad_url}: {e}")
-                except json.JSONDecodeError as e:
-                    print(f"Error decoding phone API JSON for {ad_url}: {e}")
+            if ad_id:
+                extracted_phones = await fetch_phones_from_api(session, ad_url, ad_id, hash_val, expires_val)
+                if extracted_phones is not None:
+                    if phone_cache is not None:
+                        phone_cache.store(extracted_phones, ad_key(ad_url), seller_key)
+                    return extracted_phones
             else:
-                print(f"Could not extract ad_id from URL: {ad_url}")
+                logger.warning(f"Could not extract ad_id from URL: {ad_url}", extra={'event': 'phone_tokens_missing', 'url': ad_url})
         else:
-            print(f"Hash or expires not found for {ad_url}. Hash: {hash_val}, Expires: {expires_val}")
+            logger.info(f"Hash or expires not found for {ad_url}", extra={'event': 'phone_tokens_missing', 'url': ad_url})
         
     except Exception as e:
-        print(f"Error in get_phone_from_ria for {ad_url}: {e}")
+        logger.error(f"Error in get_phone_from_ria for {ad_url}: {e}", extra={'event': 'phone_error', 'url': ad_url})
     
     return [] # Return empty list if phones cannot be retrieved
 
@@ -229,30 +486,60 @@ async def parse_ad_page(url, html_content, session):
     if not html_content:
         return None
 
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
     # Определяем тип страницы по URL
     is_newauto = '/newauto/' in url
     
-    data = {
-        "url": url,
-        "title": None,
-        "price_usd": None,
-        "odometer": None,
-        "username": None,
-        "phone_number": None,
-        "image_url": None,
-        "images_count": None,
-        "car_number": None,
-        "car_vin": None
-    }
+    data = AdRecord(url=url)
+
+    # Сначала берем поля из структурированных данных (JSON-LD),
+    # DOM-эвристики используются только для недостающих полей
+    structured_data = extract_structured_ad_data(html_content)
 
     if is_newauto:
         # Парсинг для новых автомобилей (newauto)
-        return await parse_newauto_page(url, soup, session, data)
+        soup = make_soup(html_content, NEWAUTO_PAGE_STRAINER)
+        data = await parse_newauto_page(url, soup, session, data)
+        for key, value in structured_data.items():
+            if getattr(data, key) is None:
+                setattr(data, key, value)
+        return data
     else:
-        # Парсинг для обычных объявлений
-        return await parse_regular_ad_page(url, soup, session, data)
+        # Парсинг для обычных объявлений.
+        # В JSON-LD попадает лишь часть фото, поэтому его images_count - только запасной вариант
+        # для страниц без счетчика show-all
+        structured_images_count = structured_data.pop('images_count', None)
+        for key, value in structured_data.items():
+            setattr(data, key, value)
+        soup = make_soup(html_content, REGULAR_AD_STRAINER)
+        if Config.PARSE_MODE == 'partial':
+            extract_targeted_regular_fields(soup, data)
+            if any(getattr(data, field) is None for field in REQUIRED_AD_FIELDS):
+                # Частичного дерева не хватило - строим полное для эвристик
+                soup = BeautifulSoup(html_content, 'html.parser')
+        data = await parse_regular_ad_page(url, soup, session, data)
+        if data is not None and data.images_count is None:
+            data.images_count = structured_images_count
+        if data is not None and data.phone_number is None and Config.PHONE_ENRICHMENT == 'deferred':
+            # Токены для API телефонов берем из уже построенного дерева страницы
+            hash_val, expires_val = extract_phone_tokens(soup)
+            if hash_val and expires_val and str(expires_val).isdigit():
+                data.phone_hash, data.phone_expires = hash_val, int(expires_val)
+        return data
+
+
+def extract_targeted_regular_fields(soup, data):
+    """Заполнение заголовка и продавца по известным контейнерам без текстовых эвристик"""
+    if data.title is None:
+        title_tag = soup.find('h1', class_='head') or soup.find('h1', class_='auto-head_title')
+        if title_tag:
+            data.title = title_tag.get_text(strip=True) or None
+
+    if data.username is None:
+        seller_tag = soup.find('a', class_='sellerPro') or soup.find('div', class_='seller_info_name')
+        if seller_tag:
+            username_text = seller_tag.get_text(strip=True)
+            if username_text and len(username_text) > 1:
+                data.username = username_text
 
 
 async def parse_newauto_page(url, soup, session, data):
@@ -271,7 +558,7 @@ async def parse_newauto_page(url, soup, session, data):
         if div_text:
             title_parts.append(div_text.get_text(strip=True))
         
-        data["title"] = " ".join(title_parts) if title_parts else None
+        data.title = " ".join(title_parts) if title_parts else None
     
     # 2. Price USD - из div с классом auto-price
     price_container = soup.find('div', class_='auto-price')
@@ -284,9 +571,9 @@ async def parse_newauto_page(url, soup, session, data):
         if dollar_match:
             price_str = dollar_match.group(1).replace(' ', '').replace(',', '')
             try:
-                data["price_usd"] = int(price_str)
+                data.price_usd = int(price_str)
             except ValueError:
-                data["price_usd"] = None
+                data.price_usd = None
     
     # 3. Odometer - для новых авто обычно 0 или небольшой пробіг
     # Ищем в комментарии автосалона или устанавливаем 0
@@ -297,13 +584,13 @@ async def parse_newauto_page(url, soup, session, data):
         mileage_match = re.search(r'Пробіг\s*(\d+)\s*км', description_text)
         if mileage_match:
             try:
-                data["odometer"] = int(mileage_match.group(1))
+                data.odometer = int(mileage_match.group(1))
             except ValueError:
-                data["odometer"] = 0
+                data.odometer = 0
         else:
-            data["odometer"] = 0
+            data.odometer = 0
     else:
-        data["odometer"] = 0
+        data.odometer = 0
     
     # 4. Username - из информации об автосалоне
     seller_info = soup.find('div', class_='seller_info_name')
@@ -314,7 +601,7 @@ async def parse_newauto_page(url, soup, session, data):
             if strong_element:
                 # Убираем иконку верификации из текста
                 username_text = strong_element.get_text(strip=True)
-                data["username"] = username_text
+                data.username = username_text
     
     # 5. Phone Number - из кнопки с телефоном
     phone_button = soup.find('span', class_='conversion_phone_newcars')
@@ -324,9 +611,9 @@ async def parse_newauto_page(url, soup, session, data):
         cleaned_phone = re.sub(r'[^\d]', '', phone_text)
         if cleaned_phone:
             try:
-                data["phone_number"] = int(cleaned_phone)
+                data.phone_number = int(cleaned_phone)
             except ValueError:
-                data["phone_number"] = None
+                data.phone_number = None
     
     # 6. Image URL - из галереи изображений
     # Ищем первое изображение в галерее
@@ -340,12 +627,12 @@ async def parse_newauto_page(url, soup, session, data):
                 srcset = source_webp.get('srcset')
                 # Берем первый URL из srcset
                 first_url = srcset.split(',')[0].strip().split(' ')[0]
-                data["image_url"] = first_url
+                data.image_url = first_url
             else:
                 # Fallback на img элемент
                 img_element = picture_element.find('img')
                 if img_element and img_element.get('src'):
-                    data["image_url"] = img_element.get('src')
+                    data.image_url = img_element.get('src')
     
     # 7. Images Count - из лейбла с количеством фото
     photo_label = soup.find('label', class_='panoram-tab-item')
@@ -355,12 +642,12 @@ async def parse_newauto_page(url, soup, session, data):
         count_match = re.search(r'(\d+)', label_text)
         if count_match:
             try:
-                data["images_count"] = int(count_match.group(1))
+                data.images_count = int(count_match.group(1))
             except ValueError:
-                data["images_count"] = None
+                data.images_count = None
     
     # 8. Car Number - для новых авто обычно отсутствует
-    data["car_number"] = None
+    data.car_number = None
     
     # 9. Car VIN - ищем в секции проверки
     vin_section = soup.find('section', class_='vin_checked')
@@ -371,12 +658,12 @@ async def parse_newauto_page(url, soup, session, data):
             # Ищем VIN-подобную строку
             vin_match = re.search(r'([A-HJ-NPR-Z0-9]{17})', item_text, re.IGNORECASE)
             if vin_match:
-                data["car_vin"] = vin_match.group(1)
+                data.car_vin = vin_match.group(1)
                 break
             # Также ищем частично скрытый VIN
             partial_vin_match = re.search(r'([A-HJ-NPR-Z0-9]+х[A-HJ-NPR-Z0-9]+х+\d+)', item_text, re.IGNORECASE)
             if partial_vin_match:
-                data["car_vin"] = partial_vin_match.group(1)
+                data.car_vin = partial_vin_match.group(1)
                 break
     
     return data
@@ -387,163 +674,160 @@ async def parse_regular_ad_page(url, soup, session, data):
     
     # 1. URL (already have it)
     # 2. Title - обновленные селекторы
-    title_tag = soup.find('h1', class_='head')
-    if not title_tag:
-        # Новые варианты селекторов для заголовка
-        title_tag = soup.find('h1', class_='auto-head_title')
+    if data.title is None:
+        title_tag = soup.find('h1', class_='head')
         if not title_tag:
-            title_tag = soup.find('h1')
+            # Новые варианты селекторов для заголовка
+            title_tag = soup.find('h1', class_='auto-head_title')
             if not title_tag:
-                # Ищем в div с классами, содержащими title
-                title_tag = soup.find('div', class_=re.compile(r'title|head', re.IGNORECASE))
+                title_tag = soup.find('h1')
                 if not title_tag:
-                    # Последний вариант - ищем любой элемент с большим текстом в начале страницы
-                    potential_titles = soup.find_all(['h1', 'h2', 'div'], limit=10)
-                    for elem in potential_titles:
-                        text = elem.get_text(strip=True)
-                        if len(text) > 10 and any(word in text.lower() for word in ['kia', 'toyota', 'bmw', 'mercedes', 'audi', 'volkswagen', 'ford', 'hyundai', 'nissan', 'honda']):
-                            title_tag = elem
-                            break
+                    # Ищем в div с классами, содержащими title
+                    title_tag = soup.find('div', class_=re.compile(r'title|head', re.IGNORECASE))
+                    if not title_tag:
+                        # Последний вариант - ищем любой элемент с большим текстом в начале страницы
+                        potential_titles = soup.find_all(['h1', 'h2', 'div'], limit=10)
+                        for elem in potential_titles:
+                            text = elem.get_text(strip=True)
+                            if len(text) > 10 and any(word in text.lower() for word in ['kia', 'toyota', 'bmw', 'mercedes', 'audi', 'volkswagen', 'ford', 'hyundai', 'nissan', 'honda']):
+                                title_tag = elem
+                                break
     
-    if title_tag:
-        data["title"] = title_tag.get_text(strip=True)
-    else:
-        # Агрессивный поиск заголовка по тексту страницы
-        page_text = soup.get_text()
-        # Ищем паттерны типа "Марка Модель год"
-        title_patterns = [
-            r'((?:Kia|Toyota|BMW|Mercedes|Audi|Volkswagen|Ford|Hyundai|Nissan|Honda|Mazda|Lexus|Renault|Peugeot|Citroën|Skoda|Seat|Volvo|Subaru|Mitsubishi|Suzuki|Infiniti|Acura|Cadillac|Chevrolet|Chrysler|Dodge|Jeep|Lincoln|Buick|GMC|Hummer|Pontiac|Saturn|Saab|Jaguar|Land Rover|Bentley|Rolls-Royce|Aston Martin|Maserati|Ferrari|Lamborghini|Porsche|McLaren|Bugatti|Koenigsegg|Pagani|Alfa Romeo|Fiat|Lancia|Mini|Smart|Dacia|Lada|UAZ|GAZ|ZAZ|Chery|Geely|BYD|Great Wall|Haval|Changan|JAC|Lifan|MG|Ssangyong|Daewoo|Hyundai|Kia)\s+[A-Za-z0-9\-\s]+(?:20\d{2}|19\d{2})?)',
-        ]
+        if title_tag:
+            data.title = title_tag.get_text(strip=True)
+        else:
+            # Агрессивный поиск заголовка по тексту страницы
+            page_text = soup.get_text()
+            # Ищем паттерны типа "Марка Модель год"
+            title_patterns = [
+                r'((?:Kia|Toyota|BMW|Mercedes|Audi|Volkswagen|Ford|Hyundai|Nissan|Honda|Mazda|Lexus|Renault|Peugeot|Citroën|Skoda|Seat|Volvo|Subaru|Mitsubishi|Suzuki|Infiniti|Acura|Cadillac|Chevrolet|Chrysler|Dodge|Jeep|Lincoln|Buick|GMC|Hummer|Pontiac|Saturn|Saab|Jaguar|Land Rover|Bentley|Rolls-Royce|Aston Martin|Maserati|Ferrari|Lamborghini|Porsche|McLaren|Bugatti|Koenigsegg|Pagani|Alfa Romeo|Fiat|Lancia|Mini|Smart|Dacia|Lada|UAZ|GAZ|ZAZ|Chery|Geely|BYD|Great Wall|Haval|Changan|JAC|Lifan|MG|Ssangyong|Daewoo|Hyundai|Kia)\s+[A-Za-z0-9\-\s]+(?:20\d{2}|19\d{2})?)',
+            ]
         
-        for pattern in title_patterns:
-            match = re.search(pattern, page_text, re.IGNORECASE)
-            if match:
-                potential_title = match.group(1).strip()
-                if len(potential_title) > 5:
-                    data["title"] = potential_title
-                    break
+            for pattern in title_patterns:
+                match = re.search(pattern, page_text, re.IGNORECASE)
+                if match:
+                    potential_title = match.group(1).strip()
+                    if len(potential_title) > 5:
+                        data.title = potential_title
+                        break
 
     # 3. Price USD - улучшенный парсинг цены
-    data["price_usd"] = None
-    
-    # Метод 1: Ищем цену в долларах по тексту
-    price_patterns = [
-        r'(\d+(?:\s*\d+)*)\s*\$',  # "19650 $"
-        r'\$\s*(\d+(?:\s*\d+)*)',  # "$ 19650"
-        r'(\d+(?:,\d+)*)\s*USD',   # "19,650 USD"
-    ]
+    if data.price_usd is None:
+        # Метод 1: Ищем цену в долларах по тексту
+        price_patterns = [
+            r'(\d+(?:\s*\d+)*)\s*\$',  # "19650 $"
+            r'\$\s*(\d+(?:\s*\d+)*)',  # "$ 19650"
+            r'(\d+(?:,\d+)*)\s*USD',   # "19,650 USD"
+        ]
     
-    page_text = soup.get_text()
-    for pattern in price_patterns:
-        matches = re.findall(pattern, page_text.replace(' ', ''))
-        for match in matches:
-            try:
-                price_num = int(match.replace(',', '').replace(' ', ''))
-                if 1000 <= price_num <= 1000000:  # Разумный диапазон цен для авто
-                    data["price_usd"] = price_num
-                    break
-            except ValueError:
-                continue
-        if data["price_usd"]:
-            break
+        page_text = soup.get_text()
+        for pattern in price_patterns:
+            matches = re.findall(pattern, page_text.replace(' ', ''))
+            for match in matches:
+                try:
+                    price_num = int(match.replace(',', '').replace(' ', ''))
+                    if 1000 <= price_num <= 1000000:  # Разумный диапазон цен для авто
+                        data.price_usd = price_num
+                        break
+                except ValueError:
+                    continue
+            if data.price_usd:
+                break
     
-    # Метод 2: Ищем в элементах с зеленым цветом (обычно цена)
-    if not data["price_usd"]:
-        green_elements = soup.find_all(['span', 'strong', 'div'], style=re.compile(r'color.*green|var\(--green\)', re.IGNORECASE))
-        green_elements.extend(soup.find_all(['span', 'strong', 'div'], class_=re.compile(r'green|price', re.IGNORECASE)))
+        # Метод 2: Ищем в элементах с зеленым цветом (обычно цена)
+        if not data.price_usd:
+            green_elements = soup.find_all(['span', 'strong', 'div'], style=re.compile(r'color.*green|var\(--green\)', re.IGNORECASE))
+            green_elements.extend(soup.find_all(['span', 'strong', 'div'], class_=re.compile(r'green|price', re.IGNORECASE)))
         
-        for elem in green_elements:
-            text = elem.get_text(strip=True)
-            if '$' in text or 'USD' in text:
-                price_match = re.search(r'(\d+(?:,\d+)*)', text.replace(' ', ''))
-                if price_match:
-                    try:
-                        price_num = int(price_match.group(1).replace(',', ''))
-                        if 1000 <= price_num <= 1000000:
-                            data["price_usd"] = price_num
-                            break
-                    except ValueError:
-                        continue
-
-    # 4. Odometer - улучшенный парсинг пробега
-    data["odometer"] = None
-    
-    # Ищем пробег по различным паттернам
-    odometer_patterns = [
-        r'(\d+)\s*тис\.\s*км',     # "95 тис. км"
-        r'(\d+)\s*тыс\.\s*км',     # "95 тыс. км"
-        r'(\d+)\s*000\s*км',       # "95 000 км"
-        r'(\d+)\s*км',             # "95000 км"
-    ]
-    
-    page_text = soup.get_text()
-    for pattern in odometer_patterns:
-        matches = re.findall(pattern, page_text)
-        for match in matches:
-            try:
-                odometer_num = int(match)
-                if pattern.endswith(r'тис\.\s*км') or pattern.endswith(r'тыс\.\s*км'):
-                    odometer_num *= 1000  # Конвертируем тысячи в полное число
-                if 0 <= odometer_num <= 1000000:  # Разумный диапазон пробега
-                    data["odometer"] = odometer_num
-                    break
-            except ValueError:
-                continue
-        if data["odometer"] is not None:
-            break
-    
-    # Альтернативный поиск в структурированных элементах
-    if data["odometer"] is None:
-        odometer_elements = soup.find_all(['div', 'span'], class_=re.compile(r'mileage|odometer|base-information', re.IGNORECASE))
-        for elem in odometer_elements:
-            text = elem.get_text(strip=True)
-            if 'км' in text:
-                for pattern in odometer_patterns:
-                    match = re.search(pattern, text)
-                    if match:
+            for elem in green_elements:
+                text = elem.get_text(strip=True)
+                if '$' in text or 'USD' in text:
+                    price_match = re.search(r'(\d+(?:,\d+)*)', text.replace(' ', ''))
+                    if price_match:
                         try:
-                            odometer_num = int(match.group(1))
-                            if pattern.endswith(r'тис\.\s*км') or pattern.endswith(r'тыс\.\s*км'):
-                                odometer_num *= 1000
-                            if 0 <= odometer_num <= 1000000:
-                                data["odometer"] = odometer_num
+                            price_num = int(price_match.group(1).replace(',', ''))
+                            if 1000 <= price_num <= 1000000:
+                                data.price_usd = price_num
                                 break
                         except ValueError:
                             continue
-                if data["odometer"] is not None:
-                    break
+
+    # 4. Odometer - улучшенный парсинг пробега
+    if data.odometer is None:
+        # Ищем пробег по различным паттернам
+        odometer_patterns = [
+            r'(\d+)\s*тис\.\s*км',     # "95 тис. км"
+            r'(\d+)\s*тыс\.\s*км',     # "95 тыс. км"
+            r'(\d+)\s*000\s*км',       # "95 000 км"
+            r'(\d+)\s*км',             # "95000 км"
+        ]
     
-    # Дополнительный поиск пробега в любом тексте на странице
-    if data["odometer"] is None:
         page_text = soup.get_text()
-        # Ищем пробег в формате "123 тыс. км" или "123000 км"
-        odometer_text_patterns = [
-            r'(\d+)\s*тис\.\s*км',
-            r'(\d+)\s*тыс\.\s*км', 
-            r'(\d+)\s*000\s*км',
-            r'Пробіг[:\s]*(\d+)\s*тис\.\s*км',
-            r'Пробіг[:\s]*(\d+)\s*тыс\.\s*км',
-            r'Пробіг[:\s]*(\d+)\s*км',
-        ]
-        
-        for pattern in odometer_text_patterns:
+        for pattern in odometer_patterns:
             matches = re.findall(pattern, page_text)
             for match in matches:
                 try:
                     odometer_num = int(match)
-                    if 'тис' in pattern or 'тыс' in pattern:
-                        odometer_num *= 1000
-                    if 1000 <= odometer_num <= 500000:  # Разумный диапазон
-                        data["odometer"] = odometer_num
+                    if pattern.endswith(r'тис\.\s*км') or pattern.endswith(r'тыс\.\s*км'):
+                        odometer_num *= 1000  # Конвертируем тысячи в полное число
+                    if 0 <= odometer_num <= 1000000:  # Разумный диапазон пробега
+                        data.odometer = odometer_num
                         break
                 except ValueError:
                     continue
-            if data["odometer"] is not None:
+            if data.odometer is not None:
                 break
+    
+        # Альтернативный поиск в структурированных элементах
+        if data.odometer is None:
+            odometer_elements = soup.find_all(['div', 'span'], class_=re.compile(r'mileage|odometer|base-information', re.IGNORECASE))
+            for elem in odometer_elements:
+                text = elem.get_text(strip=True)
+                if 'км' in text:
+                    for pattern in odometer_patterns:
+                        match = re.search(pattern, text)
+                        if match:
+                            try:
+                                odometer_num = int(match.group(1))
+                                if pattern.endswith(r'тис\.\s*км') or pattern.endswith(r'тыс\.\s*км'):
+                                    odometer_num *= 1000
+                                if 0 <= odometer_num <= 1000000:
+                                    data.odometer = odometer_num
+                                    break
+                            except ValueError:
+                                continue
+                    if data.odometer is not None:
+                        break
+    
+        # Дополнительный поиск пробега в любом тексте на странице
+        if data.odometer is None:
+            page_text = soup.get_text()
+            # Ищем пробег в формате "123 тыс. км" или "123000 км"
+            odometer_text_patterns = [
+                r'(\d+)\s*тис\.\s*км',
+                r'(\d+)\s*тыс\.\s*км', 
+                r'(\d+)\s*000\s*км',
+                r'Пробіг[:\s]*(\d+)\s*тис\.\s*км',
+                r'Пробіг[:\s]*(\d+)\s*тыс\.\s*км',
+                r'Пробіг[:\s]*(\d+)\s*км',
+            ]
+        
+            for pattern in odometer_text_patterns:
+                matches = re.findall(pattern, page_text)
+                for match in matches:
+                    try:
+                        odometer_num = int(match)
+                        if 'тис' in pattern or 'тыс' in pattern:
+                            odometer_num *= 1000
+                        if 1000 <= odometer_num <= 500000:  # Разумный диапазон
+                            data.odometer = odometer_num
+                            break
+                    except ValueError:
+                        continue
+                if data.odometer is not None:
+                    break
 
     # 5. Username - улучшенный парсинг имени продавца
-    data["username"] = None
-    
     # Метод 1: Классические селекторы
     username_selectors = [
         ('a', 'sellerPro'),
@@ -554,6 +838,8 @@ async def parse_regular_ad_page(url, soup, session, data):
     ]
     
     for tag, class_pattern in username_selectors:
+        if data.username:
+            break
         if isinstance(class_pattern, str):
             elem = soup.find(tag, class_=class_pattern)
         else:
@@ -562,20 +848,20 @@ async def parse_regular_ad_page(url, soup, session, data):
         if elem:
             username_text = elem.get_text(strip=True)
             if username_text and len(username_text) > 1:
-                data["username"] = username_text
+                data.username = username_text
                 break
     
     # Метод 2: Поиск по ссылкам на профили продавцов
-    if not data["username"]:
+    if not data.username:
         profile_links = soup.find_all('a', href=re.compile(r'/users/|/seller/|/profile/', re.IGNORECASE))
         for link in profile_links:
             text = link.get_text(strip=True)
             if text and len(text) > 1 and len(text) < 50:  # Разумная длина имени
-                data["username"] = text
+                data.username = text
                 break
     
     # Метод 3: Поиск в тексте страницы по паттернам
-    if not data["username"]:
+    if not data.username:
         page_text = soup.get_text()
         # Ищем паттерны типа "Продавець: Имя" или "Контакт: Имя"
         username_patterns = [
@@ -591,160 +877,172 @@ async def parse_regular_ad_page(url, soup, session, data):
                 potential_username = match.group(1).strip()
                 # Проверяем, что это не служебный текст
                 if not any(word in potential_username.lower() for word in ['показать', 'телефон', 'номер', 'контакт', 'інформація']):
-                    data["username"] = potential_username
+                    data.username = potential_username
                     break
 
     # 6. Phone Number (Now using async API call and taking the first one as BIGINT)
-    phones_list = await get_phone_from_ria(session, url)
-    if phones_list:
-        # Take the first phone number and clean it to a pure digit string
-        first_phone = phones_list[0]
-        cleaned_phone = re.sub(r'[^\d]', '', first_phone)
-        try:
-            data["phone_number"] = int(cleaned_phone) # Convert to BIGINT
-        except ValueError:
-            data["phone_number"] = None
+    seller_key = extract_seller_key(soup)
+    if Config.PHONE_ENRICHMENT == 'deferred':
+        # Телефон заполнит отдельный этап обогащения; сейчас берем только из кэша
+        phone_cache = get_phone_cache() if Config.PHONE_CACHE_ENABLED else None
+        cached_phones = phone_cache.lookup(ad_key(url), seller_key) if phone_cache is not None else None
+        data.phone_number = phone_to_bigint(cached_phones)
     else:
-        data["phone_number"] = None
+        phones_list = await get_phone_from_ria(session, url, seller_key)
+        # Take the first phone number and clean it to a pure digit string (BIGINT)
+        data.phone_number = phone_to_bigint(phones_list)
 
     # 7. Image URL
-    data["image_url"] = None
-
-    # Look for actual car photos first (not generic images)
-    img_tags = soup.find_all('img')
-    for img in img_tags:
-        src = img.get('src') or img.get('data-src')
-        if src and ('photosnew' in src or 'cdn' in src) and 'left-panel' not in src and 'avatar' not in src:
-            # Found a potential car image
-            data["image_url"] = urljoin("https://auto.ria.com", src)
-            break
+    if data.image_url is None:
+        # Look for actual car photos first (not generic images)
+        img_tags = soup.find_all('img')
+        for img in img_tags:
+            src = img.get('src') or img.get('data-src')
+            if src and ('photosnew' in src or 'cdn' in src) and 'left-panel' not in src and 'avatar' not in src:
+                # Found a potential car image
+                data.image_url = urljoin("https://auto.ria.com", src)
+                break
 
-    # If no car image found, try the picture tag approach as fallback
-    if not data["image_url"]:
-        picture_tag = soup.find('picture')
-        if picture_tag:
-            # Prioritize source with type='image/webp' from srcset
-            source_tag = picture_tag.find('source', type='image/webp')
-            if source_tag and source_tag.get('srcset'):
-                srcset_urls = source_tag.get('srcset').split(',')
-                if srcset_urls:
-                    relative_url = srcset_urls[0].strip().split(' ')[0]
-                    # Skip generic images
-                    if 'left-panel' not in relative_url and 'avatar' not in relative_url:
-                        data["image_url"] = urljoin("https://auto.ria.com", relative_url)
+        # If no car image found, try the picture tag approach as fallback
+        if not data.image_url:
+            picture_tag = soup.find('picture')
+            if picture_tag:
+                # Prioritize source with type='image/webp' from srcset
+                source_tag = picture_tag.find('source', type='image/webp')
+                if source_tag and source_tag.get('srcset'):
+                    srcset_urls = source_tag.get('srcset').split(',')
+                    if srcset_urls:
+                        relative_url = srcset_urls[0].strip().split(' ')[0]
+                        # Skip generic images
+                        if 'left-panel' not in relative_url and 'avatar' not in relative_url:
+                            data.image_url = urljoin("https://auto.ria.com", relative_url)
             
-            # Fallback to img tag's src if webp source not found or empty
-            if not data["image_url"]:
-                img_tag = picture_tag.find('img')
-                if img_tag and img_tag.get('src'):
-                    relative_url = img_tag.get('src')
-                    if 'left-panel' not in relative_url and 'avatar' not in relative_url:
-                        data["image_url"] = urljoin("https://auto.ria.com", relative_url)
-                elif img_tag and img_tag.get('data-src'):
-                    relative_url = img_tag.get('data-src')
-                    if 'left-panel' not in relative_url and 'avatar' not in relative_url:
-                        data["image_url"] = urljoin("https://auto.ria.com", relative_url)
+                # Fallback to img tag's src if webp source not found or empty
+                if not data.image_url:
+                    img_tag = picture_tag.find('img')
+                    if img_tag and img_tag.get('src'):
+                        relative_url = img_tag.get('src')
+                        if 'left-panel' not in relative_url and 'avatar' not in relative_url:
+                            data.image_url = urljoin("https://auto.ria.com", relative_url)
+                    elif img_tag and img_tag.get('data-src'):
+                        relative_url = img_tag.get('data-src')
+                        if 'left-panel' not in relative_url and 'avatar' not in relative_url:
+                            data.image_url = urljoin("https://auto.ria.com", relative_url)
 
     # 8. Images Count
-    images_count_link = soup.find('a', class_='show-all link-dotted')
-    if images_count_link:
-        text = images_count_link.get_text(strip=True)
-        match = re.search(r'\d+', text)
-        if match:
-            try:
-                data["images_count"] = int(match.group(0))
-            except ValueError:
-                data["images_count"] = None
+    if data.images_count is None:
+        images_count_link = soup.find('a', class_='show-all link-dotted')
+        if images_count_link:
+            text = images_count_link.get_text(strip=True)
+            match = re.search(r'\d+', text)
+            if match:
+                try:
+                    data.images_count = int(match.group(0))
+                except ValueError:
+                    data.images_count = None
 
     # 9. Car Number
-    car_number_span = soup.find('span', class_='state-num ua')
+    car_number_span = soup.find('span', class_='state-num ua') if data.car_number is None else None
     if car_number_span:
         popup_span = car_number_span.find('span', class_='popup')
         if popup_span:
             popup_span.extract() # Remove the popup text
-        data["car_number"] = car_number_span.get_text(strip=True)
-    else:
+        data.car_number = car_number_span.get_text(strip=True)
+    elif data.car_number is None:
         # Alternative: New format car number
         car_number_alt = soup.find('div', class_='car-number ua')
         if car_number_alt:
             car_number_text = car_number_alt.find('span', class_='common-text ws-pre-wrap badge')
             if car_number_text:
-                data["car_number"] = car_number_text.get_text(strip=True)
+                data.car_number = car_number_text.get_text(strip=True)
 
     # 10. Car VIN
-    car_vin_span = soup.find('span', class_='label-vin')
-    if not car_vin_span:
-        car_vin_span = soup.find('span', class_='vin-code')
-
-    if car_vin_span:
-        car_vin_text_raw = car_vin_span.get_text(strip=True)
-        car_vin_pattern = r'[A-HJ-NPR-Z0-9]{17}'
-        match = re.search(car_vin_pattern, car_vin_text_raw, re.IGNORECASE)
-        if match:
-            data["car_vin"] = match.group(0)
+    if data.car_vin is None:
+        car_vin_span = soup.find('span', class_='label-vin')
+        if not car_vin_span:
+            car_vin_span = soup.find('span', class_='vin-code')
+
+        if car_vin_span:
+            car_vin_text_raw = car_vin_span.get_text(strip=True)
+            car_vin_pattern = r'[A-HJ-NPR-Z0-9]{17}'
+            match = re.search(car_vin_pattern, car_vin_text_raw, re.IGNORECASE)
+            if match:
+                data.car_vin = match.group(0)
+            else:
+                # If a VIN-like pattern isn't found, keep the raw text if it's there
+                data.car_vin = car_vin_text_raw
         else:
-            # If a VIN-like pattern isn't found, keep the raw text if it's there
-            data["car_vin"] = car_vin_text_raw
-    else:
-        # Alternative: Look for VIN badge in new format
-        car_vin_badges = soup.find_all('span', class_='common-badge contrast medium')
-        for badge in car_vin_badges:
-            badge_text = badge.get_text(strip=True)
-            if 'VIN' in badge_text or 'Перевірений VIN' in badge_text:
-                # VIN verification badge found, but actual VIN might be elsewhere
-                # Look for VIN in nearby elements or data attributes
-                # For now, setting to None if not explicitly found in a VIN field
-                data["car_vin"] = None
-                break
+            # Alternative: Look for VIN badge in new format
+            car_vin_badges = soup.find_all('span', class_='common-badge contrast medium')
+            for badge in car_vin_badges:
+                badge_text = badge.get_text(strip=True)
+                if 'VIN' in badge_text or 'Перевірений VIN' in badge_text:
+                    # VIN verification badge found, but actual VIN might be elsewhere
+                    # Look for VIN in nearby elements or data attributes
+                    # For now, setting to None if not explicitly found in a VIN field
+                    data.car_vin = None
+                    break
 
     return data
 
 
-async def process_ad_batch(session, ad_urls, existing_ad_urls, semaphore):
-    """Асинхронная обработка пакета объявлений с ограничением количества одновременных запросов"""
-    results = []
-    
+async def process_ad_batch(session, ad_urls, existing_ad_urls, semaphore, failures=None):
+    """Асинхронная обработка пакета объявлений с ограничением количества одновременных запросов.
+
+    В failures (если передан словарь) записываются причины неудач по URL.
+    Вместо вывода каждого объявления в лог пишется одна сводка по пакету.
+    """
+    batch_failures = {} if failures is None else failures
+    skipped = 0
+
     async def process_single_ad(ad_url):
+        nonlocal skipped
         async with semaphore:  # Ограничиваем количество одновременных запросов
             if ad_url in existing_ad_urls:
-                print(f"⏭️  Skipping already processed ad: {ad_url}")
+                skipped += 1
+                logger.debug(f"⏭️  Skipping already processed ad: {ad_url}", extra={'event': 'ad_skipped', 'url': ad_url})
                 return None
 
-            print(f"🔄 Processing ad: {ad_url}")
             try:
                 ad_page_html = await fetch_html_with_aiohttp(session, ad_url)
                 if ad_page_html:
+                    parse_started = time.monotonic()
                     ad_data = await parse_ad_page(ad_url, ad_page_html, session)
+                    get_run_stats().parse_times.add(time.monotonic() - parse_started)
                     if ad_data:
-                        print("    --- Advertisement Data ---")
-                        for key, value in ad_data.items():
-                            print(f"    {key.replace('_', ' ').title()}: {value}")
-                        print("    --------------------------")
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug(f"🔄 Processed ad: {ad_url}", extra={'event': 'ad_processed', **ad_data.to_dict()})
                         return ad_data
-                    else:
-                        print(f"    ❌ Failed to parse advertisement data for {ad_url}.")
+                    batch_failures[ad_url] = "parse: no data"
                 else:
-                    print(f"    ❌ Failed to fetch ad page: {ad_url}")
+                    batch_failures[ad_url] = "fetch: no response"
             except Exception as e:
-                print(f"    ❌ Error processing ad {ad_url}: {e}")
+                batch_failures[ad_url] = f"error: {e}"
             return None
 
+    started = time.monotonic()
     # Обрабатываем все объявления параллельно
-    print(f"🚀 Starting parallel processing of {len(ad_urls)} ads...")
     tasks = [process_single_ad(ad_url) for ad_url in ad_urls]
     results = await asyncio.gather(*tasks, return_exceptions=True)
-    
+
     # Фильтруем успешные результаты
     successful_results = []
-    error_count = 0
-    for i, result in enumerate(results):
+    for ad_url, result in zip(ad_urls, results):
         if isinstance(result, Exception):
-            print(f"❌ Error processing ad {ad_urls[i]}: {result}")
-            error_count += 1
+            batch_failures[ad_url] = f"error: {result}"
         elif result is not None:
             successful_results.append(result)
-    
-    print(f"📊 Batch processing complete: {len(successful_results)} successful, {error_count} errors, {len(ad_urls) - len(successful_results) - error_count} skipped")
+
+    batch_failed = [url for url in ad_urls if url in batch_failures]
+    get_run_stats().record_batch(len(successful_results), skipped, len(batch_failed))
+    for ad_url in batch_failed[:3]:
+        logger.warning(f"❌ Failed ad {ad_url}: {batch_failures[ad_url]}", extra={'event': 'ad_failed', 'url': ad_url})
+    logger.info(
+        f"📊 Batch processing complete: {len(successful_results)} successful, {len(batch_failed)} errors, {skipped} skipped",
+        extra={'event': 'batch_summary', 'ads': len(ad_urls), 'ok': len(successful_results),
+               'failed': len(batch_failed), 'skipped': skipped,
+               'duration_ms': round((time.monotonic() - started) * 1000)}
+    )
     return successful_results
 
 
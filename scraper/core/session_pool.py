@@ -0,0 +1,211 @@
+import asyncio
+import itertools
+import time
+
+import aiohttp
+
+from scraper.config import Config
+from scraper.core.transport import create_http_session, session_transport_name
+
+
+# Базовые cookies без идентификаторов посетителя (PHPSESSID, ui, _ga и т.п. сайт выдает при прогреве)
+BASE_COOKIES = {
+    'chk': '1',
+    'showNewFeatures': '7',
+    'extendedSearch': '1',
+    'informerIndex': '1',
+    'gdpr': '[2,3]',
+}
+
+# Ответы, после которых сессию считаем замеченной сайтом
+BLOCKED_STATUSES = (403, 429)
+
+
+class PooledSession:
+    """Сессия пула: своя cookie jar и свой пул соединений, оценка здоровья по доле ошибок"""
+
+    def __init__(self, number, session):
+        self.number = number
+        self.session = session
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.blocked_in_row = 0
+        self.error_rate = 0.0  # Экспоненциальное среднее: недавние ошибки важнее старых
+        self.retired = False
+
+    def record(self, ok, blocked=False):
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+        self.error_rate = self.error_rate * 0.8 + (0.0 if ok else 0.2)
+        self.blocked_in_row = self.blocked_in_row + 1 if blocked else 0
+
+    def load(self):
+        """Чем меньше, тем охотнее сессия получает следующий запрос"""
+        return (self.in_flight + 1) * (1 + 10 * self.error_rate)
+
+    def __repr__(self):
+        return f"session #{self.number}"
+
+
+class _PooledRequest:
+    def __init__(self, pool, url, kwargs):
+        self._pool = pool
+        self._url = url
+        self._kwargs = kwargs
+        self._member = None
+        self._request = None
+
+    async def __aenter__(self):
+        self._member = await self._pool._pick()
+        self._member.in_flight += 1
+        try:
+            self._request = self._member.session.get(self._url, **self._kwargs)
+            response = await self._request.__aenter__()
+        except BaseException as e:
+            # Слот освобождается при любом исключении, включая отмену задачи (CancelledError)
+            if isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError)):
+                self._member.record(ok=False)
+            await self._release()
+            raise
+        blocked = response.status in BLOCKED_STATUSES
+        self._member.record(ok=response.status < 500 and not blocked, blocked=blocked)
+        if blocked and self._member.blocked_in_row >= Config.SESSION_RETIRE_AFTER:
+            self._pool._retire(self._member, f"HTTP {response.status}")
+        return response
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            return await self._request.__aexit__(exc_type, exc, tb)
+        finally:
+            await self._release()
+
+    async def _release(self):
+        self._member.in_flight -= 1
+        if self._member.retired and self._member.in_flight == 0:
+            await self._member.session.close()
+
+
+class _PoolCookieJar:
+    """Обновление cookies во всех сессиях пула"""
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def update_cookies(self, cookies):
+        for member in self._pool.members:
+            member.session.cookie_jar.update_cookies(cookies)
+
+    def __len__(self):
+        return sum(len(member.session.cookie_jar) for member in self._pool.members)
+
+
+class SessionPool:
+    """Пул HTTP сессий с отдельными cookies и соединениями.
+
+    Повторяет интерфейс сессии (get/cookie_jar/transport_name), запрос уходит в наименее
+    загруженную здоровую сессию. Сессия, получившая SESSION_RETIRE_AFTER ответов 403/429
+    подряд, выводится из пула и заменяется новой прогретой сессией.
+    """
+
+    def __init__(self, size, session_factory=create_http_session):
+        self.size = max(int(size), 1)
+        self._session_factory = session_factory
+        self._numbers = itertools.count(1)
+        self.members = []
+        self.retired = []
+        self._replacements = set()
+        self.cookie_jar = _PoolCookieJar(self)
+        self.transport_name = 'aiohttp'
+
+    async def _new_member(self):
+        session = self._session_factory()
+        session.cookie_jar.update_cookies(BASE_COOKIES)
+        member = PooledSession(next(self._numbers), session)
+        self.transport_name = session_transport_name(session)
+        if Config.SESSION_WARMUP_URL:
+            await self._warm_up(member)
+        return member
+
+    async def _warm_up(self, member):
+        """Первый запрос к главной странице: сайт выставляет сессии свои cookies"""
+        try:
+            async with member.session.get(Config.SESSION_WARMUP_URL, headers=Config.COMMON_HEADERS) as response:
+                await response.read()
+                member.record(ok=response.status < 400, blocked=response.status in BLOCKED_STATUSES)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            member.record(ok=False)
+            print(f"⚠️ Warm-up of {member} failed: {e}")
+
+    async def start(self):
+        self.members = list(await asyncio.gather(*(self._new_member() for _ in range(self.size))))
+        cookies = sum(len(member.session.cookie_jar) for member in self.members)
+        print(f"🍪 Session pool ready: {len(self.members)} sessions, {cookies} cookies after warm-up")
+
+    async def warm_connections(self, urls, per_session):
+        """Открытие per_session keep-alive соединений к каждому URL в каждой сессии.
+
+        Одновременные запросы заставляют коннектор установить отдельные соединения
+        (DNS + TCP + TLS), которые затем переиспользуются первыми батчами обхода.
+        Возвращает длительность прогрева в секундах.
+        """
+        started = time.monotonic()
+
+        async def touch(member, url):
+            try:
+                async with member.session.get(url, headers=Config.COMMON_HEADERS) as response:
+                    await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"⚠️ Connection warm-up of {member} to {url} failed: {e}")
+
+        await asyncio.gather(*(touch(member, url) for member in self.members for url in urls for _ in range(per_session)))
+        return time.monotonic() - started
+
+    async def _pick(self):
+        while not self.members:
+            # Все сессии выведены - ждем прогрева замены
+            if not self._replacements:
+                self._start_replacement()
+            await asyncio.wait(list(self._replacements))
+        # При равной загрузке - сессия с меньшим числом запросов, чтобы нагрузка расходилась по всем
+        return min(self.members, key=lambda member: (member.load(), member.requests))
+
+    def _start_replacement(self):
+        task = asyncio.create_task(self._replace())
+        self._replacements.add(task)
+        task.add_done_callback(self._replacements.discard)
+
+    async def _replace(self):
+        self.members.append(await self._new_member())
+
+    def _retire(self, member, reason):
+        if member.retired:
+            return
+        member.retired = True
+        self.members.remove(member)
+        self.retired.append(member)
+        print(f"🚫 Retiring {member} after {member.blocked_in_row} x {reason}, starting a fresh one")
+        self._start_replacement()
+
+    def get(self, url, **kwargs):
+        return _PooledRequest(self, url, kwargs)
+
+    def summary(self):
+        lines = [f"{member}: {member.requests} requests, {member.errors} errors" for member in self.members]
+        lines += [f"{member} (retired): {member.requests} requests, {member.errors} errors" for member in self.retired]
+        return '\n'.join(f"   - {line}" for line in lines)
+
+    async def close(self):
+        for task in list(self._replacements):
+            task.cancel()
+        for member in self.members + self.retired:
+            if not member.session.closed:
+                await member.session.close()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
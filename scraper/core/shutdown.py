@@ -0,0 +1,109 @@
+import asyncio
+import functools
+import signal
+
+from scraper.core.log import get_logger
+
+logger = get_logger(__name__)
+
+
+class ShutdownCoordinator:
+    """Порядок остановки по SIGINT/SIGTERM внутри event loop.
+
+    1. stopping = True: обход листинга больше не берет новые страницы (проверка в циклах обхода);
+    2. drain(): уже загруженные страницы дообрабатываются, задания ждем не дольше deadline;
+    3. после drain вызывающий сохраняет буфер и checkpoint через общий пул БД.
+    Повторный сигнал отменяет задания сразу.
+    """
+
+    def __init__(self):
+        self._event = None
+        self._force = None
+        self._jobs = set()
+        self.signum = None
+
+    def _ensure_events(self):
+        if self._event is None:
+            self._event = asyncio.Event()
+            self._force = asyncio.Event()
+
+    def install(self, loop):
+        """Обработчики сигналов в event loop (вместо signal.signal, без блокировок в контексте сигнала).
+
+        На Windows add_signal_handler не поддерживается: сигнал принимает signal.signal,
+        а остановка передается в event loop через call_soon_threadsafe.
+        """
+        self._ensure_events()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self.request, signum)
+            except NotImplementedError:
+                signal.signal(signum, lambda signum, frame: loop.call_soon_threadsafe(self.request, signum))
+
+    def request(self, signum=None):
+        self._ensure_events()
+        if self._event.is_set():
+            logger.warning("🛑 Second signal received. Cancelling in-flight work...", extra={'event': 'shutdown_forced'})
+            self._force.set()
+            return
+        self.signum = signum
+        reason = f"Received signal {signum}" if signum is not None else "Shutdown requested"
+        logger.warning(f"🛑 {reason}. Stopping discovery, finishing in-flight pages...",
+                       extra={'event': 'shutdown_requested', 'signum': signum})
+        self._event.set()
+
+    @property
+    def stopping(self):
+        return self._event is not None and self._event.is_set()
+
+    async def wait(self):
+        self._ensure_events()
+        await self._event.wait()
+
+    async def sleep(self, seconds):
+        """Пауза, прерываемая остановкой. True - остановка запрошена"""
+        self._ensure_events()
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        return self._event.is_set()
+
+    def job(self, func):
+        """Обертка корутины задания: drain() дожидается ее завершения"""
+        @functools.wraps(func)
+        async def tracked(*args, **kwargs):
+            task = asyncio.current_task()
+            self._jobs.add(task)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self._jobs.discard(task)
+        return tracked
+
+    async def drain(self, deadline):
+        """Ожидание заданий не дольше deadline секунд, затем отмена оставшихся. Возвращает число отмененных"""
+        self._ensure_events()
+        jobs = {task for task in self._jobs if task is not asyncio.current_task()}
+        if not jobs:
+            return 0
+        logger.info(f"⏳ Waiting up to {deadline:.0f}s for {len(jobs)} running job(s) to finish...",
+                    extra={'event': 'shutdown_drain', 'jobs': len(jobs)})
+        loop = asyncio.get_running_loop()
+        ends_at = loop.time() + deadline
+        force_waiter = asyncio.create_task(self._force.wait())
+        pending = jobs
+        try:
+            while pending and not force_waiter.done() and loop.time() < ends_at:
+                await asyncio.wait(pending | {force_waiter}, timeout=ends_at - loop.time(),
+                                   return_when=asyncio.FIRST_COMPLETED)
+                pending = {task for task in pending if not task.done()}
+        finally:
+            force_waiter.cancel()
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.warning(f"⚠️ Cancelled {len(pending)} job(s) after the shutdown deadline",
+                           extra={'event': 'shutdown_cancelled', 'jobs': len(pending)})
+        return len(pending)
@@ -0,0 +1,169 @@
+import json
+import re
+from urllib.parse import urljoin
+
+
+# Блоки <script type="application/ld+json"> ищем прямо в сыром HTML, без построения DOM
+LD_JSON_SCRIPT_RE = re.compile(
+    r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+
+# Типы schema.org, которые описывают сам автомобиль
+VEHICLE_TYPES = {'car', 'vehicle', 'product', 'motorizedvehicle', 'individualproduct'}
+
+VIN_RE = re.compile(r'^[A-HJ-NPR-Z0-9]{17}$', re.IGNORECASE)
+
+_decoder = json.JSONDecoder()
+
+
+def iter_json_values(text):
+    """Потоковое декодирование подряд идущих JSON-значений из текста скрипта"""
+    position = 0
+    length = len(text)
+    while position < length:
+        # Пропускаем пробелы и разделители между значениями
+        while position < length and text[position] in ' \t\r\n;,':
+            position += 1
+        if position >= length:
+            break
+        try:
+            value, position = _decoder.raw_decode(text, position)
+        except json.JSONDecodeError:
+            break
+        yield value
+
+
+def iter_ld_json_nodes(html_content):
+    """Перебор всех объектов JSON-LD на странице (включая @graph и списки)"""
+    for match in LD_JSON_SCRIPT_RE.finditer(html_content):
+        body = match.group(1).strip()
+        if not body:
+            continue
+        # Некоторые страницы оборачивают JSON в HTML-комментарий
+        if body.startswith('<!--'):
+            body = body[4:]
+        if body.endswith('-->'):
+            body = body[:-3]
+        for value in iter_json_values(body):
+            stack = [value]
+            while stack:
+                node = stack.pop()
+                if isinstance(node, list):
+                    stack.extend(reversed(node))
+                elif isinstance(node, dict):
+                    if isinstance(node.get('@graph'), list):
+                        stack.extend(reversed(node['@graph']))
+                    yield node
+
+
+def _node_types(node):
+    node_type = node.get('@type')
+    if isinstance(node_type, str):
+        return {node_type.lower()}
+    if isinstance(node_type, list):
+        return {t.lower() for t in node_type if isinstance(t, str)}
+    return set()
+
+
+def _to_int(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        digits = re.sub(r'[^\d.]', '', value.replace(',', '.'))
+        try:
+            return int(float(digits)) if digits else None
+        except ValueError:
+            return None
+    return None
+
+
+def _extract_price_usd(offers):
+    """Цена в USD из offers (объект, список или priceSpecification)"""
+    if isinstance(offers, list):
+        for offer in offers:
+            price = _extract_price_usd(offer)
+            if price is not None:
+                return price
+        return None
+    if not isinstance(offers, dict):
+        return None
+
+    currency = str(offers.get('priceCurrency', '')).upper()
+    if currency == 'USD':
+        price = _to_int(offers.get('price'))
+        if price is not None and 0 < price <= 10000000:
+            return price
+    return _extract_price_usd(offers.get('priceSpecification'))
+
+
+def _extract_odometer(mileage):
+    """Пробег в км из mileageFromOdometer (QuantitativeValue)"""
+    if isinstance(mileage, dict):
+        value = _to_int(mileage.get('value'))
+        unit = str(mileage.get('unitCode', 'KMT')).upper()
+    else:
+        value = _to_int(mileage)
+        unit = 'KMT'
+    if value is None:
+        return None
+    if unit == 'SMI':
+        value = int(value * 1.609344)
+    return value if 0 <= value <= 5000000 else None
+
+
+def _image_url(image):
+    if isinstance(image, str):
+        return image
+    if isinstance(image, dict):
+        return image.get('contentUrl') or image.get('url')
+    return None
+
+
+def extract_structured_ad_data(html_content):
+    """Извлечение полей объявления из JSON-LD разметки страницы.
+
+    Возвращает словарь только с найденными полями (title, price_usd, odometer,
+    car_vin, image_url, images_count); отсутствующие поля добираются DOM-эвристиками.
+    images_count - число фото в разметке, счетчик show-all на странице точнее и имеет приоритет.
+    """
+    found = {}
+    if not html_content or 'application/ld+json' not in html_content:
+        return found
+
+    for node in iter_ld_json_nodes(html_content):
+        if not _node_types(node) & VEHICLE_TYPES:
+            continue
+
+        if 'title' not in found:
+            name = node.get('name')
+            if isinstance(name, str) and name.strip():
+                found['title'] = name.strip()
+
+        if 'price_usd' not in found:
+            price = _extract_price_usd(node.get('offers'))
+            if price is not None:
+                found['price_usd'] = price
+
+        if 'odometer' not in found and 'mileageFromOdometer' in node:
+            odometer = _extract_odometer(node.get('mileageFromOdometer'))
+            if odometer is not None:
+                found['odometer'] = odometer
+
+        if 'car_vin' not in found:
+            vin = node.get('vehicleIdentificationNumber')
+            if isinstance(vin, str) and VIN_RE.match(vin.strip()):
+                found['car_vin'] = vin.strip().upper()
+
+        if 'image_url' not in found:
+            images = node.get('image')
+            image_list = images if isinstance(images, list) else [images]
+            urls = [url for url in (_image_url(image) for image in image_list) if url]
+            if urls:
+                found['image_url'] = urljoin("https://auto.ria.com", urls[0])
+                if isinstance(images, list) and len(urls) > 1:
+                    found['images_count'] = len(urls)
+
+    return found
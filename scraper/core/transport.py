@@ -0,0 +1,354 @@
+import codecs
+import contextvars
+import importlib.util
+import re
+import time
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from scraper.config import Config
+from scraper.core.polling import LatencySample
+
+
+def _module_available(name):
+    return importlib.util.find_spec(name) is not None
+
+
+# HTTP/2 клиент - опциональная зависимость (pip install "httpx[http2]")
+HTTPX_AVAILABLE = _module_available('httpx') and _module_available('h2')
+if HTTPX_AVAILABLE:
+    import httpx
+
+# Асинхронный DNS резолвер aiohttp - опциональная зависимость (pip install aiodns)
+AIODNS_AVAILABLE = _module_available('aiodns')
+
+
+def build_accept_encoding(transport):
+    """Список кодировок сжатия, которые транспорт действительно умеет распаковать"""
+    encodings = ['gzip', 'deflate']
+    if _module_available('brotli') or _module_available('brotlicffi'):
+        encodings.append('br')
+    # zstd распаковывает только httpx (через пакет zstandard)
+    if transport == 'httpx' and _module_available('zstandard'):
+        encodings.append('zstd')
+    return ', '.join(encodings)
+
+
+class TransportStats:
+    """Статистика транспорта: входящие байты, новые соединения, задержки ответов"""
+
+    def __init__(self, name):
+        self.name = name
+        self.requests = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.connections_opened = 0
+        self.encodings = {}
+        # Выборка ограниченного размера: демон пишет в одну статистику неделями
+        self.latencies = LatencySample()
+
+    def record_response(self, latency, content_encoding=None):
+        self.requests += 1
+        self.latencies.add(latency)
+        encoding = content_encoding or 'identity'
+        self.encodings[encoding] = self.encodings.get(encoding, 0) + 1
+
+    def record_bytes(self, nbytes):
+        self.bytes_in += nbytes
+
+    def record_error(self):
+        self.errors += 1
+
+    def median_latency(self):
+        return self.latencies.percentile(50) or 0.0
+
+    def summary(self):
+        encodings = ', '.join(f"{name}={count}" for name, count in sorted(self.encodings.items())) or '-'
+        return (f"{self.name}: {self.requests} requests, {self.errors} errors, "
+                f"{self.bytes_in / 1024:.1f} KiB in, {self.connections_opened} connections opened, "
+                f"median latency {self.median_latency() * 1000:.0f} ms, encodings: {encodings}")
+
+
+# Статистика текущего запуска: {транспорт: TransportStats}. Запуски (группы расписания, демон) идут
+# одновременно в одном event loop, поэтому словарь хранится в contextvar задачи запуска
+_transport_stats = contextvars.ContextVar('transport_stats', default=None)
+
+
+def reset_transport_stats():
+    """Новая статистика для текущего запуска (вызывать в задаче запуска до создания дочерних задач)"""
+    _transport_stats.set({})
+
+
+def current_transport_stats():
+    stats = _transport_stats.get()
+    if stats is None:
+        stats = {}
+        _transport_stats.set(stats)
+    return stats
+
+
+def get_transport_stats(name):
+    stats = current_transport_stats()
+    if name not in stats:
+        stats[name] = TransportStats(name)
+    return stats[name]
+
+
+def session_transport_name(session):
+    return getattr(session, 'transport_name', 'aiohttp')
+
+
+def record_response(session, started, response):
+    """Учет ответа (время до заголовков и кодировка сжатия) в статистике транспорта сессии"""
+    stats = get_transport_stats(session_transport_name(session))
+    stats.record_response(time.monotonic() - started, response.headers.get('Content-Encoding'))
+    return stats
+
+
+def response_wire_bytes(response, decoded_bytes, complete=True):
+    """Байты тела ответа на проводе (до распаковки gzip/br/zstd), а не после нее.
+
+    decoded_bytes - сколько распакованных байт прочитано, complete - тело прочитано целиком.
+    """
+    # httpx считает скачанные байты сам (и при досрочной остановке чтения)
+    downloaded = getattr(response, 'num_bytes_downloaded', None)
+    if downloaded is not None:
+        return downloaded
+    # aiohttp >= 3.12: счетчик сжатых байт потока
+    raw = getattr(getattr(response, 'content', None), 'total_raw_bytes', None)
+    if raw is not None:
+        return raw
+    if response.headers.get('Content-Encoding', 'identity') == 'identity':
+        return decoded_bytes
+    # Старый aiohttp: для сжатого тела известен только Content-Length (тело прочитано целиком)
+    content_length = getattr(response, 'content_length', None)
+    if complete and content_length is not None:
+        return content_length
+    return decoded_bytes
+
+
+# Объявление кодировки в начале HTML: <meta charset="..."> или <meta http-equiv=... content="...; charset=...">
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+META_CHARSET_SCAN = 4096
+
+
+def sniff_charset(body):
+    """Кодировка по <meta charset> в начале документа, иначе utf-8 (как fallback aiohttp по умолчанию)"""
+    match = META_CHARSET_RE.search(body[:META_CHARSET_SCAN])
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode('ascii')).name
+        except LookupError:
+            pass
+    return 'utf-8'
+
+
+def response_charset(response, first_chunk):
+    """Кодировка для потокового декодирования: charset из Content-Type, иначе определяется по первому куску.
+
+    Тот же резолвер стоит в aiohttp сессии (fallback_charset_resolver), поэтому
+    потоковое чтение и response.text() декодируют страницу одинаково.
+    """
+    return response.charset or sniff_charset(first_chunk)
+
+
+def format_transport_report():
+    return '\n'.join(f"   - {stats.summary()}" for stats in current_transport_stats().values())
+
+
+def _build_trace_config(name):
+    """Трассировка aiohttp: считаем установленные соединения"""
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_connection_create_end(session, trace_config_ctx, params):
+        # Статистика берется по имени: сессия переживает reset_transport_stats между запусками
+        get_transport_stats(name).connections_opened += 1
+
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    return trace_config
+
+
+def create_dns_resolver():
+    """Резолвер DNS: aiodns (DNS_RESOLVER=async) или системный в пуле потоков"""
+    if Config.DNS_RESOLVER == 'async':
+        if AIODNS_AVAILABLE:
+            return aiohttp.AsyncResolver()
+        print("⚠️ DNS_RESOLVER=async requested but aiodns is not installed. Falling back to threaded resolver.")
+    return aiohttp.ThreadedResolver()
+
+
+def create_aiohttp_session():
+    """aiohttp сессия с явным Accept-Encoding, кэшем DNS и настроенным keep-alive"""
+    connector = aiohttp.TCPConnector(
+        limit=Config.CONNECTION_LIMIT,
+        limit_per_host=Config.CONNECTION_LIMIT_PER_HOST,
+        resolver=create_dns_resolver(),
+        use_dns_cache=True,
+        ttl_dns_cache=Config.DNS_CACHE_TTL,
+        keepalive_timeout=Config.KEEPALIVE_TIMEOUT
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=Config.CONNECTION_TIMEOUT,
+        connect=Config.CONNECT_TIMEOUT
+    )
+    headers = dict(Config.COMMON_HEADERS)
+    headers['Accept-Encoding'] = build_accept_encoding('aiohttp')
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout,
+        cookie_jar=aiohttp.CookieJar(),
+        headers=headers,
+        fallback_charset_resolver=lambda response, body: sniff_charset(body),
+        trace_configs=[_build_trace_config('aiohttp')]
+    )
+
+
+def create_http_session():
+    """Создание HTTP сессии для выбранного транспорта (HTTP_TRANSPORT=aiohttp|httpx)"""
+    if Config.HTTP_TRANSPORT == 'httpx':
+        if HTTPX_AVAILABLE:
+            return HttpxSession()
+        print("⚠️ HTTP_TRANSPORT=httpx requested but httpx/h2 are not installed. Falling back to aiohttp.")
+    return create_aiohttp_session()
+
+
+class _HttpxContent:
+    """Аналог response.content из aiohttp для потокового чтения"""
+
+    def __init__(self, response):
+        self._response = response
+        self._chunks = None
+
+    async def iter_chunked(self, chunk_size):
+        # Один итератор на ответ: повторный вызов продолжает чтение, как StreamReader в aiohttp
+        if self._chunks is None:
+            self._chunks = self._response.aiter_bytes(chunk_size)
+        try:
+            async for chunk in self._chunks:
+                yield chunk
+        except httpx.HTTPError as e:
+            raise aiohttp.ClientPayloadError(str(e)) from e
+
+
+class _HttpxResponse:
+    """Обертка ответа httpx с интерфейсом, который использует скрапер (status, text, json, content)"""
+
+    def __init__(self, response):
+        self._response = response
+        self.status = response.status_code
+        # Итоговый URL после редиректов, как response.url в aiohttp (по нему определяются снятые объявления)
+        self.url = URL(str(response.url))
+        self.headers = response.headers
+        self.charset = response.charset_encoding
+        self.content = _HttpxContent(response)
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            request_info = aiohttp.RequestInfo(
+                url=self.url,
+                method=self._response.request.method,
+                headers=CIMultiDictProxy(CIMultiDict(self._response.request.headers.items())),
+                real_url=self.url
+            )
+            raise aiohttp.ClientResponseError(
+                request_info, (), status=self.status, message=self._response.reason_phrase
+            )
+
+    @property
+    def num_bytes_downloaded(self):
+        return self._response.num_bytes_downloaded
+
+    async def read(self):
+        try:
+            return await self._response.aread()
+        except httpx.HTTPError as e:
+            raise aiohttp.ClientPayloadError(str(e)) from e
+
+    async def text(self):
+        await self.read()
+        return self._response.text
+
+    async def json(self):
+        await self.read()
+        return self._response.json()
+
+
+class _HttpxRequestContext:
+    def __init__(self, client, url, headers, trace):
+        self._client = client
+        self._url = url
+        self._headers = headers
+        self._trace = trace
+        self._response = None
+
+    async def __aenter__(self):
+        request = self._client.build_request(
+            'GET', self._url, headers=self._headers, extensions={'trace': self._trace}
+        )
+        try:
+            self._response = await self._client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            raise aiohttp.ClientConnectionError(str(e)) from e
+        return _HttpxResponse(self._response)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._response is not None:
+            await self._response.aclose()
+
+
+class _HttpxCookieJar:
+    def __init__(self, client):
+        self._client = client
+
+    def update_cookies(self, cookies):
+        self._client.cookies.update(cookies)
+
+    def __len__(self):
+        return len(self._client.cookies.jar)
+
+
+class HttpxSession:
+    """HTTP/2 сессия на httpx с интерфейсом aiohttp.ClientSession (get/cookie_jar/close).
+
+    Запросы к одному хосту мультиплексируются в нескольких HTTP/2 соединениях.
+    """
+
+    transport_name = 'httpx'
+
+    def __init__(self):
+        headers = dict(Config.COMMON_HEADERS)
+        headers['Accept-Encoding'] = build_accept_encoding('httpx')
+        self._client = httpx.AsyncClient(
+            http2=True,
+            headers=headers,
+            follow_redirects=True,
+            timeout=httpx.Timeout(Config.CONNECTION_TIMEOUT, connect=Config.CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=Config.CONNECTION_LIMIT,
+                max_keepalive_connections=Config.CONNECTION_LIMIT_PER_HOST,
+                keepalive_expiry=Config.KEEPALIVE_TIMEOUT
+            )
+        )
+        self.cookie_jar = _HttpxCookieJar(self._client)
+
+    async def _trace(self, event_name, info):
+        if event_name == 'connection.connect_tcp.complete':
+            get_transport_stats(self.transport_name).connections_opened += 1
+
+    def get(self, url, headers=None, **kwargs):
+        return _HttpxRequestContext(self._client, url, headers, self._trace)
+
+    @property
+    def closed(self):
+        return self._client.is_closed
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -0,0 +1,92 @@
+import re
+
+# Значения параметров в порядке от осторожных к агрессивным
+TUNE_SPACE = {
+    'SEMAPHORE_LIMIT': [2, 3, 4, 6, 8],
+    'BATCH_SIZE': [5, 10, 20],
+    'BATCH_DELAY': [2.0, 1.0, 0.5, 0.0],
+    'PAGE_DELAY': [3.0, 2.0, 1.0, 0.5],
+    'CONNECTION_LIMIT_PER_HOST': [10, 20, 40],
+}
+
+
+class TuningAborted(Exception):
+    """Подбор прерван (остановка процесса) - .env не меняется"""
+
+
+class ProbeResult:
+    """Итог короткого пробного обхода с одним набором параметров"""
+
+    def __init__(self, params, ads, attempted, failed, requests, errors, seconds):
+        self.params = dict(params)
+        self.ads = ads
+        self.attempted = attempted
+        self.failed = failed
+        self.requests = requests
+        self.errors = errors
+        self.seconds = seconds
+
+    @property
+    def ads_per_min(self):
+        return self.ads * 60 / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def error_rate(self):
+        """Худшая из долей: неудачных объявлений и HTTP ошибок (403/429/5xx, сеть)"""
+        ad_errors = self.failed / self.attempted if self.attempted else 0.0
+        http_errors = self.errors / self.requests if self.requests else 0.0
+        return max(ad_errors, http_errors)
+
+    def __repr__(self):
+        return f"{self.ads_per_min:.1f} ads/min, {self.error_rate:.1%} errors"
+
+
+async def greedy_search(baseline, probe, space=TUNE_SPACE, max_error_rate=0.05, max_probes=12, min_gain=0.05):
+    """Поиск параметров по одному: значения агрессивнее текущего пробуются по порядку.
+
+    probe(params) -> ProbeResult. Значение принимается, если дает на min_gain больше ads/min при
+    доле ошибок не выше max_error_rate; после первого превышения более агрессивные значения
+    параметра не пробуются. Всего не больше max_probes пробных обходов.
+    Возвращает (лучший ProbeResult или None, список всех результатов).
+    """
+    results = []
+    best = await probe(dict(baseline))
+    results.append(best)
+    if best.error_rate > max_error_rate:
+        # Ошибки уже на текущих настройках - ускорять нечего
+        return None, results
+
+    for name, values in space.items():
+        current = best.params.get(name)
+        # Более осторожные значения, чем текущее, быстрее не будут
+        start = values.index(current) + 1 if current in values else 0
+        for value in values[start:]:
+            if len(results) >= max_probes:
+                return best, results
+            params = dict(best.params, **{name: value})
+            result = await probe(params)
+            results.append(result)
+            if result.error_rate > max_error_rate:
+                break
+            if result.ads_per_min > best.ads_per_min * (1 + min_gain):
+                best = result
+    return best, results
+
+
+def update_env_file(path, params):
+    """Запись параметров в .env: существующие строки заменяются, новые добавляются в конец"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        lines = []
+    remaining = dict(params)
+    for i, line in enumerate(lines):
+        match = re.match(r'^\s*(?:export\s+)?([A-Z0-9_]+)\s*=', line)
+        if match and match.group(1) in remaining:
+            lines[i] = f"{match.group(1)}={remaining.pop(match.group(1))}"
+    if remaining:
+        lines.append("# Подобрано командой --tune")
+        lines.extend(f"{name}={value}" for name, value in remaining.items())
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
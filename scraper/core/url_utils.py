@@ -0,0 +1,82 @@
+import re
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+
+# id объявления в URL: б/у - auto_<марка>_<модель>_<id>.html, новые - /newauto/auto-<марка>-<модель>-<id>.html,
+# объявления автосалонов - /auto-<марка>-<модель>-<id>.html (вне /newauto/)
+USED_AD_ID_RE = re.compile(r'_(\d+)\.html')
+NEWAUTO_AD_ID_RE = re.compile(r'-(\d+)\.html')
+AUTOSALON_AD_ID_RE = re.compile(r'/auto-[^/]*-(\d+)\.html')
+# Ключи автосалонов - отдельный диапазон отрицательных чисел, чтобы не совпасть с id newauto
+AUTOSALON_KEY_OFFSET = 10 ** 12
+
+
+def set_query_param(url, name, value):
+    """Установка (или замена) параметра запроса в URL, остальные параметры сохраняются"""
+    parts = urlsplit(url)
+    query = [(key, val) for key, val in parse_qsl(parts.query, keep_blank_values=True) if key != name]
+    query.append((name, str(value)))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+
+def listing_page_url(start_url, page):
+    """URL страницы листинга с указанным номером (пагинация auto.ria через ?page=N)"""
+    return set_query_param(start_url, 'page', page)
+
+
+def normalize_ad_url(href, base_url):
+    """Абсолютный URL объявления без параметров запроса и якоря, хост в нижнем регистре.
+
+    Одно и то же объявление в листинге встречается как относительная и абсолютная ссылка
+    или с метками (?utm_..., #photo) - после нормализации это один URL.
+    """
+    parts = urlsplit(urljoin(base_url, href.strip()))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, '', ''))
+
+
+def ad_key(url):
+    """Ключ объявления (BIGINT): id б/у объявления, минус id нового автомобиля
+    или минус (AUTOSALON_KEY_OFFSET + id) для объявления автосалона.
+
+    Не зависит от языка (/uk/), параметров и относительности ссылки. None - в URL нет id.
+    То же правило в SQL - AD_KEY_SQL в scraper.database.db_operations.
+    """
+    if '/newauto/' in url:
+        match = NEWAUTO_AD_ID_RE.search(url)
+        return -int(match.group(1)) if match else None
+    match = AUTOSALON_AD_ID_RE.search(url)
+    if match:
+        return -(AUTOSALON_KEY_OFFSET + int(match.group(1)))
+    match = USED_AD_ID_RE.search(url)
+    return int(match.group(1)) if match else None
+
+
+class AdKeySet:
+    """Множество объявлений по ключу ad_key: разные написания URL одного объявления совпадают.
+
+    URL без id хранятся как есть.
+    """
+
+    def __init__(self, urls=()):
+        self._keys = set()
+        self.update(urls)
+
+    @staticmethod
+    def _key(url):
+        key = ad_key(url)
+        return url if key is None else key
+
+    def add(self, url):
+        self._keys.add(self._key(url))
+
+    def add_key(self, key):
+        self._keys.add(key)
+
+    def update(self, urls):
+        self._keys.update(self._key(url) for url in urls)
+
+    def __contains__(self, url):
+        return self._key(url) in self._keys
+
+    def __len__(self):
+        return len(self._keys)
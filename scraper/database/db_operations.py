@@ -1,15 +1,21 @@
 import psycopg2
+from psycopg2.extras import execute_values
 import asyncpg
-import asyncio
-import os
 from scraper.config import Config
+from scraper.core.log import get_logger
+from scraper.core.run_stats import get_run_stats
+from scraper.core.url_utils import AdKeySet, ad_key
+from scraper.database.snapshots import append_snapshots_async, append_snapshots, ensure_snapshot_partitions_async, ensure_snapshot_partitions
 import datetime
+import time
+
+logger = get_logger(__name__)
 
 
 def connect_db():
     conn = None
     try:
-        print(f"Attempting to connect to PostgreSQL at: {Config.PG_HOST}:{Config.PG_PORT}, DB: {Config.PG_DBNAME}, User: {Config.PG_USER}")
+        logger.debug(f"Attempting to connect to PostgreSQL at: {Config.PG_HOST}:{Config.PG_PORT}, DB: {Config.PG_DBNAME}, User: {Config.PG_USER}")
         conn = psycopg2.connect(
             host=Config.PG_HOST,
             database=Config.PG_DBNAME,
@@ -17,17 +23,17 @@ def connect_db():
             password=Config.PG_PASSWORD,
             port=Config.PG_PORT
         )
-        print("Successfully connected to PostgreSQL database.")
+        logger.debug("Successfully connected to PostgreSQL database.")
         return conn
     except Exception as e:
-        print(f"Error connecting to PostgreSQL database: {e}")
+        logger.error(f"Error connecting to PostgreSQL database: {e}")
         return None
 
 
 async def connect_db_async():
     """Асинхронное подключение к базе данных"""
     try:
-        print(f"Attempting async connection to PostgreSQL at: {Config.PG_HOST}:{Config.PG_PORT}, DB: {Config.PG_DBNAME}, User: {Config.PG_USER}")
+        logger.debug(f"Attempting async connection to PostgreSQL at: {Config.PG_HOST}:{Config.PG_PORT}, DB: {Config.PG_DBNAME}, User: {Config.PG_USER}")
         conn = await asyncpg.connect(
             host=Config.PG_HOST,
             database=Config.PG_DBNAME,
@@ -35,13 +41,235 @@ async def connect_db_async():
             password=Config.PG_PASSWORD,
             port=Config.PG_PORT
         )
-        print("Successfully connected to PostgreSQL database (async).")
+        logger.debug("Successfully connected to PostgreSQL database (async).")
         return conn
     except Exception as e:
-        print(f"Error connecting to PostgreSQL database (async): {e}")
+        logger.error(f"Error connecting to PostgreSQL database (async): {e}")
         return None
 
 
+# Пул соединений asyncpg (создается лениво, привязан к event loop текущего запуска)
+_db_pool = None
+
+
+async def get_db_pool_async():
+    """Получение (и при необходимости создание) пула соединений asyncpg"""
+    global _db_pool
+    if _db_pool is None:
+        _db_pool = await asyncpg.create_pool(
+            host=Config.PG_HOST,
+            database=Config.PG_DBNAME,
+            user=Config.PG_USER,
+            password=Config.PG_PASSWORD,
+            port=Config.PG_PORT,
+            min_size=1,
+            max_size=Config.DB_POOL_SIZE
+        )
+    return _db_pool
+
+
+async def close_db_pool_async():
+    """Закрытие пула соединений в конце запуска"""
+    global _db_pool
+    if _db_pool is not None:
+        pool, _db_pool = _db_pool, None
+        await pool.close()
+
+
+# Колонки отслеживания изменений: хеш содержимого и время первого/последнего появления объявления
+CHANGE_TRACKING_COLUMNS = [
+    ("content_hash", "TEXT"),
+    ("first_seen", "TIMESTAMP WITH TIME ZONE"),
+    ("last_seen", "TIMESTAMP WITH TIME ZONE"),
+]
+
+# Токены API телефонов для отложенного обогащения и число неудачных попыток
+PHONE_TOKEN_COLUMNS = [
+    ("phone_hash", "TEXT"),
+    ("phone_expires", "BIGINT"),
+    ("phone_attempts", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+# Ключ объявления из URL в SQL - то же правило, что и scraper.core.url_utils.ad_key
+AD_KEY_SQL = r"""
+    CASE WHEN url ~ '/newauto/' THEN -(substring(url from '-(\d+)\.html')::bigint)
+         WHEN url ~ '/auto-[^/]*-\d+\.html' THEN -(1000000000000 + substring(url from '/auto-[^/]*-(\d+)\.html')::bigint)
+         ELSE substring(url from '_(\d+)\.html')::bigint END
+"""
+
+# Отметка на уникальном индексе ad_key: ключи выданы всем строкам по текущему правилу AD_KEY_SQL.
+# Пока отметка на месте, полная проверка таблицы при запуске не нужна; новое правило - новая отметка
+AD_KEY_MARK = 'ad_key v2: used, newauto, autosalon'
+AD_KEY_STATE_SQL = "SELECT obj_description(to_regclass('auto_ria_ads_ad_key_idx'), 'pg_class');"
+CREATE_AD_KEY_INDEX_SQL = "CREATE UNIQUE INDEX IF NOT EXISTS auto_ria_ads_ad_key_idx ON auto_ria_ads (ad_key);"
+MARK_AD_KEY_INDEX_SQL = f"COMMENT ON INDEX auto_ria_ads_ad_key_idx IS '{AD_KEY_MARK}';"
+FILL_AD_KEY_SQL = f"UPDATE auto_ria_ads SET ad_key = {AD_KEY_SQL} WHERE ad_key IS NULL AND ({AD_KEY_SQL}) IS NOT NULL;"
+
+# Объявления, сохраненные под несколькими написаниями URL (первые 10 групп)
+DUPLICATE_AD_KEYS_SQL = f"""
+    SELECT key, array_agg(url ORDER BY url) AS urls
+    FROM (SELECT url, COALESCE(ad_key, {AD_KEY_SQL}) AS key FROM auto_ria_ads) AS keyed
+    WHERE key IS NOT NULL
+    GROUP BY key HAVING count(*) > 1
+    ORDER BY key LIMIT 10;
+"""
+
+# Слияние дублей (только по явному --dedupe merge): остается самая свежая строка с самым ранним
+# first_seen группы, остальные удаляются; RETURNING - для журнала удаленных строк
+GROUP_DUPLICATE_ADS_SQL = f"""
+    CREATE TEMP TABLE ad_key_groups ON COMMIT DROP AS
+        SELECT url, key,
+               row_number() OVER (PARTITION BY key ORDER BY datetime_found DESC NULLS LAST, url) AS row_rank,
+               min(first_seen) OVER (PARTITION BY key) AS group_first_seen
+        FROM (SELECT url, datetime_found, first_seen, COALESCE(ad_key, {AD_KEY_SQL}) AS key FROM auto_ria_ads) AS keyed
+        WHERE key IS NOT NULL;
+    UPDATE auto_ria_ads AS a SET first_seen = g.group_first_seen
+    FROM ad_key_groups AS g
+    WHERE a.url = g.url AND g.row_rank = 1 AND g.group_first_seen < a.first_seen;
+"""
+DELETE_DUPLICATE_ADS_SQL = """
+    DELETE FROM auto_ria_ads AS a USING ad_key_groups AS g, ad_key_groups AS kept
+    WHERE a.url = g.url AND g.row_rank > 1 AND kept.key = g.key AND kept.row_rank = 1
+    RETURNING a.url, kept.url AS kept_url;
+"""
+
+
+class DuplicateAdsError(RuntimeError):
+    """В таблице есть дубли одного объявления: ключи не выдаются, пока их не сольют явно"""
+
+    def __init__(self, groups):
+        examples = '; '.join(', '.join(urls) for _, urls in groups[:3])
+        super().__init__(
+            f"{len(groups)}{'+' if len(groups) >= 10 else ''} ads are stored under several URL spellings "
+            f"in auto_ria_ads (e.g. {examples}). Review them and run `python -m scraper.main --dedupe merge` "
+            f"to keep the newest row of each ad and delete the others"
+        )
+
+
+# Для строк, сохраненных до появления колонок, первое/последнее появление - datetime_found
+BACKFILL_SEEN_SQL = """
+    UPDATE auto_ria_ads SET first_seen = datetime_found, last_seen = datetime_found
+    WHERE first_seen IS NULL;
+"""
+
+
+def build_ad_upsert_sql(placeholders, conflict_column='ad_key'):
+    """UPSERT объявлений, который переписывает строку только при изменении содержимого.
+
+    placeholders - 17 плейсхолдеров драйвера: колонки AdRecord, content_hash,
+    datetime_found, first_seen, last_seen, phone_hash, phone_expires, ad_key;
+    None - "VALUES %s" для многострочной вставки через execute_values.
+    Объявление определяется по ad_key (URL без id - по url), url строки не меняется. Если хеш не изменился,
+    строка обновляется (только last_seen) не чаще раза в LAST_SEEN_REFRESH_HOURS часов.
+    Известный телефон не затирается пустым (при отложенном обогащении он заполняется позже).
+    """
+    refresh_hours = int(Config.LAST_SEEN_REFRESH_HOURS)
+    return f"""
+        INSERT INTO auto_ria_ads (
+            url, title, price_usd, odometer, username, phone_number, image_url, images_count, car_number, car_vin,
+            content_hash, datetime_found, first_seen, last_seen, phone_hash, phone_expires, ad_key
+        ) VALUES {_values_clause(placeholders)}
+        ON CONFLICT ({conflict_column}) DO UPDATE SET
+            title = EXCLUDED.title,
+            price_usd = EXCLUDED.price_usd,
+            odometer = EXCLUDED.odometer,
+            username = EXCLUDED.username,
+            phone_number = COALESCE(EXCLUDED.phone_number, auto_ria_ads.phone_number),
+            image_url = EXCLUDED.image_url,
+            images_count = EXCLUDED.images_count,
+            car_number = EXCLUDED.car_number,
+            car_vin = EXCLUDED.car_vin,
+            content_hash = EXCLUDED.content_hash,
+            phone_hash = COALESCE(EXCLUDED.phone_hash, auto_ria_ads.phone_hash),
+            phone_expires = COALESCE(EXCLUDED.phone_expires, auto_ria_ads.phone_expires),
+            datetime_found = CASE WHEN auto_ria_ads.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+                                  THEN EXCLUDED.datetime_found ELSE auto_ria_ads.datetime_found END,
+            last_seen = EXCLUDED.last_seen
+        WHERE auto_ria_ads.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+           OR auto_ria_ads.last_seen IS NULL
+           OR auto_ria_ads.last_seen < EXCLUDED.last_seen - interval '{refresh_hours} hours';
+    """
+
+
+def ad_upsert_values(ad, timestamp):
+    return ad.as_tuple() + (ad.content_hash(), timestamp, timestamp, timestamp, ad.phone_hash, ad.phone_expires,
+                            ad_key(ad.url))
+
+
+def _values_clause(placeholders):
+    return "%s" if placeholders is None else f"({', '.join(placeholders)})"
+
+
+# Старая раскладка колонок (price, mileage, seller_name, phones, ...) - простой UPSERT по url
+def build_legacy_upsert_sql(placeholders):
+    return f"""
+        INSERT INTO auto_ria_ads (
+            url, title, price, mileage, seller_name, phones, image_url, total_photos, license_plate, vin, datetime_found
+        ) VALUES {_values_clause(placeholders)}
+        ON CONFLICT (url) DO UPDATE SET
+            title = EXCLUDED.title,
+            price = EXCLUDED.price,
+            mileage = EXCLUDED.mileage,
+            seller_name = EXCLUDED.seller_name,
+            phones = EXCLUDED.phones,
+            image_url = EXCLUDED.image_url,
+            total_photos = EXCLUDED.total_photos,
+            license_plate = EXCLUDED.license_plate,
+            vin = EXCLUDED.vin,
+            datetime_found = EXCLUDED.datetime_found;
+    """
+
+
+def legacy_upsert_values(ad, timestamp):
+    """price_usd -> price, odometer -> mileage, username -> seller_name, телефон строкой в phones,
+    images_count -> total_photos, car_number -> license_plate, car_vin -> vin"""
+    phone_str = str(ad.phone_number) if ad.phone_number else None
+    return (ad.url, ad.title, ad.price_usd, ad.odometer, ad.username, phone_str, ad.image_url,
+            ad.images_count, ad.car_number, ad.car_vin, timestamp)
+
+
+class SchemaAdapter:
+    """Раскладка колонок auto_ria_ads, определенная один раз: готовые UPSERT и проекция AdRecord -> строка.
+
+    Новая раскладка - UPSERT по ad_key (без id - по url) с отслеживанием изменений и снимками,
+    старая - UPSERT по url без снимков.
+    """
+
+    def __init__(self, columns):
+        self.legacy = 'price_usd' not in columns
+        self.writes_snapshots = not self.legacy
+        if self.legacy:
+            logger.debug("Using old column structure for compatibility")
+            width, build = 11, lambda placeholders, conflict_column: build_legacy_upsert_sql(placeholders)
+            conflict_columns = ('url',)
+        else:
+            width, build = 17, build_ad_upsert_sql
+            conflict_columns = ('ad_key', 'url')
+        self.async_sql = {column: build([f"${n}" for n in range(1, width + 1)], column) for column in conflict_columns}
+        self.batch_sql = {column: build(None, column) for column in conflict_columns}
+
+    def project(self, ads, timestamp):
+        """Строки для записи по колонке конфликта: {'ad_key': [...], 'url': [...]}.
+
+        Повторы одного объявления в пакете схлопываются в последнюю версию: многострочный
+        INSERT ... ON CONFLICT не может обновить одну строку дважды.
+        """
+        groups = {}
+        for ad in ads:
+            if self.legacy:
+                row, column, key = legacy_upsert_values(ad, timestamp), 'url', ad.url
+            else:
+                row = ad_upsert_values(ad, timestamp)
+                column, key = ('ad_key', row[-1]) if row[-1] is not None else ('url', ad.url)
+            groups.setdefault(column, {})[key] = row
+        return {column: list(rows.values()) for column, rows in groups.items()}
+
+
+_schema_adapter = None
+# Строк в одном INSERT при синхронной записи через execute_values
+EXECUTE_VALUES_PAGE_SIZE = 500
+
+
 def get_table_columns(conn):
     """Get existing columns in auto_ria_ads table"""
     try:
@@ -55,7 +283,7 @@ def get_table_columns(conn):
         columns = cur.fetchall()
         return {col[0]: col[1] for col in columns}
     except Exception as e:
-        print(f"Error getting table columns: {e}")
+        logger.error(f"Error getting table columns: {e}")
         return {}
 
 
@@ -70,338 +298,323 @@ async def get_table_columns_async(conn):
         """)
         return {row['column_name']: row['data_type'] for row in rows}
     except Exception as e:
-        print(f"Error getting table columns (async): {e}")
+        logger.error(f"Error getting table columns (async): {e}")
         return {}
 
 
-async def save_data_to_postgresql_async(all_ads_data):
-    """Асинхронное сохранение данных в PostgreSQL"""
-    conn = await connect_db_async()
-    if conn:
-        try:
-            # First, check existing table structure
-            existing_columns = await get_table_columns_async(conn)
-            print(f"Existing table columns: {list(existing_columns.keys())}")
-            
-            # Create table if not exists with new structure
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS auto_ria_ads (
-                    id SERIAL PRIMARY KEY,
-                    url TEXT UNIQUE,
-                    title TEXT,
-                    price_usd INTEGER,
-                    odometer INTEGER,
-                    username TEXT,
-                    phone_number BIGINT,
-                    image_url TEXT,
-                    images_count INTEGER,
-                    car_number TEXT,
-                    car_vin TEXT,
-                    datetime_found TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            
-            # Check if we have old column names and need to migrate or use them
-            has_old_columns = any(col in existing_columns for col in ['price', 'mileage', 'seller_name', 'phones'])
-            has_new_columns = any(col in existing_columns for col in ['price_usd', 'odometer', 'username', 'phone_number'])
-            
-            if has_old_columns and not has_new_columns:
-                print("Detected old column structure. Adding new columns...")
-                # Add new columns alongside old ones
-                columns_to_add = [
-                    ("price_usd", "INTEGER"),
-                    ("odometer", "INTEGER"), 
-                    ("username", "TEXT"),
-                    ("phone_number", "BIGINT"),
-                    ("images_count", "INTEGER"),
-                    ("car_number", "TEXT"),
-                    ("car_vin", "TEXT")
-                ]
-                
-                for column_name, column_type in columns_to_add:
-                    try:
-                        await conn.execute(f"ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS {column_name} {column_type};")
-                        print(f"Added {column_name} column to auto_ria_ads table.")
-                    except Exception as e:
-                        print(f"Warning: Could not add {column_name} column: {e}")
-            
-            # Ensure datetime_found column exists
+async def ensure_ads_table_async(conn, merge_duplicates=False):
+    """Создание таблицы и миграции колонок. Возвращает колонки таблицы после миграций.
+
+    Дубли одного объявления автоматически не удаляются: без merge_duplicates миграция ad_key
+    останавливается с DuplicateAdsError.
+    """
+    # First, check existing table structure
+    existing_columns = await get_table_columns_async(conn)
+    logger.debug(f"Existing table columns: {list(existing_columns.keys())}")
+    # Create table if not exists with new structure
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS auto_ria_ads (
+            id SERIAL PRIMARY KEY,
+            url TEXT UNIQUE,
+            title TEXT,
+            price_usd INTEGER,
+            odometer INTEGER,
+            username TEXT,
+            phone_number BIGINT,
+            image_url TEXT,
+            images_count INTEGER,
+            car_number TEXT,
+            car_vin TEXT,
+            datetime_found TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            content_hash TEXT,
+            first_seen TIMESTAMP WITH TIME ZONE,
+            last_seen TIMESTAMP WITH TIME ZONE,
+            phone_hash TEXT,
+            phone_expires BIGINT,
+            phone_attempts INTEGER NOT NULL DEFAULT 0,
+            ad_key BIGINT
+        );
+    """)
+    
+    # Check if we have old column names and need to migrate or use them
+    has_old_columns = any(col in existing_columns for col in ['price', 'mileage', 'seller_name', 'phones'])
+    has_new_columns = any(col in existing_columns for col in ['price_usd', 'odometer', 'username', 'phone_number'])
+    
+    if has_old_columns and not has_new_columns:
+        logger.info("Detected old column structure. Adding new columns...")
+        # Add new columns alongside old ones
+        columns_to_add = [
+            ("price_usd", "INTEGER"),
+            ("odometer", "INTEGER"), 
+            ("username", "TEXT"),
+            ("phone_number", "BIGINT"),
+            ("images_count", "INTEGER"),
+            ("car_number", "TEXT"),
+            ("car_vin", "TEXT")
+        ]
+        
+        for column_name, column_type in columns_to_add:
             try:
-                await conn.execute("ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS datetime_found TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;")
-                print("Ensured datetime_found column exists in auto_ria_ads table.")
+                await conn.execute(f"ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS {column_name} {column_type};")
+                logger.info(f"Added {column_name} column to auto_ria_ads table.")
             except Exception as e:
-                print(f"Warning: Could not add datetime_found column: {e}")
-
-            # Get updated column list
-            existing_columns = await get_table_columns_async(conn)
-            
-            # Подготавливаем данные для batch insert
-            if 'price_usd' in existing_columns:
-                # Use new column names
-                insert_query = """
-                    INSERT INTO auto_ria_ads (
-                        url, title, price_usd, odometer, username, phone_number, image_url, images_count, car_number, car_vin, datetime_found
-                    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
-                    ON CONFLICT (url) DO UPDATE SET
-                        title = EXCLUDED.title,
-                        price_usd = EXCLUDED.price_usd,
-                        odometer = EXCLUDED.odometer,
-                        username = EXCLUDED.username,
-                        phone_number = EXCLUDED.phone_number,
-                        image_url = EXCLUDED.image_url,
-                        images_count = EXCLUDED.images_count,
-                        car_number = EXCLUDED.car_number,
-                        car_vin = EXCLUDED.car_vin,
-                        datetime_found = EXCLUDED.datetime_found;
-                """
-                
-                # Подготавливаем данные для batch insert
-                current_timestamp = datetime.datetime.now()
-                data_to_insert = []
-                for ad_data in all_ads_data:
-                    data_to_insert.append((
-                        ad_data.get('url'),
-                        ad_data.get('title'),
-                        ad_data.get('price_usd'),
-                        ad_data.get('odometer'),
-                        ad_data.get('username'),
-                        ad_data.get('phone_number'),
-                        ad_data.get('image_url'),
-                        ad_data.get('images_count'),
-                        ad_data.get('car_number'),
-                        ad_data.get('car_vin'),
-                        current_timestamp
-                    ))
-            else:
-                # Fallback to old column names if new ones don't exist
-                print("Using old column structure for compatibility")
-                insert_query = """
-                    INSERT INTO auto_ria_ads (
-                        url, title, price, mileage, seller_name, phones, image_url, total_photos, license_plate, vin, datetime_found
-                    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
-                    ON CONFLICT (url) DO UPDATE SET
-                        title = EXCLUDED.title,
-                        price = EXCLUDED.price,
-                        mileage = EXCLUDED.mileage,
-                        seller_name = EXCLUDED.seller_name,
-                        phones = EXCLUDED.phones,
-                        image_url = EXCLUDED.image_url,
-                        total_photos = EXCLUDED.total_photos,
-                        license_plate = EXCLUDED.license_plate,
-                        vin = EXCLUDED.vin,
-                        datetime_found = EXCLUDED.datetime_found;
-                """
-                
-                current_timestamp = datetime.datetime.now()
-                data_to_insert = []
-                for ad_data in all_ads_data:
-                    # Convert phone_number to string for old phones column
-                    phone_str = str(ad_data.get('phone_number')) if ad_data.get('phone_number') else None
-                    
-                    data_to_insert.append((
-                        ad_data.get('url'),
-                        ad_data.get('title'),
-                        ad_data.get('price_usd'),  # Map price_usd to price
-                        ad_data.get('odometer'),   # Map odometer to mileage
-                        ad_data.get('username'),   # Map username to seller_name
-                        phone_str,                 # Map phone_number to phones
-                        ad_data.get('image_url'),
-                        ad_data.get('images_count'), # Map images_count to total_photos
-                        ad_data.get('car_number'),   # Map car_number to license_plate
-                        ad_data.get('car_vin'),      # Map car_vin to vin
-                        current_timestamp
-                    ))
-            
-            # Выполняем batch insert
-            await conn.executemany(insert_query, data_to_insert)
-            print(f"Successfully saved {len(all_ads_data)} advertisements to PostgreSQL (async).")
-            
-        except Exception as e:
-            print(f"Error saving data to PostgreSQL (async): {e}")
-        finally:
-            if conn:
-                await conn.close()
-    else:
-        print("Skipping PostgreSQL save due to connection error (async).")
+                logger.warning(f"Warning: Could not add {column_name} column: {e}")
+    # Ensure datetime_found column exists
+    try:
+        await conn.execute("ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS datetime_found TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;")
+        logger.info("Ensured datetime_found column exists in auto_ria_ads table.")
+    except Exception as e:
+        logger.warning(f"Warning: Could not add datetime_found column: {e}")
+    if 'first_seen' not in existing_columns:
+        for column_name, column_type in CHANGE_TRACKING_COLUMNS:
+            await conn.execute(f"ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS {column_name} {column_type};")
+        await conn.execute(BACKFILL_SEEN_SQL)
+        logger.info("Added change tracking columns (content_hash, first_seen, last_seen) to auto_ria_ads table.")
+    if 'phone_hash' not in existing_columns:
+        for column_name, column_type in PHONE_TOKEN_COLUMNS:
+            await conn.execute(f"ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS {column_name} {column_type};")
+        logger.info("Added phone token columns (phone_hash, phone_expires, phone_attempts) to auto_ria_ads table.")
+    await conn.execute("ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS ad_key BIGINT;")
+    if await conn.fetchval(AD_KEY_STATE_SQL) != AD_KEY_MARK:
+        # Нет индекса или ключи выданы по старому правилу - заполняем ключи (полный проход по таблице)
+        async with conn.transaction():
+            if merge_duplicates:
+                await merge_duplicate_ads_async(conn)
+            duplicates = await conn.fetch(DUPLICATE_AD_KEYS_SQL)
+            if duplicates:
+                raise DuplicateAdsError([(row['key'], row['urls']) for row in duplicates])
+            await conn.execute(FILL_AD_KEY_SQL)
+            await conn.execute(CREATE_AD_KEY_INDEX_SQL)
+            await conn.execute(MARK_AD_KEY_INDEX_SQL)
+        logger.info("Backfilled ad_key and ensured its unique index in auto_ria_ads table.")
+    await conn.execute(CREATE_AD_KEY_INDEX_SQL)
+    return await get_table_columns_async(conn)
+
+
+async def merge_duplicate_ads_async(conn):
+    """Слияние строк одного объявления с разными написаниями URL. Каждая удаленная строка пишется в лог"""
+    await conn.execute(GROUP_DUPLICATE_ADS_SQL)
+    removed = await conn.fetch(DELETE_DUPLICATE_ADS_SQL)
+    for row in removed:
+        logger.warning(f"🧹 Removed duplicate ad row {row['url']} (kept {row['kept_url']})",
+                       extra={'event': 'duplicate_removed', 'url': row['url'], 'kept_url': row['kept_url']})
+    return len(removed)
+
+
+async def merge_duplicates_and_backfill_async():
+    """--dedupe merge: слияние дублей и выдача ключей ad_key. Возвращает колонки таблицы"""
+    global _schema_adapter
+    pool = await get_db_pool_async()
+    async with pool.acquire() as conn:
+        columns = await ensure_ads_table_async(conn, merge_duplicates=True)
+    _schema_adapter = SchemaAdapter(columns)
+    return columns
+
+
+async def get_schema_adapter_async(conn):
+    """Схема проверяется и мигрируется при первой записи в процессе, дальше используется готовый адаптер"""
+    global _schema_adapter
+    if _schema_adapter is None:
+        _schema_adapter = SchemaAdapter(await ensure_ads_table_async(conn))
+    return _schema_adapter
+
+
+async def save_data_to_postgresql_async(all_ads_data):
+    """Асинхронное сохранение данных в PostgreSQL через общий пул соединений.
+
+    Ошибка записи логируется и пробрасывается: вызывающий код не должен считать пакет сохраненным
+    (frontier, повторное сохранение, счетчики запуска).
+    """
+    try:
+        pool = await get_db_pool_async()
+    except Exception as e:
+        logger.error(f"Skipping PostgreSQL save due to connection error (async): {e}")
+        raise
+    try:
+        async with pool.acquire() as conn:
+            schema = await get_schema_adapter_async(conn)
+            current_timestamp = datetime.datetime.now()
+            rows_by_conflict = schema.project(all_ads_data, current_timestamp)
+            if schema.writes_snapshots:
+                # Секции снимков - в отдельной транзакции: гонка DDL между воркерами не откатывает пакет
+                await ensure_snapshot_partitions_async(conn, current_timestamp)
+
+            # Выполняем batch insert; снимки изменений пишутся в той же транзакции до UPSERT
+            write_started = time.monotonic()
+            async with conn.transaction():
+                if schema.writes_snapshots:
+                    await append_snapshots_async(conn, all_ads_data, current_timestamp)
+                for conflict_column, rows in rows_by_conflict.items():
+                    await conn.executemany(schema.async_sql[conflict_column], rows)
+            get_run_stats().record_db_write(len(all_ads_data), write_started)
+        logger.info(f"Successfully saved {len(all_ads_data)} advertisements to PostgreSQL (async).", extra={'event': 'db_saved', 'ads': len(all_ads_data)})
+    except Exception as e:
+        logger.error(f"Error saving data to PostgreSQL (async): {e}")
+        raise
 
 
 async def get_existing_ad_urls_async():
-    """Асинхронное получение существующих URL объявлений"""
+    """Асинхронное получение известных объявлений (AdKeySet - проверка по ad_key, а не по строке URL)"""
     conn = await connect_db_async()
-    existing_urls = set()
+    existing_ads = AdKeySet()
     if conn:
         try:
-            rows = await conn.fetch("SELECT url FROM auto_ria_ads;")
+            if 'ad_key' in await get_table_columns_async(conn):
+                rows = await conn.fetch("SELECT url, ad_key FROM auto_ria_ads;")
+            else:
+                rows = await conn.fetch("SELECT url, NULL AS ad_key FROM auto_ria_ads;")
             for row in rows:
-                existing_urls.add(row['url'])
-            print(f"Loaded {len(existing_urls)} existing ad URLs from PostgreSQL (async).")
+                if row['ad_key'] is not None:
+                    existing_ads.add_key(row['ad_key'])
+                else:
+                    existing_ads.add(row['url'])
+            logger.info(f"Loaded {len(existing_ads)} existing ads from PostgreSQL (async).")
         except Exception as e:
-            print(f"Error fetching existing URLs from PostgreSQL (async): {e}")
+            logger.error(f"Error fetching existing URLs from PostgreSQL (async): {e}")
         finally:
             if conn:
                 await conn.close()
-    return existing_urls
+    return existing_ads
 
 
-def save_data_to_postgresql(all_ads_data):
-    conn = connect_db()
-    if conn:
-        try:
-            cur = conn.cursor()
-            
-            # First, check existing table structure
-            existing_columns = get_table_columns(conn)
-            print(f"Existing table columns: {list(existing_columns.keys())}")
-            
-            # Create table if not exists with new structure
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS auto_ria_ads (
-                    id SERIAL PRIMARY KEY,
-                    url TEXT UNIQUE,
-                    title TEXT,
-                    price_usd INTEGER,
-                    odometer INTEGER,
-                    username TEXT,
-                    phone_number BIGINT,
-                    image_url TEXT,
-                    images_count INTEGER,
-                    car_number TEXT,
-                    car_vin TEXT,
-                    datetime_found TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                );
-            """
-            )
-            
-            # Check if we have old column names and need to migrate or use them
-            has_old_columns = any(col in existing_columns for col in ['price', 'mileage', 'seller_name', 'phones'])
-            has_new_columns = any(col in existing_columns for col in ['price_usd', 'odometer', 'username', 'phone_number'])
-            
-            if has_old_columns and not has_new_columns:
-                print("Detected old column structure. Adding new columns...")
-                # Add new columns alongside old ones
-                columns_to_add = [
-                    ("price_usd", "INTEGER"),
-                    ("odometer", "INTEGER"), 
-                    ("username", "TEXT"),
-                    ("phone_number", "BIGINT"),
-                    ("images_count", "INTEGER"),
-                    ("car_number", "TEXT"),
-                    ("car_vin", "TEXT")
-                ]
-                
-                for column_name, column_type in columns_to_add:
-                    try:
-                        cur.execute(f"ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS {column_name} {column_type};")
-                        conn.commit()
-                        print(f"Added {column_name} column to auto_ria_ads table.")
-                    except Exception as e:
-                        print(f"Warning: Could not add {column_name} column: {e}")
-            
-            # Ensure datetime_found column exists
+def ensure_ads_table(conn):
+    """Синхронная версия ensure_ads_table_async для psycopg2"""
+    cur = conn.cursor()
+    # First, check existing table structure
+    existing_columns = get_table_columns(conn)
+    logger.debug(f"Existing table columns: {list(existing_columns.keys())}")
+    # Create table if not exists with new structure
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS auto_ria_ads (
+            id SERIAL PRIMARY KEY,
+            url TEXT UNIQUE,
+            title TEXT,
+            price_usd INTEGER,
+            odometer INTEGER,
+            username TEXT,
+            phone_number BIGINT,
+            image_url TEXT,
+            images_count INTEGER,
+            car_number TEXT,
+            car_vin TEXT,
+            datetime_found TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            content_hash TEXT,
+            first_seen TIMESTAMP WITH TIME ZONE,
+            last_seen TIMESTAMP WITH TIME ZONE,
+            phone_hash TEXT,
+            phone_expires BIGINT,
+            phone_attempts INTEGER NOT NULL DEFAULT 0,
+            ad_key BIGINT
+        );
+    """
+    )
+    
+    # Check if we have old column names and need to migrate or use them
+    has_old_columns = any(col in existing_columns for col in ['price', 'mileage', 'seller_name', 'phones'])
+    has_new_columns = any(col in existing_columns for col in ['price_usd', 'odometer', 'username', 'phone_number'])
+    
+    if has_old_columns and not has_new_columns:
+        logger.info("Detected old column structure. Adding new columns...")
+        # Add new columns alongside old ones
+        columns_to_add = [
+            ("price_usd", "INTEGER"),
+            ("odometer", "INTEGER"), 
+            ("username", "TEXT"),
+            ("phone_number", "BIGINT"),
+            ("images_count", "INTEGER"),
+            ("car_number", "TEXT"),
+            ("car_vin", "TEXT")
+        ]
+        
+        for column_name, column_type in columns_to_add:
             try:
-                cur.execute("ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS datetime_found TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;")
+                cur.execute(f"ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS {column_name} {column_type};")
                 conn.commit()
-                print("Ensured datetime_found column exists in auto_ria_ads table.")
+                logger.info(f"Added {column_name} column to auto_ria_ads table.")
             except Exception as e:
-                print(f"Warning: Could not add datetime_found column: {e}")
+                logger.warning(f"Warning: Could not add {column_name} column: {e}")
+    # Ensure datetime_found column exists
+    try:
+        cur.execute("ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS datetime_found TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;")
+        conn.commit()
+        logger.info("Ensured datetime_found column exists in auto_ria_ads table.")
+    except Exception as e:
+        logger.warning(f"Warning: Could not add datetime_found column: {e}")
+    if 'first_seen' not in existing_columns:
+        for column_name, column_type in CHANGE_TRACKING_COLUMNS:
+            cur.execute(f"ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS {column_name} {column_type};")
+        cur.execute(BACKFILL_SEEN_SQL)
+        logger.info("Added change tracking columns (content_hash, first_seen, last_seen) to auto_ria_ads table.")
+    if 'phone_hash' not in existing_columns:
+        for column_name, column_type in PHONE_TOKEN_COLUMNS:
+            cur.execute(f"ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS {column_name} {column_type};")
+        logger.info("Added phone token columns (phone_hash, phone_expires, phone_attempts) to auto_ria_ads table.")
+    cur.execute("ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS ad_key BIGINT;")
+    cur.execute(AD_KEY_STATE_SQL)
+    if cur.fetchone()[0] != AD_KEY_MARK:
+        cur.execute(DUPLICATE_AD_KEYS_SQL)
+        duplicates = cur.fetchall()
+        if duplicates:
+            conn.rollback()
+            cur.close()
+            raise DuplicateAdsError(duplicates)
+        cur.execute(FILL_AD_KEY_SQL)
+        cur.execute(CREATE_AD_KEY_INDEX_SQL)
+        cur.execute(MARK_AD_KEY_INDEX_SQL)
+        logger.info("Backfilled ad_key and ensured its unique index in auto_ria_ads table.")
+    cur.execute(CREATE_AD_KEY_INDEX_SQL)
+    conn.commit()
+    cur.close()
+    return get_table_columns(conn)
 
-            conn.commit()
 
-            # Get updated column list
-            existing_columns = get_table_columns(conn)
-            
-            for ad_data in all_ads_data:
-                current_timestamp = datetime.datetime.now()
-                
-                # Determine which column names to use based on what exists
-                if 'price_usd' in existing_columns:
-                    # Use new column names
-                    cur.execute("""
-                        INSERT INTO auto_ria_ads (
-                            url, title, price_usd, odometer, username, phone_number, image_url, images_count, car_number, car_vin, datetime_found
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (url) DO UPDATE SET
-                            title = EXCLUDED.title,
-                            price_usd = EXCLUDED.price_usd,
-                            odometer = EXCLUDED.odometer,
-                            username = EXCLUDED.username,
-                            phone_number = EXCLUDED.phone_number,
-                            image_url = EXCLUDED.image_url,
-                            images_count = EXCLUDED.images_count,
-                            car_number = EXCLUDED.car_number,
-                            car_vin = EXCLUDED.car_vin,
-                            datetime_found = EXCLUDED.datetime_found;
-                    """, (
-                        ad_data.get('url'),
-                        ad_data.get('title'),
-                        ad_data.get('price_usd'),
-                        ad_data.get('odometer'),
-                        ad_data.get('username'),
-                        ad_data.get('phone_number'),
-                        ad_data.get('image_url'),
-                        ad_data.get('images_count'),
-                        ad_data.get('car_number'),
-                        ad_data.get('car_vin'),
-                        current_timestamp
-                    ))
-                else:
-                    # Fallback to old column names if new ones don't exist
-                    print("Using old column structure for compatibility")
-                    # Convert phone_number to string for old phones column
-                    phone_str = str(ad_data.get('phone_number')) if ad_data.get('phone_number') else None
-                    
-                    cur.execute("""
-                        INSERT INTO auto_ria_ads (
-                            url, title, price, mileage, seller_name, phones, image_url, total_photos, license_plate, vin, datetime_found
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (url) DO UPDATE SET
-                            title = EXCLUDED.title,
-                            price = EXCLUDED.price,
-                            mileage = EXCLUDED.mileage,
-                            seller_name = EXCLUDED.seller_name,
-                            phones = EXCLUDED.phones,
-                            image_url = EXCLUDED.image_url,
-                            total_photos = EXCLUDED.total_photos,
-                            license_plate = EXCLUDED.license_plate,
-                            vin = EXCLUDED.vin,
-                            datetime_found = EXCLUDED.datetime_found;
-                    """, (
-                        ad_data.get('url'),
-                        ad_data.get('title'),
-                        ad_data.get('price_usd'),  # Map price_usd to price
-                        ad_data.get('odometer'),   # Map odometer to mileage
-                        ad_data.get('username'),   # Map username to seller_name
-                        phone_str,                 # Map phone_number to phones
-                        ad_data.get('image_url'),
-                        ad_data.get('images_count'), # Map images_count to total_photos
-                        ad_data.get('car_number'),   # Map car_number to license_plate
-                        ad_data.get('car_vin'),      # Map car_vin to vin
-                        current_timestamp
-                    ))
-                    
+def get_schema_adapter(conn):
+    """Синхронная версия get_schema_adapter_async"""
+    global _schema_adapter
+    if _schema_adapter is None:
+        _schema_adapter = SchemaAdapter(ensure_ads_table(conn))
+    return _schema_adapter
+
+
+def save_data_to_postgresql(all_ads_data):
+    """Сохранение в PostgreSQL (psycopg2): строки пакета уходят многострочными INSERT через execute_values"""
+    conn = connect_db()
+    if conn:
+        cur = None
+        try:
+            schema = get_schema_adapter(conn)
+            current_timestamp = datetime.datetime.now()
+            if schema.writes_snapshots:
+                ensure_snapshot_partitions(conn, current_timestamp)
+            cur = conn.cursor()
+            if schema.writes_snapshots:
+                append_snapshots(cur, all_ads_data, current_timestamp)
+            for conflict_column, rows in schema.project(all_ads_data, current_timestamp).items():
+                execute_values(cur, schema.batch_sql[conflict_column], rows, page_size=EXECUTE_VALUES_PAGE_SIZE)
             conn.commit()
-            print(f"Successfully saved {len(all_ads_data)} advertisements to PostgreSQL.")
+            logger.info(f"Successfully saved {len(all_ads_data)} advertisements to PostgreSQL.", extra={'event': 'db_saved', 'ads': len(all_ads_data)})
         except Exception as e:
-            print(f"Error saving data to PostgreSQL: {e}")
+            logger.error(f"Error saving data to PostgreSQL: {e}")
         finally:
-            if conn:
+            if cur is not None:
                 cur.close()
-                conn.close()
+            conn.close()
     else:
-        print("Skipping PostgreSQL save due to connection error.")
+        logger.error("Skipping PostgreSQL save due to connection error.")
+
 
 def get_existing_ad_urls():
     conn = connect_db()
-    existing_urls = set()
+    existing_urls = AdKeySet()
     if conn:
         try:
             cur = conn.cursor()
             cur.execute("SELECT url FROM auto_ria_ads;")
             for row in cur.fetchall():
                 existing_urls.add(row[0])
-            print(f"Loaded {len(existing_urls)} existing ad URLs from PostgreSQL.")
+            logger.info(f"Loaded {len(existing_urls)} existing ad URLs from PostgreSQL.")
         except Exception as e:
-            print(f"Error fetching existing URLs from PostgreSQL: {e}")
+            logger.error(f"Error fetching existing URLs from PostgreSQL: {e}")
         finally:
             if conn:
                 cur.close()
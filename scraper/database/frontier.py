@@ -0,0 +1,159 @@
+from scraper.config import Config
+from scraper.core.log import get_logger
+from scraper.database.db_operations import get_db_pool_async
+
+logger = get_logger(__name__)
+
+
+# Состояние обхода: страницы листинга и URL объявлений с этапом обработки.
+# Объявление проходит discovered -> saved; при ошибке - failed с причиной и числом попыток
+CREATE_FRONTIER_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS auto_ria_frontier (
+        url TEXT PRIMARY KEY,
+        kind TEXT NOT NULL DEFAULT 'ad',
+        state TEXT NOT NULL DEFAULT 'discovered',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        discovered_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+    );
+    CREATE INDEX IF NOT EXISTS auto_ria_frontier_pending_idx
+        ON auto_ria_frontier (state, attempts) WHERE kind = 'ad' AND state <> 'saved';
+
+    CREATE TABLE IF NOT EXISTS auto_ria_checkpoints (
+        start_url TEXT PRIMARY KEY,
+        next_page_url TEXT,
+        pages_done INTEGER NOT NULL DEFAULT 0,
+        ads_saved INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'running',
+        started_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+    );
+"""
+
+
+class Checkpoint:
+    """Точка продолжения обхода листинга"""
+
+    def __init__(self, row):
+        self.start_url = row['start_url']
+        self.next_page_url = row['next_page_url']
+        self.pages_done = row['pages_done']
+        self.ads_saved = row['ads_saved']
+
+    def __repr__(self):
+        return f"checkpoint of {self.start_url}: {self.pages_done} pages, next {self.next_page_url}"
+
+
+async def ensure_frontier_tables_async():
+    pool = await get_db_pool_async()
+    await pool.execute(CREATE_FRONTIER_TABLES_SQL)
+
+
+async def load_checkpoint_async(start_url):
+    """Незавершенный обход для start_url (None - начинать с первой страницы)"""
+    try:
+        pool = await get_db_pool_async()
+        row = await pool.fetchrow("""
+            SELECT start_url, next_page_url, pages_done, ads_saved FROM auto_ria_checkpoints
+            WHERE start_url = $1 AND status = 'running' AND next_page_url IS NOT NULL
+              AND updated_at > now() - make_interval(hours => $2);
+        """, start_url, Config.CHECKPOINT_MAX_AGE_HOURS)
+        return Checkpoint(row) if row else None
+    except Exception as e:
+        logger.warning(f"⚠️ Error loading crawl checkpoint: {e}", exc_info=True, extra={'event': 'frontier_error', 'url': start_url})
+        return None
+
+
+async def save_checkpoint_async(start_url, next_page_url, pages_done, ads_saved, status='running'):
+    try:
+        pool = await get_db_pool_async()
+        await pool.execute("""
+            INSERT INTO auto_ria_checkpoints (start_url, next_page_url, pages_done, ads_saved, status)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (start_url) DO UPDATE SET
+                next_page_url = EXCLUDED.next_page_url,
+                pages_done = EXCLUDED.pages_done,
+                ads_saved = EXCLUDED.ads_saved,
+                status = EXCLUDED.status,
+                started_at = CASE WHEN auto_ria_checkpoints.status = 'running'
+                                  THEN auto_ria_checkpoints.started_at ELSE now() END,
+                updated_at = now();
+        """, start_url, next_page_url, pages_done, ads_saved, status)
+    except Exception as e:
+        logger.warning(f"⚠️ Error saving crawl checkpoint: {e}", exc_info=True, extra={'event': 'frontier_error', 'url': start_url})
+
+
+async def record_listing_page_async(page_url):
+    """Отметка обойденной страницы листинга"""
+    try:
+        pool = await get_db_pool_async()
+        await pool.execute("""
+            INSERT INTO auto_ria_frontier (url, kind, state) VALUES ($1, 'listing', 'visited')
+            ON CONFLICT (url) DO UPDATE SET attempts = auto_ria_frontier.attempts + 1, updated_at = now();
+        """, page_url)
+    except Exception as e:
+        logger.warning(f"⚠️ Error recording listing page in frontier: {e}", exc_info=True, extra={'event': 'frontier_error', 'url': page_url})
+
+
+async def add_discovered_urls_async(urls):
+    """Новые URL объявлений (уже известные не сбрасываются)"""
+    if not urls:
+        return
+    try:
+        pool = await get_db_pool_async()
+        await pool.execute("""
+            INSERT INTO auto_ria_frontier (url)
+            SELECT unnest($1::text[])
+            ON CONFLICT (url) DO NOTHING;
+        """, list(urls))
+    except Exception as e:
+        logger.warning(f"⚠️ Error adding URLs to frontier: {e}", exc_info=True, extra={'event': 'frontier_error'})
+
+
+async def mark_saved_async(urls):
+    if not urls:
+        return
+    try:
+        pool = await get_db_pool_async()
+        await pool.execute("""
+            UPDATE auto_ria_frontier SET state = 'saved', last_error = NULL, updated_at = now()
+            WHERE url = ANY($1::text[]);
+        """, list(urls))
+    except Exception as e:
+        logger.warning(f"⚠️ Error marking URLs as saved in frontier: {e}", exc_info=True, extra={'event': 'frontier_error'})
+
+
+async def mark_failed_async(failures):
+    """Отметка неудачных попыток: failures - словарь {url: причина}"""
+    if not failures:
+        return
+    try:
+        pool = await get_db_pool_async()
+        await pool.execute("""
+            UPDATE auto_ria_frontier AS f SET
+                state = 'failed',
+                attempts = f.attempts + 1,
+                last_error = u.reason,
+                updated_at = now()
+            FROM unnest($1::text[], $2::text[]) AS u(url, reason)
+            WHERE f.url = u.url;
+        """, list(failures.keys()), list(failures.values()))
+    except Exception as e:
+        logger.warning(f"⚠️ Error marking URLs as failed in frontier: {e}", exc_info=True, extra={'event': 'frontier_error'})
+
+
+async def get_pending_urls_async(limit=None):
+    """URL объявлений для повторного прохода: упавшие и не дошедшие до сохранения"""
+    try:
+        pool = await get_db_pool_async()
+        rows = await pool.fetch("""
+            SELECT url FROM auto_ria_frontier
+            WHERE kind = 'ad' AND state <> 'saved' AND attempts < $1
+            ORDER BY attempts, updated_at
+            LIMIT $2;
+        """, Config.FRONTIER_MAX_ATTEMPTS, limit)
+        return [row['url'] for row in rows]
+    except Exception as e:
+        logger.warning(f"⚠️ Error fetching pending URLs from frontier: {e}", exc_info=True, extra={'event': 'frontier_error'})
+        return []
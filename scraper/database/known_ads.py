@@ -0,0 +1,83 @@
+from collections import OrderedDict
+
+from scraper.core.log import get_logger
+from scraper.core.url_utils import ad_key
+from scraper.database.db_operations import get_db_pool_async, get_table_columns_async
+
+logger = get_logger(__name__)
+
+
+class LazyKnownAds:
+    """Известные объявления без загрузки всей таблицы (DEDUPE_MODE=lazy).
+
+    Кандидаты каждой страницы листинга проверяются одним запросом url = ANY($1) через общий пул,
+    ответы (есть/нет в БД) хранятся в LRU на cache_size ключей. `url in known` смотрит только в кэш,
+    поэтому перед проверкой вызывается prefetch_async(urls); непроверенный URL считается новым -
+    повторная запись безопасна (UPSERT). Ключи - ad_key, как в AdKeySet.
+    """
+
+    def __init__(self, cache_size=20000):
+        self.cache_size = cache_size
+        self.queries = 0
+        self._answers = OrderedDict()
+        self._has_ad_key = None
+
+    @staticmethod
+    def _key(url):
+        key = ad_key(url)
+        return url if key is None else key
+
+    def _remember(self, key, known):
+        self._answers[key] = known
+        self._answers.move_to_end(key)
+        while len(self._answers) > self.cache_size:
+            self._answers.popitem(last=False)
+
+    async def prefetch_async(self, urls):
+        """Проверка в БД URL, ответа по которым нет в кэше (один запрос на вызов)"""
+        missing = {}
+        for url in urls:
+            key = self._key(url)
+            if key in self._answers:
+                self._answers.move_to_end(key)
+            else:
+                missing.setdefault(key, url)
+        if not missing:
+            return
+        try:
+            found = await self._fetch_known_async(list(missing.values()))
+        except Exception as e:
+            logger.warning(f"⚠️ Known ads lookup failed, treating {len(missing)} ads as new: {e}", extra={'event': 'dedupe_error'})
+            return
+        self.queries += 1
+        for key in missing:
+            self._remember(key, key in found)
+
+    async def _fetch_known_async(self, urls):
+        """Ключи объявлений из urls, которые уже есть в auto_ria_ads"""
+        pool = await get_db_pool_async()
+        async with pool.acquire() as conn:
+            if self._has_ad_key is None:
+                self._has_ad_key = 'ad_key' in await get_table_columns_async(conn)
+            if self._has_ad_key:
+                # Другое написание URL того же объявления находится по ad_key (уникальный индекс)
+                keys = [key for key in map(ad_key, urls) if key is not None]
+                rows = await conn.fetch("SELECT url, ad_key FROM auto_ria_ads WHERE url = ANY($1::text[]) OR ad_key = ANY($2::bigint[]);", urls, keys)
+            else:
+                rows = await conn.fetch("SELECT url, NULL AS ad_key FROM auto_ria_ads WHERE url = ANY($1::text[]);", urls)
+        found = {self._key(row['url']) for row in rows}
+        found.update(row['ad_key'] for row in rows if row['ad_key'] is not None)
+        return found
+
+    def add(self, url):
+        self._remember(self._key(url), True)
+
+    def update(self, urls):
+        for url in urls:
+            self.add(url)
+
+    def __contains__(self, url):
+        return self._answers.get(self._key(url), False)
+
+    def __len__(self):
+        return len(self._answers)
@@ -0,0 +1,67 @@
+from scraper.config import Config
+from scraper.database.db_operations import PHONE_TOKEN_COLUMNS, get_db_pool_async
+
+
+# Очередь обогащения - сами строки auto_ria_ads без телефона, но с токенами API
+PHONE_QUEUE_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS auto_ria_ads_phone_pending_idx ON auto_ria_ads (datetime_found)
+    WHERE phone_number IS NULL AND phone_hash IS NOT NULL;
+"""
+
+
+async def ensure_phone_queue_async():
+    pool = await get_db_pool_async()
+    async with pool.acquire() as conn:
+        for column_name, column_type in PHONE_TOKEN_COLUMNS:
+            await conn.execute(f"ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS {column_name} {column_type};")
+        await conn.execute(PHONE_QUEUE_INDEX_SQL)
+
+
+async def get_pending_phones_async(limit):
+    """Объявления, ожидающие телефон: [(url, phone_hash, phone_expires)], сначала новые"""
+    pool = await get_db_pool_async()
+    rows = await pool.fetch("""
+        SELECT url, phone_hash, phone_expires FROM auto_ria_ads
+        WHERE phone_number IS NULL AND phone_hash IS NOT NULL
+          AND phone_attempts < $2
+        ORDER BY datetime_found DESC
+        LIMIT $1;
+    """, limit, Config.PHONE_MAX_ATTEMPTS)
+    return [(row['url'], row['phone_hash'], row['phone_expires']) for row in rows]
+
+
+async def save_phones_async(phones_by_url):
+    """Запись полученных телефонов одним запросом, токены больше не нужны"""
+    if not phones_by_url:
+        return
+    pool = await get_db_pool_async()
+    await pool.execute("""
+        UPDATE auto_ria_ads AS a
+        SET phone_number = v.phone, phone_hash = NULL, phone_expires = NULL
+        FROM unnest($1::text[], $2::bigint[]) AS v(url, phone)
+        WHERE a.url = v.url;
+    """, list(phones_by_url), list(phones_by_url.values()))
+
+
+async def update_phone_tokens_async(tokens_by_url):
+    """Сохранение обновленных токенов (старые истекли)"""
+    if not tokens_by_url:
+        return
+    pool = await get_db_pool_async()
+    await pool.execute("""
+        UPDATE auto_ria_ads AS a
+        SET phone_hash = v.hash, phone_expires = v.expires
+        FROM unnest($1::text[], $2::text[], $3::bigint[]) AS v(url, hash, expires)
+        WHERE a.url = v.url;
+    """, list(tokens_by_url), [token[0] for token in tokens_by_url.values()],
+        [token[1] for token in tokens_by_url.values()])
+
+
+async def mark_phone_failed_async(urls):
+    """Неудачная попытка: после PHONE_MAX_ATTEMPTS объявление выпадает из очереди"""
+    if not urls:
+        return
+    pool = await get_db_pool_async()
+    await pool.execute("""
+        UPDATE auto_ria_ads SET phone_attempts = phone_attempts + 1 WHERE url = ANY($1::text[]);
+    """, list(urls))
@@ -0,0 +1,74 @@
+from scraper.config import Config
+from scraper.database.db_operations import get_db_pool_async
+
+
+REFRESH_COLUMNS_SQL = """
+    ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS sold_at TIMESTAMP WITH TIME ZONE;
+    ALTER TABLE auto_ria_ads ADD COLUMN IF NOT EXISTS last_refreshed_at TIMESTAMP WITH TIME ZONE;
+    CREATE INDEX IF NOT EXISTS auto_ria_ads_refreshed_idx ON auto_ria_ads (last_refreshed_at) WHERE sold_at IS NULL;
+"""
+
+# Приоритет обновления: сколько часов объявление не проверялось, с множителем для свежих
+# объявлений (цена чаще меняется в первые дни) и для ходового ценового диапазона
+SELECT_REFRESH_CANDIDATES_SQL = """
+    SELECT url FROM auto_ria_ads
+    WHERE sold_at IS NULL
+      AND COALESCE(last_refreshed_at, datetime_found) < now() - make_interval(hours => $2)
+    ORDER BY
+        EXTRACT(EPOCH FROM now() - COALESCE(last_refreshed_at, datetime_found))::float8 / 3600.0
+        * (1 + $3::float8 / (1 + EXTRACT(EPOCH FROM now() - COALESCE(first_seen, datetime_found))::float8 / 86400.0))
+        * CASE WHEN price_usd BETWEEN $4 AND $5 THEN $6::float8 ELSE 1 END
+        DESC
+    LIMIT $1;
+"""
+
+
+def parse_price_band(value):
+    """Диапазон цен "5000-30000" -> (5000, 30000)"""
+    low, high = (int(part) for part in value.split('-', 1))
+    return low, high
+
+
+async def ensure_refresh_columns_async():
+    pool = await get_db_pool_async()
+    await pool.execute(REFRESH_COLUMNS_SQL)
+
+
+async def get_refresh_budget_left_async():
+    """Сколько обновлений осталось в дневном бюджете (считаются проверки с начала суток)"""
+    pool = await get_db_pool_async()
+    used = await pool.fetchval("""
+        SELECT count(*) FROM auto_ria_ads WHERE last_refreshed_at >= date_trunc('day', now());
+    """)
+    return max(Config.REFRESH_DAILY_BUDGET - used, 0)
+
+
+async def select_refresh_candidates_async(limit):
+    """URL известных объявлений для повторной загрузки, по убыванию приоритета"""
+    low, high = parse_price_band(Config.REFRESH_PRICE_BAND)
+    pool = await get_db_pool_async()
+    rows = await pool.fetch(
+        SELECT_REFRESH_CANDIDATES_SQL, limit, int(Config.REFRESH_MIN_AGE_HOURS),
+        float(Config.REFRESH_RECENCY_WEIGHT), low, high, float(Config.REFRESH_BAND_WEIGHT)
+    )
+    return [row['url'] for row in rows]
+
+
+async def mark_refreshed_async(urls):
+    if not urls:
+        return
+    pool = await get_db_pool_async()
+    await pool.execute("""
+        UPDATE auto_ria_ads SET last_refreshed_at = now() WHERE url = ANY($1::text[]);
+    """, list(urls))
+
+
+async def mark_sold_async(urls):
+    """Отметка снятых с продажи объявлений одним запросом"""
+    if not urls:
+        return
+    pool = await get_db_pool_async()
+    await pool.execute("""
+        UPDATE auto_ria_ads SET sold_at = now(), last_refreshed_at = now()
+        WHERE url = ANY($1::text[]) AND sold_at IS NULL;
+    """, list(urls))
@@ -0,0 +1,86 @@
+import json
+
+from scraper.database.db_operations import get_db_pool_async
+
+
+# Журнал запусков: по одной строке на запуск для сравнения настроек производительности
+CREATE_RUNS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS auto_ria_runs (
+        id SERIAL PRIMARY KEY,
+        mode TEXT NOT NULL,
+        started_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        finished_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        pages INTEGER NOT NULL DEFAULT 0,
+        ads_discovered INTEGER NOT NULL DEFAULT 0,
+        ads_new INTEGER NOT NULL DEFAULT 0,
+        ads_skipped INTEGER NOT NULL DEFAULT 0,
+        ads_failed INTEGER NOT NULL DEFAULT 0,
+        phone_success_rate REAL,
+        bytes_in BIGINT NOT NULL DEFAULT 0,
+        fetch_p50_ms REAL,
+        fetch_p95_ms REAL,
+        parse_p50_ms REAL,
+        parse_p95_ms REAL,
+        db_rows INTEGER NOT NULL DEFAULT 0,
+        db_rows_per_sec REAL,
+        config JSONB
+    );
+    CREATE INDEX IF NOT EXISTS auto_ria_runs_started_idx ON auto_ria_runs (started_at);
+"""
+
+RUN_COLUMNS = (
+    'mode', 'started_at', 'finished_at', 'pages', 'ads_discovered', 'ads_new', 'ads_skipped', 'ads_failed',
+    'phone_success_rate', 'bytes_in', 'fetch_p50_ms', 'fetch_p95_ms', 'parse_p50_ms', 'parse_p95_ms',
+    'db_rows', 'db_rows_per_sec', 'config',
+)
+
+
+async def record_run_async(row):
+    """Запись итогов запуска (RunStats.as_row())"""
+    pool = await get_db_pool_async()
+    async with pool.acquire() as conn:
+        await conn.execute(CREATE_RUNS_TABLE_SQL)
+        values = [json.dumps(row[column]) if column == 'config' else row[column] for column in RUN_COLUMNS]
+        placeholders = ', '.join(f"${i}::jsonb" if column == 'config' else f"${i}" for i, column in enumerate(RUN_COLUMNS, 1))
+        await conn.execute(f"INSERT INTO auto_ria_runs ({', '.join(RUN_COLUMNS)}) VALUES ({placeholders});", *values)
+
+
+async def get_recent_runs_async(limit=10):
+    """Последние запуски, сначала новые"""
+    pool = await get_db_pool_async()
+    async with pool.acquire() as conn:
+        await conn.execute(CREATE_RUNS_TABLE_SQL)
+        rows = await conn.fetch("SELECT * FROM auto_ria_runs ORDER BY started_at DESC LIMIT $1;", limit)
+    return [dict(row) for row in rows]
+
+
+def format_runs_report(runs):
+    """Таблица сравнения запусков: пропускная способность, ошибки, задержки и отличия настроек"""
+    if not runs:
+        return "📭 No runs recorded yet"
+    lines = [f"{'started':<16} {'mode':<7} {'min':>6} {'pages':>6} {'new':>6} {'fail':>5} {'ads/min':>8} "
+             f"{'phone%':>6} {'MiB':>7} {'fetch p50/p95':>14} {'parse p50/p95':>14} {'rows/s':>7}"]
+    previous_config = None
+    for run in reversed(runs):
+        minutes = max((run['finished_at'] - run['started_at']).total_seconds() / 60, 1e-9)
+        phone = f"{run['phone_success_rate'] * 100:.0f}" if run['phone_success_rate'] is not None else '-'
+        config = json.loads(run['config']) if isinstance(run['config'], str) else (run['config'] or {})
+        if previous_config is not None:
+            # Изменения настроек относительно предыдущего запуска - над строкой запуска
+            changes = [f"{name}={previous_config.get(name)}->{value}" for name, value in config.items() if previous_config.get(name) != value]
+            if changes:
+                lines.append(f"{'':<16} ⚙️ {', '.join(changes)}")
+        previous_config = config
+        lines.append(
+            f"{run['started_at']:%Y-%m-%d %H:%M} {run['mode']:<7} {minutes:>6.1f} {run['pages']:>6} {run['ads_new']:>6} "
+            f"{run['ads_failed']:>5} {run['ads_new'] / minutes:>8.1f} {phone:>6} {run['bytes_in'] / 2 ** 20:>7.1f} "
+            f"{_pair(run['fetch_p50_ms'], run['fetch_p95_ms']):>14} {_pair(run['parse_p50_ms'], run['parse_p95_ms']):>14} "
+            f"{run['db_rows_per_sec'] or 0:>7.0f}"
+        )
+    return '\n'.join(lines)
+
+
+def _pair(p50, p95):
+    if p50 is None:
+        return '-'
+    return f"{p50:.0f}/{p95:.0f} ms"
@@ -0,0 +1,155 @@
+import asyncio
+import datetime
+import time
+
+from scraper.config import Config
+from scraper.core.log import get_logger
+from scraper.core.url_utils import ad_key
+
+logger = get_logger(__name__)
+
+
+# История цены/пробега/телефона: строка добавляется только при изменении (и при первом появлении объявления).
+# Таблица секционирована по месяцам, BRIN индекс по времени дешев для append-only данных
+CREATE_SNAPSHOTS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS auto_ria_ad_snapshots (
+        url TEXT NOT NULL,
+        observed_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        price_usd INTEGER,
+        odometer INTEGER,
+        phone_number BIGINT,
+        ad_key BIGINT
+    ) PARTITION BY RANGE (observed_at);
+    ALTER TABLE auto_ria_ad_snapshots ADD COLUMN IF NOT EXISTS ad_key BIGINT;
+    CREATE TABLE IF NOT EXISTS auto_ria_ad_snapshots_default PARTITION OF auto_ria_ad_snapshots DEFAULT;
+    CREATE INDEX IF NOT EXISTS auto_ria_ad_snapshots_observed_brin
+        ON auto_ria_ad_snapshots USING brin (observed_at);
+"""
+
+# Сравнение с текущей строкой auto_ria_ads выполняется до UPSERT в той же транзакции: по ad_key,
+# а для URL без id (ad_key NULL) - по url, иначе такие объявления получали бы снимок при каждой записи.
+# Каждая ветка UNION ALL использует свой уникальный индекс
+APPEND_SNAPSHOTS_SQL = """
+    INSERT INTO auto_ria_ad_snapshots (url, observed_at, price_usd, odometer, phone_number, ad_key)
+    SELECT u.url, {observed_at}, u.price_usd, u.odometer, u.phone_number, u.ad_key
+    FROM unnest({urls}::text[], {prices}::integer[], {odometers}::integer[], {phones}::bigint[], {keys}::bigint[])
+        AS u(url, price_usd, odometer, phone_number, ad_key)
+    LEFT JOIN LATERAL (
+        SELECT true AS found, price_usd, odometer, phone_number FROM auto_ria_ads WHERE ad_key = u.ad_key
+        UNION ALL
+        SELECT true AS found, price_usd, odometer, phone_number FROM auto_ria_ads WHERE u.ad_key IS NULL AND url = u.url
+    ) a ON true
+    WHERE a.found IS NULL
+       OR a.price_usd IS DISTINCT FROM u.price_usd
+       OR a.odometer IS DISTINCT FROM u.odometer
+       OR (u.phone_number IS NOT NULL AND a.phone_number IS DISTINCT FROM u.phone_number);
+"""
+
+# Месяцы, для которых секции уже созданы в этом процессе
+_ensured_months = set()
+# Попыток создать секции: воркеры могут одновременно создавать одну и ту же секцию
+PARTITION_ATTEMPTS = 3
+
+
+def month_partition_sql(month):
+    """DDL секции за месяц (month - дата внутри месяца)"""
+    start = month.replace(day=1)
+    end = (start + datetime.timedelta(days=32)).replace(day=1)
+    return (f"CREATE TABLE IF NOT EXISTS auto_ria_ad_snapshots_{start:%Y_%m} PARTITION OF auto_ria_ad_snapshots "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}');")
+
+
+def _partition_months(timestamp):
+    """Текущий и следующий месяц: секция создается заранее, до первой записи в нее"""
+    start = timestamp.date().replace(day=1)
+    following = (start + datetime.timedelta(days=32)).replace(day=1)
+    return [start, following]
+
+
+def _pending_partition_sql(timestamp):
+    if not Config.SNAPSHOTS_ENABLED:
+        return []
+    months = [month for month in _partition_months(timestamp) if month not in _ensured_months]
+    if not months:
+        return []
+    return [CREATE_SNAPSHOTS_TABLE_SQL] + [month_partition_sql(month) for month in months]
+
+
+async def ensure_snapshot_partitions_async(conn, timestamp):
+    """Таблица снимков и секции за текущий и следующий месяц - в своей транзакции, до транзакции записи.
+
+    Одновременное создание секции несколькими воркерами может завершиться ошибкой у проигравшего -
+    такая попытка повторяется, а ошибка не откатывает пакет объявлений.
+    """
+    statements = _pending_partition_sql(timestamp)
+    if not statements:
+        return
+    for attempt in range(1, PARTITION_ATTEMPTS + 1):
+        try:
+            async with conn.transaction():
+                for statement in statements:
+                    await conn.execute(statement)
+            break
+        except Exception as e:
+            if attempt == PARTITION_ATTEMPTS:
+                raise
+            logger.warning(f"⚠️ Creating snapshot partitions failed (attempt {attempt}): {e}", extra={'event': 'partition_retry'})
+            await asyncio.sleep(0.1 * attempt)
+    _ensured_months.update(_partition_months(timestamp))
+
+
+def ensure_snapshot_partitions(conn, timestamp):
+    """Синхронная версия ensure_snapshot_partitions_async для psycopg2 (коммитит создание секций)"""
+    statements = _pending_partition_sql(timestamp)
+    if not statements:
+        return
+    for attempt in range(1, PARTITION_ATTEMPTS + 1):
+        try:
+            with conn.cursor() as cur:
+                for statement in statements:
+                    cur.execute(statement)
+            conn.commit()
+            break
+        except Exception as e:
+            conn.rollback()
+            if attempt == PARTITION_ATTEMPTS:
+                raise
+            logger.warning(f"⚠️ Creating snapshot partitions failed (attempt {attempt}): {e}", extra={'event': 'partition_retry'})
+            time.sleep(0.1 * attempt)
+    _ensured_months.update(_partition_months(timestamp))
+
+
+def _snapshot_arrays(ads):
+    # Повторы объявления в пакете схлопываются в последнюю версию, как и в UPSERT (SchemaAdapter.project)
+    latest = {}
+    for ad in ads:
+        key = ad_key(ad.url)
+        latest[key if key is not None else ad.url] = (ad, key)
+    ads = [ad for ad, _ in latest.values()]
+    return (
+        [ad.url for ad in ads],
+        [ad.price_usd for ad in ads],
+        [ad.odometer for ad in ads],
+        [ad.phone_number for ad in ads],
+        [key for _, key in latest.values()],
+    )
+
+
+async def append_snapshots_async(conn, ads, timestamp):
+    """Добавление снимков изменившихся объявлений (вызывать до UPSERT в auto_ria_ads).
+
+    Секции создает ensure_snapshot_partitions_async до транзакции записи.
+    """
+    if not Config.SNAPSHOTS_ENABLED or not ads:
+        return
+    query = APPEND_SNAPSHOTS_SQL.format(observed_at='$6', urls='$1', prices='$2', odometers='$3', phones='$4', keys='$5')
+    await conn.execute(query, *_snapshot_arrays(ads), timestamp)
+
+
+def append_snapshots(cur, ads, timestamp):
+    """Синхронная версия append_snapshots_async для psycopg2"""
+    if not Config.SNAPSHOTS_ENABLED or not ads:
+        return
+    query = APPEND_SNAPSHOTS_SQL.format(observed_at='%s', urls='%s', prices='%s', odometers='%s', phones='%s', keys='%s')
+    urls, prices, odometers, phones, keys = _snapshot_arrays(ads)
+    cur.execute(query, (timestamp, urls, prices, odometers, phones, keys))
@@ -0,0 +1,147 @@
+from scraper.config import Config
+from scraper.core.log import get_logger
+from scraper.core.url_utils import listing_page_url
+from scraper.database.db_operations import get_db_pool_async
+
+logger = get_logger(__name__)
+
+
+# Очередь шардов листинга: каждый шард - диапазон страниц, который забирает один воркер
+CREATE_SHARDS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS auto_ria_shards (
+        id SERIAL PRIMARY KEY,
+        sweep_id TEXT NOT NULL,
+        start_url TEXT NOT NULL,
+        first_page INTEGER NOT NULL,
+        page_count INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        worker_id TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        pages_done INTEGER NOT NULL DEFAULT 0,
+        ads_saved INTEGER NOT NULL DEFAULT 0,
+        claimed_at TIMESTAMP WITH TIME ZONE,
+        heartbeat_at TIMESTAMP WITH TIME ZONE,
+        finished_at TIMESTAMP WITH TIME ZONE,
+        UNIQUE (sweep_id, start_url, first_page)
+    );
+    CREATE INDEX IF NOT EXISTS auto_ria_shards_status_idx ON auto_ria_shards (status, heartbeat_at);
+    CREATE INDEX IF NOT EXISTS auto_ria_shards_sweep_idx ON auto_ria_shards (sweep_id, start_url, status);
+"""
+
+# Забираем первый свободный шард текущего обхода (sweep_id + start_url) или шард, воркер которого
+# перестал присылать heartbeat. Шарды прошлых обходов не берем: их листинг уже устарел.
+# FOR UPDATE SKIP LOCKED не дает двум воркерам получить один и тот же шард.
+CLAIM_SHARD_SQL = """
+    UPDATE auto_ria_shards SET
+        status = 'claimed',
+        worker_id = $1,
+        attempts = attempts + 1,
+        claimed_at = now(),
+        heartbeat_at = now()
+    WHERE id = (
+        SELECT id FROM auto_ria_shards
+        WHERE sweep_id = $3 AND start_url = $4
+          AND (status = 'pending'
+               OR (status = 'claimed' AND heartbeat_at < now() - make_interval(secs => $2)))
+        ORDER BY id
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+    RETURNING id, sweep_id, start_url, first_page, page_count, pages_done, ads_saved, attempts;
+"""
+
+
+class ListingShard:
+    """Диапазон страниц листинга, полученный воркером из очереди"""
+
+    def __init__(self, row):
+        self.id = row['id']
+        self.sweep_id = row['sweep_id']
+        self.start_url = row['start_url']
+        self.first_page = row['first_page']
+        self.page_count = row['page_count']
+        self.pages_done = row['pages_done']
+        self.ads_saved = row['ads_saved']
+        self.attempts = row['attempts']
+
+    @property
+    def resume_url(self):
+        """URL страницы, с которой нужно продолжить (шард мог быть начат упавшим воркером)"""
+        return listing_page_url(self.start_url, self.first_page + self.pages_done)
+
+    @property
+    def pages_left(self):
+        return max(self.page_count - self.pages_done, 0)
+
+    def __repr__(self):
+        return f"shard #{self.id} pages {self.first_page}-{self.first_page + self.page_count - 1} of {self.start_url}"
+
+
+async def ensure_work_queue_table_async(conn):
+    await conn.execute(CREATE_SHARDS_TABLE_SQL)
+
+
+async def seed_listing_shards_async(sweep_id, start_url, total_pages, pages_per_shard):
+    """Разбиение листинга на шарды для обхода (повторный вызов для того же sweep_id ничего не меняет)"""
+    pool = await get_db_pool_async()
+    rows = [
+        (sweep_id, start_url, first_page, min(pages_per_shard, total_pages - first_page + 1))
+        for first_page in range(1, total_pages + 1, pages_per_shard)
+    ]
+    async with pool.acquire() as conn:
+        await ensure_work_queue_table_async(conn)
+        await conn.executemany("""
+            INSERT INTO auto_ria_shards (sweep_id, start_url, first_page, page_count)
+            VALUES ($1, $2, $3, $4)
+            ON CONFLICT (sweep_id, start_url, first_page) DO NOTHING;
+        """, rows)
+    logger.info(f"🧩 Sweep {sweep_id}: {len(rows)} shards of {pages_per_shard} pages for {start_url}",
+                extra={'event': 'shards_seeded', 'sweep_id': sweep_id, 'shards': len(rows), 'url': start_url})
+
+
+async def claim_shard_async(worker_id, sweep_id, start_url):
+    """Получение следующего шарда обхода sweep_id листинга start_url (None, если работы не осталось)"""
+    pool = await get_db_pool_async()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            row = await conn.fetchrow(CLAIM_SHARD_SQL, worker_id, float(Config.SHARD_HEARTBEAT_TIMEOUT), sweep_id, start_url)
+    return ListingShard(row) if row else None
+
+
+async def heartbeat_shard_async(shard_id, worker_id, pages_done, ads_saved):
+    """Обновление прогресса шарда. False - шард уже забрал другой воркер"""
+    pool = await get_db_pool_async()
+    result = await pool.execute("""
+        UPDATE auto_ria_shards SET heartbeat_at = now(), pages_done = $3, ads_saved = $4
+        WHERE id = $1 AND worker_id = $2 AND status = 'claimed';
+    """, shard_id, worker_id, pages_done, ads_saved)
+    return result.endswith(' 1')
+
+
+async def complete_shard_async(shard_id, worker_id, pages_done, ads_saved):
+    pool = await get_db_pool_async()
+    await pool.execute("""
+        UPDATE auto_ria_shards SET status = 'done', finished_at = now(), heartbeat_at = now(),
+            pages_done = $3, ads_saved = $4
+        WHERE id = $1 AND worker_id = $2;
+    """, shard_id, worker_id, pages_done, ads_saved)
+
+
+async def release_shard_async(shard_id, worker_id, pages_done, ads_saved):
+    """Возврат недообойденного шарда в очередь (остановка воркера) - другой воркер продолжит с pages_done"""
+    pool = await get_db_pool_async()
+    await pool.execute("""
+        UPDATE auto_ria_shards SET status = 'pending', worker_id = NULL, heartbeat_at = now(),
+            pages_done = $3, ads_saved = $4
+        WHERE id = $1 AND worker_id = $2 AND status = 'claimed';
+    """, shard_id, worker_id, pages_done, ads_saved)
+
+
+async def get_sweep_progress_async(sweep_id):
+    """Сводка по шардам обхода: количество по статусам, страницы и сохраненные объявления"""
+    pool = await get_db_pool_async()
+    rows = await pool.fetch("""
+        SELECT status, count(*) AS shards, sum(pages_done) AS pages, sum(ads_saved) AS ads
+        FROM auto_ria_shards WHERE sweep_id = $1 GROUP BY status ORDER BY status;
+    """, sweep_id)
+    return {row['status']: (row['shards'], row['pages'], row['ads']) for row in rows}
@@ -1,8 +1,8 @@
-import json
 import os
 import datetime
 import aiofiles
 import asyncio
+from scraper.core.models import dumps_ad_records
 
 DUMP_DIR = "dumps"
 
@@ -14,7 +14,7 @@ def save_data_to_json(all_ads_data):
     filename = os.path.join(DUMP_DIR, f"all_ads_data_{timestamp}.json")
     
     with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(all_ads_data, f, ensure_ascii=False, indent=4)
+        f.write(dumps_ad_records(all_ads_data))
     print(f"All collected data saved to {filename}")
 
 
@@ -29,7 +29,7 @@ async def save_data_to_json_async(all_ads_data):
     # Подготавливаем JSON строку в отдельном потоке, чтобы не блокировать event loop
     json_data = await asyncio.get_event_loop().run_in_executor(
         None, 
-        lambda: json.dumps(all_ads_data, ensure_ascii=False, indent=4)
+        lambda: dumps_ad_records(all_ads_data)
     )
     
     async with aiofiles.open(filename, 'w', encoding='utf-8') as f:
@@ -1,31 +1,125 @@
 import time
-import aiohttp
 import asyncio
 import threading
-import copy
 import datetime
 import sys
-import signal
-import os
 import argparse
-from apscheduler.schedulers.background import BackgroundScheduler
+from contextlib import asynccontextmanager
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-from scraper.core.scraper_core import collect_ad_urls_from_page, parse_ad_page, fetch_html_with_aiohttp, process_ad_batch
-from scraper.database.db_operations import save_data_to_postgresql, get_existing_ad_urls, connect_db, save_data_to_postgresql_async, get_existing_ad_urls_async
+from scraper.core.scraper_core import collect_ad_urls_from_page, parse_ad_page, process_ad_batch, fetch_ad_page_with_status, REMOVED_AD_STATUSES, extract_ad_id, fetch_phones_from_api, fetch_phone_tokens, phone_to_bigint
+from scraper.database.db_operations import connect_db, save_data_to_postgresql_async, get_existing_ad_urls_async, close_db_pool_async, merge_duplicates_and_backfill_async
+from scraper.database.frontier import ensure_frontier_tables_async, load_checkpoint_async, save_checkpoint_async, record_listing_page_async, add_discovered_urls_async, mark_saved_async, mark_failed_async, get_pending_urls_async
+from scraper.database.refresh_queue import ensure_refresh_columns_async, get_refresh_budget_left_async, select_refresh_candidates_async, mark_refreshed_async, mark_sold_async
+from scraper.database.known_ads import LazyKnownAds
+from scraper.database.runs import record_run_async, get_recent_runs_async, format_runs_report
+from scraper.database.phone_queue import ensure_phone_queue_async, get_pending_phones_async, save_phones_async, update_phone_tokens_async, mark_phone_failed_async
+from scraper.database.work_queue import seed_listing_shards_async, claim_shard_async, heartbeat_shard_async, complete_shard_async, release_shard_async, get_sweep_progress_async
+from scraper.core.phone_cache import get_phone_cache, save_phone_cache
+from scraper.core.crawl_plan import load_crawl_plan, group_seeds_by_schedule, parse_schedule
+from scraper.core.rate_limiter import RateLimiter, RateLimitedSession
+from scraper.core.session_pool import SessionPool
+from scraper.core.polling import AdaptivePollInterval, LatencyStats
+from scraper.core.shutdown import ShutdownCoordinator
+from scraper.core.url_utils import AdKeySet, ad_key
+from scraper.core.transport import format_transport_report, reset_transport_stats
+from scraper.core.run_stats import get_run_stats, reset_run_stats
+from scraper.core.tuning import TUNE_SPACE, ProbeResult, TuningAborted, greedy_search, update_env_file
+from scraper.core.log import get_logger, setup_logging
 from scraper.file_operations.file_writer import save_data_to_json
 from scraper.config import Config
 
-# Global list to store all collected advertisement data
+logger = get_logger('scraper.main')
+
+# Объявления, собранные с последнего дампа. Запуски (группы расписания, демон) могут идти одновременно,
+# поэтому список не очищается в начале запуска - его очищает дамп
 all_ads_data = []
-# Lock for thread-safe access to all_ads_data
+# Lock for thread-safe access to all_ads_data (дамп читает список из потока executor'а;
+# в event loop блокировка берется только на копирование/изменение списка, не на время await)
 all_ads_data_lock = threading.Lock()
-# Event to signal the main thread to stop
-stop_main_thread_event = threading.Event()
-# Event to signal auto-save thread to stop
-auto_save_stop_event = threading.Event()
-# Track the index of the last saved record to avoid re-saving
-last_saved_index = 0
-last_saved_index_lock = threading.Lock()
+# Копить объявления для дампа, только если дамп будет (DUMP_TIME или --dump-now), иначе список растет без ограничения
+dump_enabled = bool(Config.DUMP_TIME)
+# Пакеты, запись которых в БД не подтверждена (идет, не удалась или прервана остановкой).
+# Общие для всех запусков, меняются только в event loop заданий
+unsaved_batches = []
+
+# Постоянный event loop заданий: пул HTTP сессий (соединения, кэш DNS) и пул БД переживают запуски по расписанию
+_job_loop = None
+_job_loop_lock = threading.Lock()
+_session_pool = None
+_session_pool_lock = asyncio.Lock()
+# Остановка по SIGINT/SIGTERM: сначала обход листинга, затем дообработка, сохранение и checkpoint
+shutdown = ShutdownCoordinator()
+
+def run_in_job_loop(coro):
+    """Выполнение корутины в постоянном event loop заданий (из любого потока планировщика)"""
+    global _job_loop
+    with _job_loop_lock:
+        if _job_loop is None:
+            _job_loop = asyncio.new_event_loop()
+            threading.Thread(target=_job_loop.run_forever, name="job-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _job_loop).result()
+
+@asynccontextmanager
+async def shared_session_pool():
+    """Общий пул сессий: создается и прогревается при первом запуске, соединения прогреваются каждый запуск"""
+    global _session_pool
+    async with _session_pool_lock:
+        if _session_pool is None:
+            _session_pool = SessionPool(Config.SESSION_POOL_SIZE)
+            await _session_pool.start()
+    if Config.CONNECTION_WARMUP > 0 and Config.CONNECTION_WARMUP_URLS:
+        warmup_time = await _session_pool.warm_connections(Config.CONNECTION_WARMUP_URLS, Config.CONNECTION_WARMUP)
+        print(f"🔥 Warmed up {Config.CONNECTION_WARMUP} connections per session in {warmup_time:.2f}s")
+    yield _session_pool
+
+async def _close_shared_resources():
+    """Закрытие общих пулов HTTP сессий и соединений PostgreSQL"""
+    global _session_pool
+    if _session_pool is not None:
+        pool, _session_pool = _session_pool, None
+        await pool.close()
+    await close_db_pool_async()
+
+async def record_run_stats_async():
+    """Итоги запуска в auto_ria_runs - для сравнения настроек между запусками (--runs)"""
+    row = get_run_stats().as_row()
+    print(f"--- 📒 Run ledger: {row['pages']} pages, {row['ads_discovered']} discovered, {row['ads_new']} new, "
+          f"{row['ads_skipped']} skipped, {row['ads_failed']} failed, {row['db_rows_per_sec'] or 0:.0f} DB rows/s ---")
+    try:
+        await record_run_async(row)
+    except Exception as e:
+        print(f"❌ Could not record run statistics: {e}")
+
+def format_time_to_first_ad():
+    time_to_first_ad = get_run_stats().time_to_first_ad()
+    if time_to_first_ad is None:
+        return "no ads saved"
+    return f"{time_to_first_ad:.2f}s"
+
+def collect_for_dump(records):
+    if dump_enabled:
+        with all_ads_data_lock:
+            all_ads_data.extend(records)
+
+def _discard_unsaved(batch):
+    for i, unsaved in enumerate(unsaved_batches):
+        if unsaved is batch:
+            del unsaved_batches[i]
+            return
+
+async def save_unsaved_ads_async():
+    """Запись несохраненных пакетов всех запусков и отметка их в frontier. Возвращает число объявлений"""
+    batches = list(unsaved_batches)
+    records = [ad for batch in batches for ad in batch]
+    if not records:
+        return 0
+    await save_data_to_postgresql_async(records)
+    for batch in batches:
+        _discard_unsaved(batch)
+    if Config.FRONTIER_ENABLED:
+        await mark_saved_async([ad.url for ad in records])
+    return len(records)
 
 def check_database_connection():
     """Проверка подключения к базе данных при старте"""
@@ -39,72 +133,389 @@ def check_database_connection():
         print("❌ Database connection failed!")
         return False
 
-def auto_save_worker():
-    """Worker function for automatic saving of collected data"""
-    global last_saved_index
-    
-    if not Config.AUTO_SCRAPE_TIME:
-        return
-    
+async def auto_save_async(stop_event):
+    """Периодическое сохранение собранных, но еще не записанных объявлений (AUTO_SCRAPE_TIME, секунды).
+
+    Работает задачей в event loop задания: пул соединений asyncpg привязан к нему.
+    """
     try:
         save_interval = int(Config.AUTO_SCRAPE_TIME)
-        print(f"🔄 Auto-save worker started with {save_interval} second interval")
-        
-        while not auto_save_stop_event.is_set():
-            # Wait for the specified interval or until stop event is set
-            if auto_save_stop_event.wait(timeout=save_interval):
-                break  # Stop event was set
-            
-            # Save only new data
-            with all_ads_data_lock, last_saved_index_lock:
-                total_records = len(all_ads_data)
-                if total_records > last_saved_index:
-                    # Get only new records that haven't been saved yet
-                    new_records = all_ads_data[last_saved_index:]
-                    current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    print(f"\n💾 [{current_time}] Auto-saving {len(new_records)} new ads to PostgreSQL (total: {total_records})...")
-                    try:
-                        # Используем асинхронную функцию в отдельном event loop
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        loop.run_until_complete(save_data_to_postgresql_async(new_records.copy()))
-                        loop.close()
-                        last_saved_index = total_records  # Update the index of last saved record
-                        print(f"✅ [{current_time}] Auto-save completed successfully. Saved records {last_saved_index - len(new_records) + 1}-{last_saved_index}")
-                    except Exception as e:
-                        print(f"❌ [{current_time}] Auto-save failed: {e}")
-                else:
-                    print(f"📭 [{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] No new data to auto-save (total: {total_records})")
-                    
     except ValueError:
         print(f"⚠️ Warning: Invalid AUTO_SCRAPE_TIME format '{Config.AUTO_SCRAPE_TIME}'. Should be number of seconds.")
-    except Exception as e:
-        print(f"❌ Auto-save worker error: {e}")
+        return
+
+    print(f"🔄 Auto-save worker started with {save_interval} second interval")
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=save_interval)
+                break  # Stop event was set
+            except asyncio.TimeoutError:
+                pass
+
+            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            try:
+                saved = await save_unsaved_ads_async()
+                if saved:
+                    print(f"✅ [{current_time}] Auto-save completed successfully. Saved {saved} ads")
+                else:
+                    print(f"📭 [{current_time}] No new data to auto-save")
+            except Exception as e:
+                print(f"❌ [{current_time}] Auto-save failed: {e}")
     finally:
         print("🔄 Auto-save worker stopped")
 
+@asynccontextmanager
+async def auto_save_running():
+    """Автосохранение на время задания (если задан AUTO_SCRAPE_TIME); при выходе текущее сохранение дожидается"""
+    if not Config.AUTO_SCRAPE_TIME:
+        yield
+        return
+    stop_event = asyncio.Event()
+    task = asyncio.create_task(auto_save_async(stop_event))
+    try:
+        yield
+    finally:
+        stop_event.set()
+        await asyncio.gather(task, return_exceptions=True)
+
 async def save_batch_to_db(batch_results):
     """Асинхронное сохранение пакета данных в базу"""
     if batch_results:
         try:
-            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(f"💾 [{current_time}] Saving {len(batch_results)} ads to database...")
             await save_data_to_postgresql_async(batch_results)
-            print(f"✅ [{current_time}] Successfully saved {len(batch_results)} ads to database")
             return True
         except Exception as e:
-            print(f"❌ Error saving batch to database: {e}")
+            logger.error(f"❌ Error saving batch to database: {e}", extra={'event': 'db_error'})
             return False
     return False
 
-async def perform_scraping_job_async():
-    """Асинхронная функция скрапинга"""
-    global all_ads_data, last_saved_index
-    with all_ads_data_lock, last_saved_index_lock:
-        all_ads_data.clear() # Clear data from previous runs to avoid accumulating old data on new runs
-        last_saved_index = 0  # Reset the saved index for new scraping job
+async def process_ad_urls_async(session, ad_urls, existing_ad_urls, semaphore, on_saved=None):
+    """Обработка URL объявлений пакетами с сохранением в базу. Возвращает число сохраненных.
 
-    if not Config.AUTO_RIA_START_URL:
+    on_saved(batch_results) вызывается после успешного сохранения каждого пакета.
+    """
+    total_saved = 0
+
+    # Обрабатываем объявления пакетами с настраиваемым размером
+    batch_size = Config.BATCH_SIZE
+    for i in range(0, len(ad_urls), batch_size):
+        batch_urls = ad_urls[i:i + batch_size]
+        logger.debug(f"🔄 Processing batch {i//batch_size + 1}/{(len(ad_urls) + batch_size - 1)//batch_size} ({len(batch_urls)} ads)...")
+        
+        try:
+            failures = {}
+            batch_results = await process_ad_batch(session, batch_urls, existing_ad_urls, semaphore, failures)
+            if Config.FRONTIER_ENABLED:
+                await mark_failed_async(failures)
+            
+            if batch_results:
+                # Добавляем в список для дампа
+                collect_for_dump(batch_results)
+                
+                # Сразу сохраняем в базу данных; пока запись не подтверждена, пакет в unsaved_batches
+                unsaved_batches.append(batch_results)
+                saved_successfully = await save_batch_to_db(batch_results)
+                if saved_successfully:
+                    _discard_unsaved(batch_results)
+                    get_run_stats().record_first_ad()
+                    total_saved += len(batch_results)
+                    if Config.FRONTIER_ENABLED:
+                        await mark_saved_async([ad.url for ad in batch_results])
+                    if on_saved is not None:
+                        on_saved(batch_results)
+                    logger.info(f"✅ Successfully processed and saved {len(batch_results)} ads from batch (Total saved: {total_saved})",
+                                extra={'event': 'batch_saved', 'ads': len(batch_results), 'total_saved': total_saved})
+            else:
+                logger.debug("📭 No new ads found in this batch")
+            
+            # Настраиваемая пауза между пакетами (при остановке - без паузы, страница дообрабатывается)
+            if Config.BATCH_DELAY > 0:
+                await shutdown.sleep(Config.BATCH_DELAY)
+            
+        except Exception as e:
+            logger.error(f"❌ Error processing batch: {e}", extra={'event': 'batch_error'})
+            continue
+
+    return total_saved
+
+async def load_known_ads_async():
+    """Известные объявления для пропуска: вся таблица (DEDUPE_MODE=full) или проверка по страницам (lazy)"""
+    if Config.DEDUPE_MODE == 'lazy':
+        print(f"🔎 Lazy dedupe: known ads are checked per listing page (cache {Config.DEDUPE_CACHE_SIZE})")
+        return LazyKnownAds(Config.DEDUPE_CACHE_SIZE)
+    print("Fetching existing ad URLs from the database (async)...")
+    existing_ad_urls = await get_existing_ad_urls_async()
+    print(f"Found {len(existing_ad_urls)} ads already in the database.")
+    return existing_ad_urls
+
+async def check_known_ads_async(existing_ad_urls, ad_urls):
+    """В режиме lazy - проверка кандидатов в БД одним запросом перед `url in existing_ad_urls`"""
+    if isinstance(existing_ad_urls, LazyKnownAds):
+        await existing_ad_urls.prefetch_async(ad_urls)
+
+async def crawl_listing_async(session, start_url, existing_ad_urls, semaphore, max_pages=None, on_page=None, seen_urls=None):
+    """Обход листинга начиная с start_url: сбор ссылок, парсинг и сохранение объявлений.
+
+    max_pages ограничивает число страниц, on_page(page_count, total_saved, next_page_url) вызывается
+    после каждой страницы и может вернуть False, чтобы остановить обход.
+    seen_urls - общий для параллельных обходов набор URL, уже взятых в работу в этом запуске.
+    Возвращает (page_count, total_saved, exhausted), exhausted - листинг пройден до конца.
+    """
+    current_page_url = start_url
+    page_count = 0
+    total_saved = 0
+    
+    while True:
+        if shutdown.stopping:
+            # Новые страницы не берем; checkpoint уже указывает на current_page_url
+            logger.info("⏹️ Shutdown requested. Stopping listing discovery.", extra={'event': 'crawl_stopped', 'reason': 'shutdown'})
+            return page_count, total_saved, False
+        page_count += 1
+        logger.info(f"🔍 Page {page_count}: Collecting ad URLs from: {current_page_url}",
+                    extra={'event': 'listing_page', 'page': page_count, 'url': current_page_url})
+        
+        try:
+            ad_urls, next_page_url = await collect_ad_urls_from_page(session, current_page_url)
+        except Exception as e:
+            logger.error(f"❌ Error collecting URLs from page {page_count}: {e}",
+                         extra={'event': 'fetch_error', 'page': page_count, 'url': current_page_url})
+            return page_count, total_saved, False
+
+        if ad_urls:
+            logger.info(f"📋 Found {len(ad_urls)} advertisements on page {page_count}. Processing in parallel...",
+                        extra={'event': 'listing_ads', 'page': page_count, 'ads': len(ad_urls)})
+            if seen_urls is not None:
+                # Объявление может попасть в несколько листингов плана - обрабатываем его один раз
+                ad_urls = [url for url in ad_urls if url not in seen_urls]
+                seen_urls.update(ad_urls)
+            run_stats = get_run_stats()
+            run_stats.pages += 1
+            run_stats.ads_discovered += len(ad_urls)
+            await check_known_ads_async(existing_ad_urls, ad_urls)
+            if Config.FRONTIER_ENABLED:
+                await record_listing_page_async(current_page_url)
+                await add_discovered_urls_async([url for url in ad_urls if url not in existing_ad_urls])
+            total_saved += await process_ad_urls_async(session, ad_urls, existing_ad_urls, semaphore)
+        else:
+            logger.info("📭 No advertisement links found on this page. Stopping scraping.", extra={'event': 'crawl_stopped', 'reason': 'empty_page'})
+            return page_count, total_saved, True
+
+        if on_page is not None and await on_page(page_count, total_saved, next_page_url) is False:
+            logger.info("⏹️ Page callback requested stop.", extra={'event': 'crawl_stopped', 'reason': 'callback'})
+            return page_count, total_saved, False
+
+        if max_pages and page_count >= max_pages:
+            logger.info(f"🏁 Reached page limit ({max_pages}). Stopping scraping.", extra={'event': 'crawl_stopped', 'reason': 'page_limit'})
+            return page_count, total_saved, not next_page_url
+
+        if next_page_url:
+            current_page_url = next_page_url
+            logger.debug(f"➡️ Navigating to next page: {current_page_url}")
+            if Config.PAGE_DELAY > 0:
+                logger.debug(f"⏳ Waiting {Config.PAGE_DELAY}s before next page...")
+                await shutdown.sleep(Config.PAGE_DELAY)
+        else:
+            logger.info("🏁 No next page found. Stopping scraping.", extra={'event': 'crawl_stopped', 'reason': 'last_page'})
+            return page_count, total_saved, True
+
+async def crawl_seed_async(session, seed, existing_ad_urls, seen_urls):
+    """Обход одного seed плана: свой лимит частоты, параллельность, лимит страниц и checkpoint"""
+    seed_session = session
+    if seed.rate:
+        seed_session = RateLimitedSession(session, RateLimiter(seed.rate, seed.burst))
+    semaphore = asyncio.Semaphore(seed.concurrency or Config.SEMAPHORE_LIMIT)
+
+    start_url = seed.url
+    pages_before = 0
+    saved_before = 0
+    checkpoint = await load_checkpoint_async(seed.url) if Config.FRONTIER_ENABLED else None
+    if checkpoint:
+        # Предыдущий запуск прервался - продолжаем с сохраненной страницы
+        logger.info(f"♻️ [{seed.name}] Resuming from {checkpoint}", extra={'event': 'seed_resumed', 'seed': seed.name})
+        start_url = checkpoint.next_page_url
+        pages_before = checkpoint.pages_done
+        saved_before = checkpoint.ads_saved
+
+    max_pages = None
+    if seed.max_pages:
+        max_pages = max(seed.max_pages - pages_before, 1)
+
+    async def on_page(page_count, total_saved, next_page_url):
+        if Config.FRONTIER_ENABLED:
+            await save_checkpoint_async(seed.url, next_page_url, pages_before + page_count, saved_before + total_saved)
+
+    page_count, total_saved, exhausted = await crawl_listing_async(
+        seed_session, start_url, existing_ad_urls, semaphore,
+        max_pages=max_pages, on_page=on_page, seen_urls=seen_urls
+    )
+
+    if Config.FRONTIER_ENABLED and (exhausted or (max_pages and page_count >= max_pages)):
+        await save_checkpoint_async(seed.url, None, pages_before + page_count, saved_before + total_saved, status='done')
+
+    logger.info(f"🏁 [{seed.name}] Finished: {page_count} pages, {total_saved} ads saved",
+                extra={'event': 'seed_finished', 'seed': seed.name, 'pages': page_count, 'saved': total_saved})
+    return page_count, total_saved
+
+async def refresh_known_ads_async(session):
+    """Повторная загрузка известных объявлений по приоритету в пределах дневного бюджета.
+
+    Изменения цены попадают в базу через обычный UPSERT, снятые объявления (404/410) отмечаются проданными.
+    """
+    try:
+        await ensure_refresh_columns_async()
+        budget = await get_refresh_budget_left_async()
+        urls = await select_refresh_candidates_async(budget) if budget else []
+    except Exception as e:
+        logger.error(f"❌ Refresh scheduler failed: {e}", exc_info=True, extra={'event': 'refresh_error'})
+        return 0, 0
+
+    if not urls:
+        logger.info(f"📭 No known ads to refresh (daily budget left: {budget})", extra={'event': 'refresh_started', 'ads': 0, 'budget': budget})
+        return 0, 0
+    logger.info(f"🔄 Refreshing {len(urls)} known ads (daily budget left: {budget})",
+                extra={'event': 'refresh_started', 'ads': len(urls), 'budget': budget})
+
+    semaphore = asyncio.Semaphore(Config.REFRESH_CONCURRENCY)
+
+    async def refresh_one(url):
+        async with semaphore:
+            status, html = await fetch_ad_page_with_status(session, url)
+            if html is None:
+                return status, None
+            return status, await parse_ad_page(url, html, session)
+
+    refreshed = 0
+    sold = 0
+    for i in range(0, len(urls), Config.BATCH_SIZE):
+        if shutdown.stopping:
+            break
+        batch_urls = urls[i:i + Config.BATCH_SIZE]
+        results = await asyncio.gather(*(refresh_one(url) for url in batch_urls), return_exceptions=True)
+
+        sold_urls, checked_urls, records = [], [], []
+        for url, result in zip(batch_urls, results):
+            if isinstance(result, Exception):
+                logger.warning(f"❌ Error refreshing ad {url}: {result}", extra={'event': 'refresh_error', 'url': url})
+                continue
+            status, record = result
+            if status in REMOVED_AD_STATUSES:
+                sold_urls.append(url)
+            elif status is not None:
+                # Сетевые ошибки не тратят бюджет - объявление будет выбрано снова
+                checked_urls.append(url)
+                if record:
+                    records.append(record)
+
+        try:
+            if records:
+                await save_data_to_postgresql_async(records)
+            await mark_sold_async(sold_urls)
+            await mark_refreshed_async(checked_urls)
+        except Exception as e:
+            logger.error(f"❌ Error saving refresh results: {e}", exc_info=True, extra={'event': 'refresh_error'})
+            continue
+
+        refreshed += len(checked_urls)
+        sold += len(sold_urls)
+        logger.info(f"♻️ Refresh batch: {len(records)} ads re-parsed, {len(sold_urls)} marked as sold",
+                    extra={'event': 'refresh_batch', 'reparsed': len(records), 'sold': len(sold_urls)})
+
+    logger.info(f"🏁 Refresh finished: {refreshed} ads checked, {sold} marked as sold",
+                extra={'event': 'refresh_finished', 'checked': refreshed, 'sold': sold})
+    return refreshed, sold
+
+async def enrich_phones_async(session, discovery_done):
+    """Отложенное получение телефонов: разбирает очередь объявлений с токенами API.
+
+    Работает параллельно с обходом со своим лимитом частоты и завершается,
+    когда обход закончен (discovery_done) и очередь пуста.
+    """
+    try:
+        await ensure_phone_queue_async()
+    except Exception as e:
+        logger.error(f"❌ Phone enrichment disabled: {e}", exc_info=True, extra={'event': 'phone_enrich_error'})
+        return 0
+
+    phone_session = RateLimitedSession(session, RateLimiter(Config.PHONE_RATE_LIMIT, Config.PHONE_RATE_BURST))
+    semaphore = asyncio.Semaphore(Config.PHONE_WORKERS)
+    phone_cache = get_phone_cache() if Config.PHONE_CACHE_ENABLED else None
+
+    async def enrich_one(url, hash_val, expires_val):
+        async with semaphore:
+            ad_id = extract_ad_id(url)
+            if not ad_id:
+                return None, None
+            new_tokens = None
+            if not expires_val or expires_val < time.time():
+                # Токены истекли - берем новые со страницы объявления
+                hash_val, expires_val = await fetch_phone_tokens(phone_session, url)
+                if not (hash_val and expires_val and str(expires_val).isdigit()):
+                    return None, None
+                expires_val = int(expires_val)
+                new_tokens = (hash_val, expires_val)
+            phones = await fetch_phones_from_api(phone_session, url, ad_id, hash_val, expires_val)
+            if phones and phone_cache is not None:
+                phone_cache.store(phones, ad_key(url))
+            return phone_to_bigint(phones), new_tokens
+
+    enriched = 0
+    while not shutdown.stopping:
+        # Флаг проверяется до выборки, чтобы не потерять объявления, сохраненные в последнем батче
+        finished = discovery_done.is_set()
+        try:
+            pending = await get_pending_phones_async(Config.PHONE_ENRICH_BATCH)
+        except Exception as e:
+            logger.error(f"❌ Phone queue query failed: {e}", exc_info=True, extra={'event': 'phone_enrich_error'})
+            return enriched
+        if not pending:
+            if finished:
+                break
+            try:
+                await asyncio.wait_for(discovery_done.wait(), timeout=Config.PHONE_ENRICH_POLL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        results = await asyncio.gather(*(enrich_one(*entry) for entry in pending), return_exceptions=True)
+        phones_by_url, tokens_by_url, failed_urls = {}, {}, []
+        for (url, _, _), result in zip(pending, results):
+            if isinstance(result, Exception):
+                logger.warning(f"❌ Error enriching phone for {url}: {result}", extra={'event': 'phone_enrich_error', 'url': url})
+                failed_urls.append(url)
+                continue
+            phone, new_tokens = result
+            if new_tokens:
+                tokens_by_url[url] = new_tokens
+            if phone is not None:
+                phones_by_url[url] = phone
+            else:
+                failed_urls.append(url)
+
+        try:
+            await update_phone_tokens_async(tokens_by_url)
+            await save_phones_async(phones_by_url)
+            await mark_phone_failed_async(failed_urls)
+        except Exception as e:
+            logger.error(f"❌ Error saving phone enrichment results: {e}", exc_info=True, extra={'event': 'phone_enrich_error'})
+            return enriched
+
+        enriched += len(phones_by_url)
+        logger.info(f"📞 Phone batch: {len(phones_by_url)} phones found, {len(failed_urls)} failed",
+                    extra={'event': 'phone_batch', 'found': len(phones_by_url), 'failed': len(failed_urls)})
+
+    logger.info(f"🏁 Phone enrichment finished: {enriched} phones found", extra={'event': 'phone_enrich_finished', 'found': enriched})
+    return enriched
+
+async def perform_scraping_job_async(seeds=None):
+    """Асинхронная функция скрапинга: все seed'ы плана обходятся параллельно в одной сессии.
+
+    Счетчики и статистика транспорта - свои у каждого запуска (contextvar задачи), поэтому
+    группы расписания и демон могут работать одновременно.
+    """
+    if seeds is None:
+        seeds = load_crawl_plan()
+    if not seeds:
         print("AUTO_RIA_START_URL is not set in the .env file. Please set it to a valid URL, e.g., https://auto.ria.com/uk/car/used/")
         return
 
@@ -115,7 +526,9 @@ async def perform_scraping_job_async():
     print(f"   - Scrape Time: {Config.SCRAPE_TIME}")
     print(f"   - Dump Time: {Config.DUMP_TIME}")
     print(f"   - Auto-save Interval: {Config.AUTO_SCRAPE_TIME} seconds" if Config.AUTO_SCRAPE_TIME else "   - Auto-save: Disabled")
-    print(f"   - Start URL: {Config.AUTO_RIA_START_URL}")
+    for seed in seeds:
+        print(f"   - Seed '{seed.name}' (priority {seed.priority}): {seed.url}"
+              f"{f', {seed.rate:g} req/s' if seed.rate else ''}{f', max {seed.max_pages} pages' if seed.max_pages else ''}")
     print(f"   - Mode: ASYNCHRONOUS (High Performance)")
     print(f"")
     print(f"⚙️ Performance Parameters:")
@@ -125,208 +538,487 @@ async def perform_scraping_job_async():
     print(f"   - Page Delay: {Config.PAGE_DELAY}s between pages")
     print(f"   - Connection Limit: {Config.CONNECTION_LIMIT} total, {Config.CONNECTION_LIMIT_PER_HOST} per host")
     print(f"   - Timeouts: {Config.CONNECTION_TIMEOUT}s total, {Config.CONNECT_TIMEOUT}s connect")
+    print(f"   - HTTP Transport: {Config.HTTP_TRANSPORT} (DNS cache {Config.DNS_CACHE_TTL}s, keep-alive {Config.KEEPALIVE_TIMEOUT}s)")
     
     start_time = time.time()
+    reset_transport_stats()
+    reset_run_stats('scrape')
 
-    # Start auto-save worker if AUTO_SCRAPE_TIME is configured
-    auto_save_thread = None
-    if Config.AUTO_SCRAPE_TIME:
-        auto_save_stop_event.clear()
-        auto_save_thread = threading.Thread(target=auto_save_worker, daemon=True)
-        auto_save_thread.start()
+    existing_ad_urls = await load_known_ads_async()
 
-    print("Fetching existing ad URLs from the database (async)...")
-    existing_ad_urls = await get_existing_ad_urls_async()
-    print(f"Found {len(existing_ad_urls)} URLs already in the database.")
-
-    # Создаем семафор для ограничения количества одновременных запросов
+    # Семафор для повторного прохода; у каждого seed свой
     semaphore = asyncio.Semaphore(Config.SEMAPHORE_LIMIT)
-    
-    # Настройка aiohttp session с настраиваемыми параметрами
-    cookie_jar = aiohttp.CookieJar()
-    connector = aiohttp.TCPConnector(
-        limit=Config.CONNECTION_LIMIT, 
-        limit_per_host=Config.CONNECTION_LIMIT_PER_HOST
-    )
-    timeout = aiohttp.ClientTimeout(
-        total=Config.CONNECTION_TIMEOUT, 
-        connect=Config.CONNECT_TIMEOUT
-    )
-    
-    async with aiohttp.ClientSession(
-        connector=connector,
-        timeout=timeout,
-        cookie_jar=cookie_jar,
-        headers=Config.COMMON_HEADERS
-    ) as session:
-        
-        # Устанавливаем cookies
-        session.cookie_jar.update_cookies({
-            'chk': '1',
-            '__utmc': '79960839',
-            '__utmz': '79960839.1749807882.1.1.utmcsr=google|utmccn=(organic)|utmcmd=organic|utmctr=(not%20provided)',
-            'showNewFeatures': '7',
-            'extendedSearch': '1',
-            'informerIndex': '1',
-            '_gcl_au': '1.1.696652926.1749807882',
-            '_504c2': 'http://10.42.12.49:3000',
-            '_ga': 'GA1.1.76946374.1749807883',
-            '_fbp': 'fb.1.1749807883050.284932067592788166',
-            'gdpr': '[2,3]',
-            'ui': 'd166f29f660ec9a4',
-            'showNewNextAdvertisement': '-10',
-            'PHPSESSID': 'yUVRySHhF47tGqsLEO9GHZLcJq2osvFu'
-        })
-
-        current_page_url = Config.AUTO_RIA_START_URL
-        page_count = 0
-        total_saved = 0
-        
-        while True:
-            page_count += 1
-            print(f"\n🔍 Page {page_count}: Collecting ad URLs from: {current_page_url}")
-            
-            try:
-                ad_urls, next_page_url = await collect_ad_urls_from_page(session, current_page_url)
-            except Exception as e:
-                print(f"❌ Error collecting URLs from page {page_count}: {e}")
-                break
 
-            if ad_urls:
-                print(f"📋 Found {len(ad_urls)} advertisements on page {page_count}. Processing in parallel...")
-                
-                # Обрабатываем объявления пакетами с настраиваемым размером
-                batch_size = Config.BATCH_SIZE
-                for i in range(0, len(ad_urls), batch_size):
-                    batch_urls = ad_urls[i:i + batch_size]
-                    print(f"🔄 Processing batch {i//batch_size + 1}/{(len(ad_urls) + batch_size - 1)//batch_size} ({len(batch_urls)} ads)...")
-                    
-                    try:
-                        batch_results = await process_ad_batch(session, batch_urls, existing_ad_urls, semaphore)
-                        
-                        if batch_results:
-                            # Добавляем в глобальный список
-                            with all_ads_data_lock:
-                                all_ads_data.extend(batch_results)
-                            
-                            # Сразу сохраняем в базу данных
-                            saved_successfully = await save_batch_to_db(batch_results)
-                            if saved_successfully:
-                                total_saved += len(batch_results)
-                                with last_saved_index_lock:
-                                    last_saved_index = len(all_ads_data)
-                            
-                            print(f"✅ Successfully processed and saved {len(batch_results)} ads from batch (Total saved: {total_saved})")
-                        else:
-                            print("📭 No new ads found in this batch")
-                        
-                        # Настраиваемая пауза между пакетами
-                        if Config.BATCH_DELAY > 0:
-                            print(f"⏳ Waiting {Config.BATCH_DELAY}s before next batch...")
-                            await asyncio.sleep(Config.BATCH_DELAY)
-                        
-                    except Exception as e:
-                        print(f"❌ Error processing batch: {e}")
-                        continue
-                        
-            else:
-                print("📭 No advertisement links found on this page. Stopping scraping.")
-                break
+    # Пул прогретых HTTP сессий выбранного транспорта (aiohttp или HTTP/2 через httpx), у каждой свои cookies.
+    # Пул живет между запусками: соединения и кэш DNS переиспользуются. Автосохранение - на время обхода
+    async with auto_save_running(), shared_session_pool() as session_pool:
+        session = session_pool
 
-            if next_page_url:
-                current_page_url = next_page_url
-                print(f"➡️ Navigating to next page: {current_page_url}")
-                if Config.PAGE_DELAY > 0:
-                    print(f"⏳ Waiting {Config.PAGE_DELAY}s before next page...")
-                    await asyncio.sleep(Config.PAGE_DELAY)
-            else:
-                print("🏁 No next page found. Stopping scraping.")
-                break
+        # Телефоны получаются отдельным этапом со своим лимитом частоты
+        discovery_done = asyncio.Event()
+        phone_task = asyncio.create_task(enrich_phones_async(session, discovery_done)) if Config.PHONE_ENRICHMENT == 'deferred' else None
+
+        if Config.RATE_LIMIT > 0:
+            # Общий лимит частоты для обхода и обновления известных объявлений
+            session = RateLimitedSession(session, RateLimiter(Config.RATE_LIMIT, Config.RATE_LIMIT_BURST))
+
+        if Config.FRONTIER_ENABLED:
+            await ensure_frontier_tables_async()
+
+        refresh_task = asyncio.create_task(refresh_known_ads_async(session)) if Config.REFRESH_ENABLED else None
+
+        # Seed'ы запускаются по убыванию приоритета; PLAN_MAX_CONCURRENT_SEEDS ограничивает число одновременных
+        seed_slots = asyncio.Semaphore(Config.PLAN_MAX_CONCURRENT_SEEDS or len(seeds))
+        seen_urls = AdKeySet()
+
+        async def run_seed(seed):
+            async with seed_slots:
+                try:
+                    return await crawl_seed_async(session, seed, existing_ad_urls, seen_urls)
+                except Exception as e:
+                    print(f"❌ [{seed.name}] Seed crawl failed: {e}")
+                    return 0, 0
 
-    # Stop auto-save worker
-    if auto_save_thread:
-        auto_save_stop_event.set()
-        auto_save_thread.join(timeout=5)  # Wait up to 5 seconds for thread to finish
+        results = await asyncio.gather(*(run_seed(seed) for seed in seeds))
+        page_count = sum(pages for pages, _ in results)
+        total_saved = sum(saved for _, saved in results)
+        if refresh_task is not None:
+            await refresh_task
+
+        if Config.FRONTIER_ENABLED and not shutdown.stopping:
+            # Повторный проход по упавшим и недообработанным объявлениям (в том числе из прерванных запусков)
+            pending_urls = await get_pending_urls_async(Config.FRONTIER_RETRY_LIMIT)
+            await check_known_ads_async(existing_ad_urls, pending_urls)
+            known_urls = [url for url in pending_urls if url in existing_ad_urls]
+            await mark_saved_async(known_urls)
+            retry_urls = [url for url in pending_urls if url not in existing_ad_urls]
+            if retry_urls:
+                print(f"\n🔁 Retrying {len(retry_urls)} failed or unfinished ads from the frontier...")
+                total_saved += await process_ad_urls_async(session, retry_urls, existing_ad_urls, semaphore)
+
+        discovery_done.set()
+        if phone_task is not None:
+            await phone_task
 
     end_time = time.time()
     total_elapsed_time = end_time - start_time
     print(f"--- ⏱️ Finished scraping job. Total elapsed time: {total_elapsed_time:.2f} seconds ---")
-    print(f"--- 📊 Processed {page_count} pages, collected {len(all_ads_data)} ads, saved {total_saved} ads ---")
+    print(f"--- 🚀 Time to first ad: {format_time_to_first_ad()} ---")
+    print(f"--- 📊 Processed {page_count} pages, collected {get_run_stats().ads_new} ads, saved {total_saved} ads ---")
+    print(f"--- 🌐 Transport statistics ---")
+    print(format_transport_report())
+    print(session_pool.summary())
 
     # Save any remaining unsaved data
-    with all_ads_data_lock, last_saved_index_lock:
-        total_records = len(all_ads_data)
-        if total_records > last_saved_index:
-            remaining_records = all_ads_data[last_saved_index:]
-            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(f"\n--- 💾 [{current_time}] Saving {len(remaining_records)} remaining ads to PostgreSQL (async) ---")
-            await save_data_to_postgresql_async(remaining_records)
-            last_saved_index = total_records
-            print(f"--- ✅ [{current_time}] Finished saving remaining ads ---")
-        elif total_records > 0:
-            print(f"\n--- 📭 All {total_records} ads have already been saved during processing ---")
-        else:
-            print(f"\n--- 📭 No ads were collected during this scraping session ---")
+    current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    remaining = await save_unsaved_ads_async()
+    if remaining:
+        print(f"\n--- 💾 [{current_time}] Saved {remaining} remaining ads to PostgreSQL (async) ---")
+    elif total_saved > 0:
+        print(f"\n--- 📭 All {total_saved} ads have already been saved during processing ---")
+    else:
+        print(f"\n--- 📭 No ads were collected during this scraping session ---")
 
-def perform_scraping_job():
+    await record_run_stats_async()
+
+    save_phone_cache()
+
+def perform_scraping_job(seeds=None):
     """Синхронная обертка для асинхронной функции скрапинга"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    # Запуск через python -c (make run-scraper) минует __main__ - логирование настраивается здесь
+    setup_logging()
+    run_in_job_loop(perform_scraping_job_async(seeds))
+
+async def crawl_shard_async(session, shard, existing_ad_urls, semaphore):
+    """Обход одного шарда с heartbeat в очереди. False - шард перехвачен другим воркером"""
+    progress = {'pages_done': shard.pages_done, 'ads_saved': shard.ads_saved, 'owned': True}
+
+    async def send_heartbeat():
+        owned = await heartbeat_shard_async(shard.id, Config.WORKER_ID, progress['pages_done'], progress['ads_saved'])
+        if not owned:
+            logger.warning(f"⚠️ Lost ownership of {shard}. Another worker took it over.", extra={'event': 'shard_lost', 'shard': shard.id})
+        progress['owned'] = progress['owned'] and owned
+        return progress['owned']
+
+    async def heartbeat_loop():
+        while True:
+            await asyncio.sleep(Config.SHARD_HEARTBEAT_INTERVAL)
+            try:
+                await send_heartbeat()
+            except Exception as e:
+                logger.error(f"❌ Heartbeat failed for {shard}: {e}", exc_info=True, extra={'event': 'shard_heartbeat_error', 'shard': shard.id})
+
+    async def on_page(page_count, total_saved, next_page_url):
+        progress['pages_done'] = shard.pages_done + page_count
+        progress['ads_saved'] = shard.ads_saved + total_saved
+        return await send_heartbeat()
+
+    if shard.pages_left == 0:
+        # Предыдущий воркер обошел все страницы, но не успел закрыть шард
+        await complete_shard_async(shard.id, Config.WORKER_ID, shard.pages_done, shard.ads_saved)
+        return True
+
+    heartbeat_task = asyncio.create_task(heartbeat_loop())
     try:
-        loop.run_until_complete(perform_scraping_job_async())
+        _, _, exhausted = await crawl_listing_async(
+            session, shard.resume_url, existing_ad_urls, semaphore,
+            max_pages=shard.pages_left, on_page=on_page
+        )
     finally:
-        loop.close()
+        heartbeat_task.cancel()
+
+    if progress['owned'] and shutdown.stopping and not exhausted and progress['pages_done'] < shard.page_count:
+        # Остановка посреди шарда: возвращаем его в очередь с прогрессом, не дожидаясь таймаута heartbeat
+        await release_shard_async(shard.id, Config.WORKER_ID, progress['pages_done'], progress['ads_saved'])
+        logger.info(f"⏸️ Released {shard} at {progress['pages_done']} pages done",
+                    extra={'event': 'shard_released', 'shard': shard.id, 'pages_done': progress['pages_done']})
+    elif progress['owned']:
+        await complete_shard_async(shard.id, Config.WORKER_ID, progress['pages_done'], progress['ads_saved'])
+    return progress['owned']
+
+async def perform_worker_job_async():
+    """Воркер распределенного обхода: забирает шарды листинга из очереди в PostgreSQL, пока они есть"""
+    if not Config.AUTO_RIA_START_URL:
+        print("AUTO_RIA_START_URL is not set in the .env file. Please set it to a valid URL, e.g., https://auto.ria.com/uk/car/used/")
+        return
+
+    sweep_id = Config.SHARD_SWEEP_ID or datetime.date.today().isoformat()
+    print(f"\n--- [{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Worker {Config.WORKER_ID} joining sweep {sweep_id} ---")
+    start_time = time.time()
+    reset_transport_stats()
+    reset_run_stats('worker')
+    shards_done = 0
+
+    try:
+        if Config.FRONTIER_ENABLED:
+            await ensure_frontier_tables_async()
+
+        # Все воркеры сидируют одинаковые шарды, дубликаты отбрасываются по UNIQUE
+        await seed_listing_shards_async(sweep_id, Config.AUTO_RIA_START_URL, Config.SHARD_TOTAL_PAGES, Config.SHARD_PAGES)
+
+        existing_ad_urls = await load_known_ads_async()
+        semaphore = asyncio.Semaphore(Config.SEMAPHORE_LIMIT)
+
+        async with shared_session_pool() as session:
+            discovery_done = asyncio.Event()
+            phone_task = asyncio.create_task(enrich_phones_async(session, discovery_done)) if Config.PHONE_ENRICHMENT == 'deferred' else None
+
+            while not shutdown.stopping:
+                shard = await claim_shard_async(Config.WORKER_ID, sweep_id, Config.AUTO_RIA_START_URL)
+                if shard is None:
+                    print("🏁 No shards left in the queue.")
+                    break
+
+                print(f"\n🧩 Worker {Config.WORKER_ID} claimed {shard} (attempt {shard.attempts}, {shard.pages_left} pages left)")
+                if await crawl_shard_async(session, shard, existing_ad_urls, semaphore):
+                    shards_done += 1
+                    print(f"✅ Finished {shard}")
+
+            discovery_done.set()
+            if phone_task is not None:
+                await phone_task
+
+        progress = await get_sweep_progress_async(sweep_id)
+        for status, (shards, pages, ads) in progress.items():
+            print(f"   - {status}: {shards} shards, {pages} pages, {ads} ads")
+    finally:
+        save_phone_cache()
+
+    print(f"--- ⏱️ Worker {Config.WORKER_ID} finished {shards_done} shards in {time.time() - start_time:.2f} seconds ---")
+    print(f"--- 🚀 Time to first ad: {format_time_to_first_ad()} ---")
+    print(f"--- 🌐 Transport statistics ---")
+    print(format_transport_report())
+    print(session.summary())
+    await record_run_stats_async()
+
+def perform_worker_job():
+    """Синхронная обертка для воркера распределенного обхода"""
+    setup_logging()
+    run_in_job_loop(perform_worker_job_async())
 
 def perform_dump_job():
+    setup_logging()
     with all_ads_data_lock:
-        data_to_dump = copy.deepcopy(all_ads_data)
+        # Записи AdRecord не меняются после парсинга, достаточно копии списка
+        data_to_dump = list(all_ads_data)
     
     if data_to_dump:
         current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         print(f"\n--- [{current_time}] Initiating daily data dump to JSON ---")
         save_data_to_json(data_to_dump)
+        with all_ads_data_lock:
+            # Новые объявления дописываются в конец - удаляем только выгруженные
+            del all_ads_data[:len(data_to_dump)]
         print(f"--- [{current_time}] Finished daily data dump ---")
     else:
         current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         print(f"\n--- [{current_time}] No data to dump to JSON ---")
 
 
-def graceful_exit(scheduler):
-    print("\n--- Shutting down scheduler and exiting application ---")
-    scheduler.shutdown()
-    stop_main_thread_event.set()
+async def poll_new_ads_async():
+    """Режим демона: опрос первых DAEMON_PAGES страниц листинга с адаптивным интервалом.
 
-def signal_handler(signum, frame):
-    """Handle SIGINT (Ctrl+C) and SIGTERM signals"""
-    print(f"\n🛑 Received signal {signum}. Shutting down...")
-    
-    # Stop auto-save worker if running
-    auto_save_stop_event.set()
-    
-    # Save any unsaved collected data to database before shutdown
-    with all_ads_data_lock, last_saved_index_lock:
-        total_records = len(all_ads_data)
-        if total_records > last_saved_index:
-            remaining_records = all_ads_data[last_saved_index:]
-            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(f"\n💾 [{current_time}] Saving {len(remaining_records)} unsaved ads to PostgreSQL before shutdown...")
+    Новые объявления сразу проходят загрузку, парсинг и сохранение. Задержка публикация -> БД
+    оценивается сверху от начала предыдущего опроса (объявление появилось после него).
+    Каждые DAEMON_LEDGER_INTERVAL секунд и при остановке итоги окна пишутся в журнал запусков.
+    """
+    # Свои счетчики и статистика транспорта: демон идет одновременно с заданиями по расписанию
+    reset_transport_stats()
+    reset_run_stats('daemon')
+    interval = AdaptivePollInterval(Config.DAEMON_MIN_INTERVAL, Config.DAEMON_MAX_INTERVAL)
+    publish_latency = LatencyStats()
+    semaphore = asyncio.Semaphore(Config.SEMAPHORE_LIMIT)
+    existing_ad_urls = await load_known_ads_async()
+    previous_poll = None
+    ledger_started = time.time()
+    print(f"🛰️ Daemon polling {Config.DAEMON_PAGES} pages of {Config.DAEMON_URL} every {Config.DAEMON_MIN_INTERVAL:.0f}-{Config.DAEMON_MAX_INTERVAL:.0f}s")
+
+    def on_saved(batch_results):
+        # Первый опрос находит накопившиеся объявления, а не только что опубликованные
+        if previous_poll is not None:
+            saved_at = time.time()
+            for _ in batch_results:
+                publish_latency.add(saved_at - previous_poll)
+
+    async with shared_session_pool() as session:
+        try:
+            while not shutdown.stopping:
+                poll_started = time.time()
+                new_urls = []
+                page_url = Config.DAEMON_URL
+                for _ in range(Config.DAEMON_PAGES):
+                    if shutdown.stopping:
+                        break
+                    try:
+                        ad_urls, next_page_url = await collect_ad_urls_from_page(session, page_url)
+                    except Exception as e:
+                        logger.warning(f"⚠️ Daemon poll of {page_url} failed: {e}", extra={'event': 'fetch_error', 'url': page_url})
+                        break
+                    run_stats = get_run_stats()
+                    run_stats.pages += 1
+                    run_stats.ads_discovered += len(ad_urls)
+                    await check_known_ads_async(existing_ad_urls, ad_urls)
+                    new_urls += [url for url in ad_urls if url not in existing_ad_urls]
+                    if not next_page_url:
+                        break
+                    page_url = next_page_url
+                new_urls = list(dict.fromkeys(new_urls))
+
+                saved = 0
+                if new_urls:
+                    if Config.FRONTIER_ENABLED:
+                        await add_discovered_urls_async(new_urls)
+                    saved = await process_ad_urls_async(session, new_urls, existing_ad_urls, semaphore, on_saved=on_saved)
+                    # Неудачные объявления остаются в frontier, повторно их не опрашиваем
+                    existing_ad_urls.update(new_urls)
+
+                delay = interval.update(bool(new_urls))
+                p50, p95 = publish_latency.percentile(50), publish_latency.percentile(95)
+                # Момент публикации неизвестен, отсчет идет от начала предыдущего опроса - это верхняя граница
+                latency = f", publish->DB <= p50 {p50:.0f}s p95 {p95:.0f}s" if p50 is not None else ""
+                logger.info(f"🛰️ Poll: {len(new_urls)} new ads, {saved} saved in {time.time() - poll_started:.1f}s{latency}, next poll in {delay:.0f}s",
+                            extra={'event': 'daemon_poll', 'new_ads': len(new_urls), 'saved': saved, 'interval_s': round(delay),
+                                   'publish_latency_upper_p50_s': p50, 'publish_latency_upper_p95_s': p95})
+                previous_poll = poll_started
+                if time.time() - ledger_started >= Config.DAEMON_LEDGER_INTERVAL:
+                    # Строка журнала за окно, затем счетчики следующего окна
+                    await record_run_stats_async()
+                    reset_transport_stats()
+                    reset_run_stats('daemon')
+                    ledger_started = time.time()
+                await shutdown.sleep(delay)
+        finally:
+            # Итоги последнего окна (в том числе при остановке по сигналу)
+            if get_run_stats().pages:
+                await record_run_stats_async()
+
+async def run_tune_probe_async(params):
+    """Пробный обход TUNE_PAGES страниц TUNE_URL с заданными параметрами (объявления не сохраняются).
+
+    Телефоны во время пробы не запрашиваются (как в режиме deferred), после пробы Config восстанавливается.
+    """
+    # API телефонов ограничен по частоте - пробы не должны расходовать его лимит на рабочем сайте
+    overrides = dict(params, PHONE_ENRICHMENT='deferred')
+    originals = {name: getattr(Config, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(Config, name, value)
+    try:
+        return await _tune_probe_async(params)
+    finally:
+        for name, value in originals.items():
+            setattr(Config, name, value)
+
+async def _tune_probe_async(params):
+    print(f"\n🧪 Probe: {', '.join(f'{name}={value}' for name, value in params.items())}")
+    reset_transport_stats()
+    ads = attempted = 0
+    failures = {}
+    started = time.monotonic()
+    # Новый пул на каждую пробу: лимиты соединений задаются при создании сессии
+    async with SessionPool(Config.SESSION_POOL_SIZE) as pool:
+        semaphore = asyncio.Semaphore(Config.SEMAPHORE_LIMIT)
+        page_url = Config.TUNE_URL
+        for page in range(Config.TUNE_PAGES):
             try:
-                # Используем асинхронную функцию в отдельном event loop
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(save_data_to_postgresql_async(remaining_records))
-                loop.close()
-                print(f"✅ [{current_time}] Successfully saved {len(remaining_records)} unsaved records before shutdown")
+                ad_urls, next_page_url = await collect_ad_urls_from_page(pool, page_url)
             except Exception as e:
-                print(f"❌ [{current_time}] Error saving data to database: {e}")
-        elif total_records > 0:
-            print(f"📭 All {total_records} collected ads have already been saved")
-        else:
-            print("📭 No data to save to database")
-    
-    stop_main_thread_event.set()
-    # Force exit after a timeout (increased to allow time for database save)
-    threading.Timer(10.0, lambda: os._exit(1)).start()
+                print(f"❌ Probe listing fetch failed: {e}")
+                break
+            for i in range(0, len(ad_urls), Config.BATCH_SIZE):
+                batch_urls = ad_urls[i:i + Config.BATCH_SIZE]
+                ads += len(await process_ad_batch(pool, batch_urls, AdKeySet(), semaphore, failures))
+                attempted += len(batch_urls)
+                if Config.BATCH_DELAY > 0 and await shutdown.sleep(Config.BATCH_DELAY):
+                    break
+            if not next_page_url or shutdown.stopping or page + 1 == Config.TUNE_PAGES:
+                break
+            page_url = next_page_url
+            await shutdown.sleep(Config.PAGE_DELAY)
+        members = pool.members + pool.retired
+        result = ProbeResult(params, ads, attempted, len(failures),
+                             sum(member.requests for member in members), sum(member.errors for member in members),
+                             time.monotonic() - started)
+    print(f"📈 Probe result: {result}")
+    return result
+
+async def tune_async():
+    """Подбор SEMAPHORE_LIMIT/BATCH_SIZE/задержек/лимита соединений пробными обходами и запись в .env"""
+    global _job_loop
+    loop = asyncio.get_running_loop()
+    _job_loop = loop
+    shutdown.install(loop)
+    baseline = {name: getattr(Config, name) for name in TUNE_SPACE}
+    print(f"🎛️ Tuning against {Config.TUNE_URL}: up to {Config.TUNE_MAX_PROBES} probes of {Config.TUNE_PAGES} page(s), "
+          f"max error rate {Config.TUNE_MAX_ERROR_RATE:.0%}")
+
+    async def probe(params):
+        if shutdown.stopping:
+            raise TuningAborted()
+        return await run_tune_probe_async(params)
+
+    try:
+        best, results = await greedy_search(baseline, probe, max_error_rate=Config.TUNE_MAX_ERROR_RATE,
+                                            max_probes=Config.TUNE_MAX_PROBES)
+    except TuningAborted:
+        print("🛑 Tuning interrupted, .env not changed")
+        return
+
+    print("\n--- 🎛️ Tuning results ---")
+    for result in results:
+        print(f"   - {', '.join(f'{name}={value}' for name, value in result.params.items())}: {result}")
+    if best is None:
+        print(f"⚠️ Current settings already exceed {Config.TUNE_MAX_ERROR_RATE:.0%} errors. Lower the load instead; .env not changed")
+        return
+    changed = {name: value for name, value in best.params.items() if value != baseline[name]}
+    if not changed:
+        print("✅ Current settings are already the best found; .env not changed")
+        return
+    update_env_file(Config.TUNE_ENV_FILE, changed)
+    print(f"✅ Wrote {', '.join(f'{name}={value}' for name, value in changed.items())} to {Config.TUNE_ENV_FILE} ({best})")
+
+async def save_unsaved_before_exit_async():
+    """Сохранение пакетов, запись которых не подтверждена, перед выходом"""
+    try:
+        saved = await save_unsaved_ads_async()
+        print(f"✅ Saved {saved} unsaved ads before shutdown" if saved else "📭 No unsaved ads left")
+    except Exception as e:
+        # Запись не подтверждена: объявления не отмечены в frontier и будут обработаны при следующем запуске
+        unsaved = sum(len(batch) for batch in unsaved_batches)
+        print(f"❌ Error saving {unsaved} unsaved ads before shutdown: {e}")
+
+async def finish_shutdown_async():
+    """Дообработка заданий (не дольше SHUTDOWN_TIMEOUT), сохранение буфера и закрытие пулов"""
+    cancelled = await shutdown.drain(Config.SHUTDOWN_TIMEOUT)
+    if cancelled and Config.FRONTIER_ENABLED:
+        print("♻️ Unfinished ads stay pending in the frontier and will be retried on the next run")
+    try:
+        await asyncio.wait_for(save_unsaved_before_exit_async(), timeout=Config.SHUTDOWN_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"❌ Saving unsaved ads did not finish in {Config.SHUTDOWN_TIMEOUT}s")
+    save_phone_cache()
+    await _close_shared_resources()
+
+async def run_now_async(job_async, job_args, dump_now=False):
+    """Однократный запуск задания (--run-now) с той же остановкой по сигналам, что и у планировщика"""
+    global _job_loop, dump_enabled
+    dump_enabled = dump_enabled or dump_now
+    loop = asyncio.get_running_loop()
+    _job_loop = loop
+    shutdown.install(loop)
+
+    job = asyncio.create_task(shutdown.job(job_async)(*job_args))
+    stop_waiter = asyncio.create_task(shutdown.wait())
+    await asyncio.wait({job, stop_waiter}, return_when=asyncio.FIRST_COMPLETED)
+    stop_waiter.cancel()
+    if job.done() and not job.cancelled() and job.exception() is not None:
+        print(f"❌ Scraping job failed: {job.exception()}")
+
+    if dump_now and not shutdown.stopping:
+        print("💾 Running data dump immediately (--dump-now flag detected)")
+        await loop.run_in_executor(None, perform_dump_job)
+    await finish_shutdown_async()
+
+def add_schedule_job(scheduler, func, schedule, args=None):
+    """Задание по расписанию "HH:MM" (ежедневно) или "every 15m" (с интервалом, первый запуск сразу).
+
+    Запуски одного задания не накладываются: пропущенные за время обхода сливаются в один.
+    """
+    trigger, trigger_args = parse_schedule(schedule)
+    if trigger == 'interval':
+        trigger_args['next_run_time'] = datetime.datetime.now()
+    scheduler.add_job(func, trigger, args=args or [], max_instances=1, coalesce=True, misfire_grace_time=None, **trigger_args)
+
+async def run_scheduler_async(scrape_job_async, scrape_groups, daemon=False):
+    """Планировщик в одном event loop с заданиями: пулы HTTP сессий и БД живут между запусками.
+
+    daemon=True - параллельно с расписанием опрашивать первые страницы листинга (poll_new_ads_async).
+    Процесс работает до SIGINT/SIGTERM (или до конца дампа при EXIT_AFTER_DUMP=true).
+    """
+    global _job_loop
+    loop = asyncio.get_running_loop()
+    _job_loop = loop
+    shutdown.install(loop)
+    scheduler = AsyncIOScheduler(event_loop=loop)
+
+    for scrape_time, group_seeds in scrape_groups.items():
+        if not scrape_time:
+            print("⚠️ Warning: SCRAPE_TIME is not set in .env. Scraping will not be scheduled.")
+            continue
+        try:
+            add_schedule_job(scheduler, shutdown.job(scrape_job_async), scrape_time, args=[group_seeds] if group_seeds is not None else None)
+            seed_names = f" ({', '.join(seed.name for seed in group_seeds)})" if group_seeds else ""
+            print(f"⏰ Scheduled scraping job: {scrape_time}{seed_names}")
+        except ValueError:
+            print(f"⚠️ Warning: Invalid SCRAPE_TIME format '{scrape_time}'. Please use HH:MM or 'every 15m'.")
+
+    async def dump_job():
+        await loop.run_in_executor(None, perform_dump_job)
+        if Config.EXIT_AFTER_DUMP:
+            print("--- Dump finished, exiting application (EXIT_AFTER_DUMP) ---")
+            shutdown.request()
+
+    if Config.DUMP_TIME:
+        try:
+            add_schedule_job(scheduler, dump_job, Config.DUMP_TIME)
+            print(f"⏰ Scheduled data dump job: {Config.DUMP_TIME}")
+        except ValueError:
+            print(f"⚠️ Warning: Invalid DUMP_TIME format '{Config.DUMP_TIME}'. Please use HH:MM or 'every 1h'.")
+    else:
+        print("⚠️ Warning: DUMP_TIME is not set in .env. Data dumping will not be scheduled.")
+
+    scheduler.start()
+    print("✅ Scheduler started. Waiting for scheduled tasks...")
+    print("📊 Use 'docker-compose logs -f scraper' to monitor the application")
+    print("🛑 Press Ctrl+C to stop the application")
+
+    if daemon:
+        asyncio.create_task(shutdown.job(poll_new_ads_async)())
+
+    await shutdown.wait()
+    print("🔄 Shutting down scheduler...")
+    scheduler.shutdown(wait=False)
+    await finish_shutdown_async()
+    print("🏁 Application terminated.")
 
 if __name__ == "__main__":
     # Parse command line arguments
@@ -335,11 +1027,47 @@ if __name__ == "__main__":
                        help='Run scraping immediately without using scheduler')
     parser.add_argument('--dump-now', action='store_true',
                        help='Run data dump immediately after scraping')
+    parser.add_argument('--worker', action='store_true',
+                       help='Run as a sharded sweep worker (claims listing shards from PostgreSQL)')
+    parser.add_argument('--runs', type=int, nargs='?', const=10, metavar='N',
+                       help='Compare the last N runs from auto_ria_runs (default 10) and exit')
+    parser.add_argument('--tune', action='store_true',
+                       help='Probe parameter combinations against TUNE_URL and write the best ones to .env')
+    parser.add_argument('--daemon', action='store_true',
+                       help='Poll the first listing pages continuously for new ads (alongside the schedule)')
+    parser.add_argument('--dedupe', choices=['full', 'lazy', 'merge'],
+                       help='How known ads are skipped for this run: load the whole table (full) or check each listing page (lazy); '
+                            'merge - merge rows of one ad stored under several URL spellings (logs every deleted row) and exit')
     args = parser.parse_args()
-    
-    # Set up signal handlers
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    if args.dedupe in ('full', 'lazy'):
+        Config.DEDUPE_MODE = args.dedupe
+
+    # Логи пишутся через очередь фоновым потоком (LOG_FORMAT=json|text)
+    setup_logging()
+
+    if args.tune:
+        if not Config.TUNE_URL:
+            print("❌ Tuning needs TUNE_URL or AUTO_RIA_START_URL. Exiting...")
+            sys.exit(1)
+        asyncio.run(tune_async())
+        sys.exit(0)
+
+    if args.dedupe == 'merge':
+        async def merge_duplicates():
+            try:
+                await merge_duplicates_and_backfill_async()
+            finally:
+                await close_db_pool_async()
+        asyncio.run(merge_duplicates())
+        print("✅ Duplicate ads merged, ad_key assigned")
+        sys.exit(0)
+
+    if args.runs:
+        async def show_runs():
+            print(format_runs_report(await get_recent_runs_async(args.runs)))
+            await close_db_pool_async()
+        asyncio.run(show_runs())
+        sys.exit(0)
     
     print("🚀 Starting AutoRia Scraper (ASYNC VERSION)...")
     print(f"📅 Current time: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -357,6 +1085,11 @@ if __name__ == "__main__":
     print(f"   - Auto-save Interval: {Config.AUTO_SCRAPE_TIME} seconds" if Config.AUTO_SCRAPE_TIME else "   - Auto-save: Disabled")
     print(f"   - Start URL: {Config.AUTO_RIA_START_URL}")
     print(f"   - Mode: ASYNCHRONOUS (High Performance)")
+    print(f"   - Dedupe: {Config.DEDUPE_MODE}")
+    if args.worker:
+        print(f"   - Sharded Worker: {Config.WORKER_ID} ({Config.SHARD_TOTAL_PAGES} pages in shards of {Config.SHARD_PAGES})")
+    if args.daemon or Config.DAEMON_ENABLED:
+        print(f"   - Daemon: {Config.DAEMON_PAGES} pages every {Config.DAEMON_MIN_INTERVAL:.0f}-{Config.DAEMON_MAX_INTERVAL:.0f}s")
     print(f"")
     print(f"⚙️ Performance Parameters:")
     print(f"   - Semaphore Limit: {Config.SEMAPHORE_LIMIT} concurrent requests")
@@ -365,103 +1098,37 @@ if __name__ == "__main__":
     print(f"   - Page Delay: {Config.PAGE_DELAY}s between pages")
     print(f"   - Connection Limit: {Config.CONNECTION_LIMIT} total, {Config.CONNECTION_LIMIT_PER_HOST} per host")
     print(f"   - Timeouts: {Config.CONNECTION_TIMEOUT}s total, {Config.CONNECT_TIMEOUT}s connect")
+    print(f"   - HTTP Transport: {Config.HTTP_TRANSPORT} (DNS cache {Config.DNS_CACHE_TTL}s, keep-alive {Config.KEEPALIVE_TIMEOUT}s)")
     
+    try:
+        crawl_seeds = load_crawl_plan()
+    except (OSError, ValueError) as e:
+        print(f"❌ Cannot load crawl plan '{Config.CRAWL_PLAN_FILE}': {e}")
+        sys.exit(1)
+    if Config.CRAWL_PLAN_FILE:
+        print(f"   - Crawl Plan: {Config.CRAWL_PLAN_FILE} ({len(crawl_seeds)} seeds)")
+    if Config.SHARDED_SWEEP and not args.worker:
+        # AUTO_RIA_START_URL обходят воркеры по шардам - второй обход того же листинга не нужен
+        crawl_seeds = [seed for seed in crawl_seeds if seed.url != Config.AUTO_RIA_START_URL]
+        print(f"   - Sharded Sweep: {Config.AUTO_RIA_START_URL} is crawled by scraper-worker, not by this process")
+
     # Check if immediate execution is requested
     if args.run_now:
         print("🏃‍♂️ Running scraper immediately (--run-now flag detected)")
-        try:
-            # Run scraping job immediately
-            perform_scraping_job()
-            
-            # Run dump job if requested
-            if args.dump_now:
-                print("💾 Running data dump immediately (--dump-now flag detected)")
-                perform_dump_job()
-            
-            print("✅ Immediate execution completed. Exiting.")
-            sys.exit(0)
-            
-        except (KeyboardInterrupt, SystemExit):
-            print("\n🛑 Immediate execution interrupted. Shutting down...")
-            # Stop auto-save worker if running
-            auto_save_stop_event.set()
-            # Save any unsaved collected data before exit
-            with all_ads_data_lock, last_saved_index_lock:
-                total_records = len(all_ads_data)
-                if total_records > last_saved_index:
-                    remaining_records = all_ads_data[last_saved_index:]
-                    current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    print(f"\n💾 [{current_time}] Saving {len(remaining_records)} unsaved ads to PostgreSQL before shutdown...")
-                    try:
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        loop.run_until_complete(save_data_to_postgresql_async(remaining_records))
-                        loop.close()
-                        print(f"✅ [{current_time}] Successfully saved {len(remaining_records)} unsaved records before shutdown")
-                    except Exception as e:
-                        print(f"❌ [{current_time}] Error saving data to database: {e}")
-                elif total_records > 0:
-                    print(f"📭 All {total_records} collected ads have already been saved")
-                else:
-                    print("📭 No data to save to database")
-            print("🏁 Immediate execution terminated.")
-            sys.exit(0)
-    
-    # Continue with scheduler-based execution if --run-now not specified
-    scheduler = BackgroundScheduler()
+        job_args = [] if args.worker else [crawl_seeds]
+        asyncio.run(run_now_async(perform_worker_job_async if args.worker else perform_scraping_job_async, job_args, args.dump_now))
+        print("🏁 Immediate execution terminated." if shutdown.stopping else "✅ Immediate execution completed. Exiting.")
+        sys.exit(0)
 
-    if Config.SCRAPE_TIME:
-        try:
-            scrape_hour, scrape_minute = map(int, Config.SCRAPE_TIME.split(':'))
-            scheduler.add_job(perform_scraping_job, 'cron', hour=scrape_hour, minute=scrape_minute)
-            print(f"⏰ Scheduled scraping job to run daily at {Config.SCRAPE_TIME}")
-        except ValueError:
-            print(f"⚠️ Warning: Invalid SCRAPE_TIME format '{Config.SCRAPE_TIME}'. Please use HH:MM.")
-    else:
-        print("⚠️ Warning: SCRAPE_TIME is not set in .env. Scraping will not be scheduled.")
-
-    if Config.DUMP_TIME:
-        try:
-            dump_hour, dump_minute = map(int, Config.DUMP_TIME.split(':'))
-            scheduler.add_job(perform_dump_job, 'cron', hour=dump_hour, minute=dump_minute)
-            print(f"⏰ Scheduled data dump job to run daily at {Config.DUMP_TIME}")
-        except ValueError:
-            print(f"⚠️ Warning: Invalid DUMP_TIME format '{Config.DUMP_TIME}'. Please use HH:MM.")
+    # Continue with scheduler-based execution if --run-now not specified
+    if args.worker:
+        scrape_groups = {Config.SCRAPE_TIME: None}
     else:
-        print("⚠️ Warning: DUMP_TIME is not set in .env. Data dumping will not be scheduled.")
-    
-    if Config.DUMP_TIME:
-        try:
-            dump_hour, dump_minute = map(int, Config.DUMP_TIME.split(':'))
-            # Schedule graceful_exit slightly after DUMP_TIME
-            exit_minute = (dump_minute + 5) % 60
-            exit_hour = dump_hour + (dump_minute + 5) // 60
-            if exit_hour > 23:
-                exit_hour = exit_hour % 24
-            
-            scheduler.add_job(graceful_exit, 'cron', args=[scheduler], hour=exit_hour, minute=exit_minute)
-            print(f"⏰ Scheduled graceful exit at {exit_hour:02d}:{exit_minute:02d}")
-        except ValueError:
-            print(f"⚠️ Warning: Could not schedule graceful exit due to invalid DUMP_TIME format '{Config.DUMP_TIME}'.")
+        # Seed'ы плана со своим schedule запускаются отдельными заданиями, остальные - по SCRAPE_TIME
+        scrape_groups = group_seeds_by_schedule(crawl_seeds)
 
-    scheduler.start()
-    print("✅ Scheduler started. Waiting for scheduled tasks...")
-    print("📊 Use 'docker-compose logs -f scraper' to monitor the application")
-    print("🛑 Press Ctrl+C to stop the application")
-
-    try:
-        while not stop_main_thread_event.is_set():
-            time.sleep(0.1)  # Shorter sleep for more responsive shutdown
-    except (KeyboardInterrupt, SystemExit):
-        print("\n🛑 Application interrupted. Shutting down scheduler...")
-        stop_main_thread_event.set()
-    finally:
-        try:
-            print("🔄 Shutting down scheduler...")
-            scheduler.shutdown(wait=False)  # Don't wait for jobs to complete
-            print("✅ Scheduler shut down. Exiting.")
-        except Exception as e:
-            print(f"⚠️ Error during shutdown: {e}")
-        finally:
-            print("🏁 Application terminated.")
-            os._exit(0)  # Force exit
+    daemon = args.daemon or Config.DAEMON_ENABLED
+    if daemon and not Config.DAEMON_URL:
+        print("❌ Daemon mode needs DAEMON_URL or AUTO_RIA_START_URL. Exiting...")
+        sys.exit(1)
+    asyncio.run(run_scheduler_async(perform_worker_job_async if args.worker else perform_scraping_job_async, scrape_groups, daemon=daemon))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Тесты плана обхода (TOML) и ограничителя частоты запросов
+"""
+
+import asyncio
+import time
+import tomllib
+
+from scraper.core.crawl_plan import parse_crawl_plan, parse_schedule, group_seeds_by_schedule
+from scraper.core.rate_limiter import RateLimiter
+
+PLAN_TOML = """
+[[seed]]
+name = "newauto"
+url = "https://auto.ria.com/uk/newauto/search/"
+priority = 5
+max_pages = 50
+schedule = "02:30"
+
+[[seed]]
+name = "used"
+url = "https://auto.ria.com/uk/car/used/"
+priority = 10
+rate = 2.0
+"""
+
+
+def test_parse_plan_orders_by_priority():
+    """Seed'ы сортируются по приоритету и группируются по времени запуска"""
+    seeds = parse_crawl_plan(tomllib.loads(PLAN_TOML))
+    assert [seed.name for seed in seeds] == ["used", "newauto"]
+    assert seeds[0].rate == 2.0 and seeds[1].max_pages == 50
+
+    groups = group_seeds_by_schedule(seeds)
+    assert [seed.name for seed in groups["02:30"]] == ["newauto"]
+
+
+def test_parse_plan_rejects_invalid_seed():
+    """Опечатки в ключах и неверное время запуска не принимаются молча"""
+    for bad_toml in ('[[seed]]\nurl = "https://auto.ria.com/"\nmaxpages = 5',
+                     '[[seed]]\nurl = "https://auto.ria.com/"\nschedule = "25:00"',
+                     '[[seed]]\nurl = "https://auto.ria.com/"\nschedule = "every 0m"',
+                     '[[seed]]\nname = "no-url"'):
+        try:
+            parse_crawl_plan(tomllib.loads(bad_toml))
+        except ValueError:
+            continue
+        raise AssertionError(f"Plan should be rejected: {bad_toml!r}")
+
+
+def test_parse_schedule_cron_and_interval():
+    """Ежедневное время и интервал для инкрементального обхода"""
+    assert parse_schedule("02:30") == ('cron', {'hour': 2, 'minute': 30})
+    assert parse_schedule("every 15m") == ('interval', {'minutes': 15})
+    assert parse_schedule("every 2h") == ('interval', {'hours': 2})
+
+
+def test_rate_limiter_spaces_requests():
+    """После исчерпания burst запросы идут не чаще rate в секунду"""
+    async def run():
+        limiter = RateLimiter(rate=20, burst=2)
+        started = time.monotonic()
+        for _ in range(4):
+            await limiter.acquire()
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(run())
+    assert elapsed >= 0.09
+
+
+if __name__ == "__main__":
+    test_parse_plan_orders_by_priority()
+    test_parse_plan_rejects_invalid_seed()
+    test_parse_schedule_cron_and_interval()
+    test_rate_limiter_spaces_requests()
+    print("✅ Crawl plan tests passed")
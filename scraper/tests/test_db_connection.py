@@ -11,6 +11,7 @@ import datetime
 # Добавляем путь к модулю scraper
 sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
 
+from scraper.core.models import AdRecord
 from scraper.database.db_operations import connect_db, connect_db_async, save_data_to_postgresql_async, get_existing_ad_urls_async
 
 async def test_database_connection():
@@ -54,18 +55,18 @@ async def test_data_operations():
     
     # Тест сохранения тестовых данных
     print("2. Testing save_data_to_postgresql_async...")
-    test_data = [{
-        "url": f"https://test.example.com/test_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.html",
-        "title": "Test Car",
-        "price_usd": 10000,
-        "odometer": 50000,
-        "username": "Test User",
-        "phone_number": 1234567890,
-        "image_url": "https://test.example.com/image.jpg",
-        "images_count": 10,
-        "car_number": "AA1234BB",
-        "car_vin": "1HGBH41JXMN109186"
-    }]
+    test_data = [AdRecord(
+        url=f"https://test.example.com/test_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.html",
+        title="Test Car",
+        price_usd=10000,
+        odometer=50000,
+        username="Test User",
+        phone_number=1234567890,
+        image_url="https://test.example.com/image.jpg",
+        images_count=10,
+        car_number="AA1234BB",
+        car_vin="1HGBH41JXMN109186"
+    )]
     
     try:
         await save_data_to_postgresql_async(test_data)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Тесты режима DEDUPE_MODE=lazy: проверка кандидатов страницы одним запросом и LRU ответов
+"""
+
+import asyncio
+
+from scraper.database.known_ads import LazyKnownAds
+
+BMW = "https://auto.ria.com/uk/auto_bmw_x6_38365738.html"
+AUDI = "https://auto.ria.com/uk/auto_audi_a6_38000001.html"
+VW = "https://auto.ria.com/uk/auto_volkswagen_golf_38000002.html"
+
+
+class FakeKnownAds(LazyKnownAds):
+    """Вместо auto_ria_ads - множество ключей; запросы записываются"""
+
+    def __init__(self, in_db, cache_size=100):
+        super().__init__(cache_size)
+        self.in_db = in_db
+        self.requested = []
+
+    async def _fetch_known_async(self, urls):
+        self.requested.append(list(urls))
+        return {self._key(url) for url in urls} & {self._key(url) for url in self.in_db}
+
+
+def test_prefetch_queries_only_unanswered_urls():
+    """Одна выборка на страницу; уже известные ответы (и другое написание URL) в БД не запрашиваются"""
+    known = FakeKnownAds({BMW})
+    assert AUDI not in known
+    asyncio.run(known.prefetch_async([BMW, AUDI]))
+    assert BMW in known and AUDI not in known
+    asyncio.run(known.prefetch_async(["https://auto.ria.com/auto_bmw_x6_38365738.html?utm=1", AUDI]))
+    assert known.requested == [[BMW, AUDI]] and known.queries == 1
+    known.add(AUDI)
+    assert AUDI in known
+
+
+def test_lru_evicts_oldest_answers():
+    """Вытесненный ответ запрашивается заново"""
+    known = FakeKnownAds({BMW, AUDI}, cache_size=2)
+    asyncio.run(known.prefetch_async([BMW, AUDI]))
+    asyncio.run(known.prefetch_async([BMW]))
+    asyncio.run(known.prefetch_async([VW]))
+    assert len(known) == 2 and BMW in known and AUDI not in known
+    asyncio.run(known.prefetch_async([AUDI]))
+    assert known.requested[-1] == [AUDI] and AUDI in known
+
+
+if __name__ == "__main__":
+    test_prefetch_queries_only_unanswered_urls()
+    test_lru_evicts_oldest_answers()
+    print("✅ All known ads tests passed")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Тесты структурированного логирования (JSON формат, сэмплирование событий)
+"""
+
+import json
+import logging
+import queue
+
+from scraper.core.log import JsonFormatter, RecordQueueHandler, SamplingFilter, parse_sample_rates
+
+
+def _record(level, msg, **extra):
+    record = logging.makeLogRecord({'name': 'scraper.test', 'levelno': level,
+                                    'levelname': logging.getLevelName(level), 'msg': msg})
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_event_fields():
+    """Поля из extra попадают в JSON строку рядом с сообщением"""
+    line = JsonFormatter().format(_record(logging.INFO, "batch done", event='batch_summary', ok=7, failed=1))
+    entry = json.loads(line)
+    assert entry['level'] == 'info' and entry['msg'] == "batch done"
+    assert (entry['event'], entry['ok'], entry['failed']) == ('batch_summary', 7, 1)
+
+
+def test_sampling_keeps_warnings():
+    """Событие с долей 0 отбрасывается, но предупреждения и события без доли проходят"""
+    rates = parse_sample_rates("ad_processed=0, batch_summary=1")
+    assert rates['ad_processed'] == 0 and rates['phone_cache_hit'] == 0.05
+    sampler = SamplingFilter(rates)
+    assert not sampler.filter(_record(logging.DEBUG, "ad", event='ad_processed'))
+    assert sampler.filter(_record(logging.WARNING, "ad", event='ad_processed'))
+    assert sampler.filter(_record(logging.INFO, "batch", event='batch_summary'))
+    assert sampler.filter(_record(logging.INFO, "plain message"))
+
+
+def test_queue_handler_keeps_traceback():
+    """Traceback из logger.exception доходит через очередь до JSON и текстового формата"""
+    log_queue = queue.SimpleQueue()
+    logger = logging.getLogger('scraper.test_queue')
+    logger.propagate = False
+    handler = RecordQueueHandler(log_queue)
+    logger.addHandler(handler)
+    try:
+        try:
+            raise ValueError("broken row")
+        except ValueError:
+            logger.exception("save %s failed", "batch", extra={'event': 'save_error'})
+    finally:
+        logger.removeHandler(handler)
+
+    record = log_queue.get_nowait()
+    assert record.exc_info is None  # в поток слушателя уходит только текст traceback
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry['msg'] == "save batch failed" and entry['event'] == 'save_error'
+    assert 'Traceback' in entry['exc'] and 'ValueError: broken row' in entry['exc']
+    assert 'ValueError: broken row' in logging.Formatter('%(message)s').format(record)
+
+
+if __name__ == "__main__":
+    test_json_formatter_includes_event_fields()
+    test_sampling_keeps_warnings()
+    test_queue_handler_keeps_traceback()
+    print("✅ All logging tests passed")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Тесты модели AdRecord и JSON-сериализации дампа
+"""
+
+import json
+
+from scraper.core import models
+from scraper.core.models import AD_COLUMNS, AdRecord, dumps_ad_records
+
+
+def test_as_tuple_follows_db_column_order():
+    """as_tuple возвращает значения в порядке колонок auto_ria_ads"""
+    record = AdRecord(url="https://auto.ria.com/uk/auto_bmw_x6_38365738.html", title="BMW X6", price_usd=38500, car_vin="WBAKV610X00Z12345")
+    values = record.as_tuple()
+    assert len(values) == len(AD_COLUMNS)
+    assert dict(zip(AD_COLUMNS, values)) == record.to_dict()
+    assert values[0] == record.url and values[2] == 38500 and values[-1] == "WBAKV610X00Z12345"
+
+
+def test_dump_roundtrip():
+    """Дамп записей читается обратно в те же словари"""
+    records = [AdRecord(url="https://auto.ria.com/uk/auto_a_1.html", title="Київ Audi", phone_number=380671234567)]
+    assert json.loads(dumps_ad_records(records)) == [records[0].to_dict()]
+    assert AdRecord.from_dict(records[0].to_dict()) == records[0]
+
+
+def test_dump_format_matches_json_module():
+    """С orjson и без него дамп совпадает с json.dumps(indent=4): без токенов телефона, тот же отступ"""
+    records = [AdRecord(url="https://auto.ria.com/uk/auto_a_1.html", title="Київ Audi", price_usd=12000, phone_hash="abc", phone_expires=1),
+               AdRecord(url="https://auto.ria.com/uk/auto_b_2.html")]
+    expected = json.dumps([record.to_dict() for record in records], ensure_ascii=False, indent=4)
+    assert dumps_ad_records(records) == expected
+    assert dumps_ad_records([]) == json.dumps([], indent=4)
+
+    installed = models.orjson
+    models.orjson = None
+    try:
+        assert dumps_ad_records(records) == expected
+    finally:
+        models.orjson = installed
+
+
+def test_content_hash_tracks_content_only():
+    """Хеш меняется вместе с содержимым, но не зависит от URL; None отличается от пустой строки"""
+    record = AdRecord(url="https://auto.ria.com/uk/auto_a_1.html", title="Audi A4", price_usd=12000)
+    same = AdRecord(url="https://auto.ria.com/uk/auto_a_2.html", title="Audi A4", price_usd=12000)
+    cheaper = AdRecord(url=record.url, title="Audi A4", price_usd=11500)
+    assert record.content_hash() == same.content_hash()
+    assert record.content_hash() != cheaper.content_hash()
+    assert AdRecord(url="u", car_vin="").content_hash() != AdRecord(url="u").content_hash()
+
+
+if __name__ == "__main__":
+    test_as_tuple_follows_db_column_order()
+    test_dump_roundtrip()
+    test_dump_format_matches_json_module()
+    test_content_hash_tracks_content_only()
+    print("✅ AdRecord tests passed")
@@ -45,7 +45,7 @@ async def test_newauto_parsing():
             if ad_data:
                 print("✅ Данные успешно извлечены:")
                 print("-" * 40)
-                for key, value in ad_data.items():
+                for key, value in ad_data.to_dict().items():
                     print(f"{key.replace('_', ' ').title()}: {value}")
                 print("-" * 40)
                 
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Тесты частичного парсинга (SoupStrainer) без сетевых запросов
+"""
+
+import asyncio
+from unittest import mock
+
+from bs4 import BeautifulSoup
+
+from scraper.config import Config
+from scraper.core import scraper_core
+from scraper.core.models import AdRecord
+from scraper.core.scraper_core import (
+    LISTING_PAGE_STRAINER,
+    REGULAR_AD_STRAINER,
+    extract_listing_links,
+    extract_targeted_regular_fields,
+    parse_ad_page,
+)
+
+AD_HTML = """
+<html><body>
+<div class="menu"><a href="/uk/">Головна</a><p>Реклама 100 км</p></div>
+<h1 class="head">Audi A4 2015</h1>
+<div class="seller_info_name bold">Олександр</div>
+<span class="state-num ua">AA 1234 BB<span class="popup">Перевірений</span></span>
+<footer><p>Footer text</p></footer>
+</body></html>
+"""
+
+LISTING_HTML = """
+<html><body>
+<div class="header"><p>Шапка</p></div>
+<div id="searchResults"><section class="ticket-item"><a class="address" href="/uk/auto_audi_a4_1.html">A4</a></section></div>
+<a class="page-link js-next" href="/uk/car/used/?page=2">Далі</a>
+</body></html>
+"""
+
+DEALER_LISTING_HTML = """
+<html><body>
+<div id="searchResults">
+<section class="ticket-item"><a class="address" href="https://auto.ria.com/uk/auto_audi_a4_1.html">A4</a></section>
+<section class="ticket-item"><a class="address" href="/uk/auto_audi_a4_1.html#photo">A4</a></section>
+<a class="proposition_link" href="/uk/newauto/auto-skoda-octavia-2.html?utm_source=list">Octavia</a>
+<a href="/uk/newauto/auto-skoda-octavia-2.html">Octavia</a>
+<a href="/uk/autosalons/auto-plaza-3.html">Автосалон</a>
+<a href="/uk/auto-bmw-x5-4.html">X5</a>
+</div>
+<a class="page-link js-next" href="/uk/car/used/?page=2">Далі</a>
+</body></html>
+"""
+
+OUTSIDE_RESULTS_HTML = """
+<html><body>
+<div class="header"><a class="address" href="/uk/auto_vw_golf_5.html">Рекомендуємо</a></div>
+<div id="searchResults"><section class="ticket-item"><a class="address" href="/uk/auto_audi_a4_1.html">A4</a></section></div>
+<div class="recommendations"><a class="address" href="/uk/auto_vw_passat_6.html">Passat</a></div>
+</body></html>
+"""
+
+
+def test_regular_strainer_keeps_only_containers():
+    """В частичное дерево попадают только контейнеры с полями объявления"""
+    soup = BeautifulSoup(AD_HTML, 'html.parser', parse_only=REGULAR_AD_STRAINER)
+    assert soup.find('footer') is None
+    assert soup.find('div', class_='menu') is None
+    assert soup.find('span', class_='popup') is not None
+
+    data = AdRecord(url="https://auto.ria.com/uk/auto_audi_a4_1.html")
+    extract_targeted_regular_fields(soup, data)
+    assert data.title == "Audi A4 2015"
+    assert data.username == "Олександр"
+
+
+def test_listing_strainer_keeps_cards_and_pagination():
+    """Листинг: карточки и ссылка пагинации сохраняются, остальное отбрасывается"""
+    soup = BeautifulSoup(LISTING_HTML, 'html.parser', parse_only=LISTING_PAGE_STRAINER)
+    assert soup.find('div', class_='header') is None
+    assert soup.find('div', id='searchResults').find('a', class_='address') is not None
+    assert soup.find('a', class_='page-link js-next').get('href') == "/uk/car/used/?page=2"
+
+
+def test_listing_links_are_normalized_and_deduplicated():
+    """Одно объявление под разными написаниями ссылки попадает в список один раз"""
+    page_url = "https://auto.ria.com/uk/car/used/"
+    soup = BeautifulSoup(DEALER_LISTING_HTML, 'html.parser', parse_only=LISTING_PAGE_STRAINER)
+    ad_urls, next_page_url = extract_listing_links(soup, page_url)
+    assert ad_urls == [
+        "https://auto.ria.com/uk/auto_audi_a4_1.html",
+        "https://auto.ria.com/uk/newauto/auto-skoda-octavia-2.html",
+        "https://auto.ria.com/uk/auto-bmw-x5-4.html",
+    ]
+    assert next_page_url == "https://auto.ria.com/uk/car/used/?page=2"
+
+
+def test_address_links_outside_results_are_ignored():
+    """a.address вне блока выдачи (шапка, рекомендации) не считается объявлением листинга"""
+    page_url = "https://auto.ria.com/uk/car/used/"
+    for soup in (BeautifulSoup(OUTSIDE_RESULTS_HTML, 'html.parser', parse_only=LISTING_PAGE_STRAINER),
+                 BeautifulSoup(OUTSIDE_RESULTS_HTML, 'html.parser')):
+        ad_urls, _ = extract_listing_links(soup, page_url)
+        assert ad_urls == ["https://auto.ria.com/uk/auto_audi_a4_1.html"]
+
+
+def test_partial_ad_without_json_ld_is_parsed_once():
+    """Без JSON-LD страница разбирается один раз, токены телефона (deferred) берутся из того же дерева"""
+    html = AD_HTML.replace('<footer>', '<div class="phone" data-hash="abc123" data-expires="1700000000"></div><footer>')
+    original = (Config.PARSE_MODE, Config.PHONE_ENRICHMENT)
+    try:
+        Config.PARSE_MODE, Config.PHONE_ENRICHMENT = 'partial', 'deferred'
+        with mock.patch.object(scraper_core, 'BeautifulSoup', wraps=BeautifulSoup) as soup_factory:
+            data = asyncio.run(parse_ad_page("https://auto.ria.com/uk/auto_audi_a4_1.html", html, None))
+        assert soup_factory.call_count == 1
+        assert data.title == "Audi A4 2015"
+        assert (data.phone_hash, data.phone_expires) == ("abc123", 1700000000)
+    finally:
+        Config.PARSE_MODE, Config.PHONE_ENRICHMENT = original
+
+
+def test_dom_photo_count_wins_over_json_ld():
+    """Счетчик фото show-all важнее числа картинок в JSON-LD, JSON-LD - только запасной вариант"""
+    json_ld = ('<script type="application/ld+json">{"@type": "Car", "name": "Audi A4 2015", '
+               '"image": ["https://cdn.riastatic.com/a4_1.jpg", "https://cdn.riastatic.com/a4_2.jpg"]}</script>')
+    url = "https://auto.ria.com/uk/auto_audi_a4_1.html"
+    with_counter = AD_HTML.replace('<footer>', json_ld + '<a class="show-all link-dotted" href="#">Дивитись всі 25 фото</a><footer>')
+    without_counter = AD_HTML.replace('<footer>', json_ld + '<footer>')
+    original = Config.PHONE_ENRICHMENT
+    try:
+        Config.PHONE_ENRICHMENT = 'deferred'
+        assert asyncio.run(parse_ad_page(url, with_counter, None)).images_count == 25
+        assert asyncio.run(parse_ad_page(url, without_counter, None)).images_count == 2
+    finally:
+        Config.PHONE_ENRICHMENT = original
+
+
+if __name__ == "__main__":
+    test_regular_strainer_keeps_only_containers()
+    test_listing_strainer_keeps_cards_and_pagination()
+    test_listing_links_are_normalized_and_deduplicated()
+    test_address_links_outside_results_are_ignored()
+    test_partial_ad_without_json_ld_is_parsed_once()
+    test_dom_photo_count_wins_over_json_ld()
+    print("✅ Partial parsing tests passed")
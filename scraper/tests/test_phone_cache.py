@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Тесты кэша телефонов (TTL, LRU, сохранение между запусками)
+"""
+
+import os
+import tempfile
+import time
+
+from bs4 import BeautifulSoup
+
+from scraper.core.phone_cache import PhoneCache
+from scraper.core.scraper_core import extract_seller_key
+
+
+def test_lookup_by_ad_and_seller():
+    """Телефон дилера находится по продавцу для нового объявления"""
+    cache = PhoneCache(ttl_seconds=3600, max_entries=10)
+    cache.store(["(067) 123 45 67"], ad_id="111", seller_key="https://auto.ria.com/dealers/avto-plaza")
+    assert cache.lookup("111") == ["(067) 123 45 67"]
+    assert cache.lookup("222", "https://auto.ria.com/dealers/avto-plaza") == ["(067) 123 45 67"]
+    assert cache.lookup("333") is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_lru_bound_and_ttl():
+    """Старые записи вытесняются, просроченные не возвращаются"""
+    cache = PhoneCache(ttl_seconds=3600, max_entries=2)
+    cache.store(["1"], ad_id="1")
+    cache.store(["2"], ad_id="2")
+    cache.lookup("1")
+    cache.store(["3"], ad_id="3")
+    assert cache.lookup("2") is None and cache.lookup("1") == ["1"]
+
+    expired = PhoneCache(ttl_seconds=0, max_entries=10)
+    expired._put("ad:9", ["9"], time.time() - 5)
+    assert expired.lookup("9") is None
+
+
+def test_save_and_load_roundtrip():
+    """Кэш переживает перезапуск через JSON файл"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "phone_cache.json")
+        cache = PhoneCache(ttl_seconds=3600, max_entries=10)
+        cache.store(["380671234567"], ad_id="555", seller_key="https://auto.ria.com/users/42")
+        cache.save(path)
+
+        restored = PhoneCache(ttl_seconds=3600, max_entries=10)
+        restored.load(path)
+        assert restored.lookup("555") == ["380671234567"]
+        assert len(restored) == 2
+
+
+def test_seller_key_ignores_header_links():
+    """Ключ продавца берется только из блока продавца, ссылка входа в шапке не считается продавцом"""
+    header = '<header><a href="/uk/users/login">Вхід</a><a href="/uk/dealers/">Автосалони</a></header>'
+    no_seller = BeautifulSoup(f'<html><body>{header}<h1>BMW X5</h1></body></html>', 'html.parser')
+    assert extract_seller_key(no_seller) is None
+
+    seller = ('<div class="seller_info_name"><a href="/uk/dealers/avto-plaza-123/?utm=ad">'
+              '<strong class="name">Авто Плаза</strong></a></div>')
+    with_seller = BeautifulSoup(f'<html><body>{header}{seller}</body></html>', 'html.parser')
+    assert extract_seller_key(with_seller) == "https://auto.ria.com/uk/dealers/avto-plaza-123"
+
+    pro = BeautifulSoup(f'<html><body>{header}<a class="sellerPro" href="/uk/users/42">Іван</a></body></html>', 'html.parser')
+    assert extract_seller_key(pro) == "https://auto.ria.com/uk/users/42"
+
+
+if __name__ == "__main__":
+    test_lookup_by_ad_and_seller()
+    test_lru_bound_and_ttl()
+    test_save_and_load_roundtrip()
+    test_seller_key_ignores_header_links()
+    print("✅ Phone cache tests passed")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Тесты режима демона (адаптивный интервал опроса, перцентили задержки)
+"""
+
+import random
+
+from scraper.core.polling import AdaptivePollInterval, LatencySample, LatencyStats
+
+
+def test_interval_shrinks_on_new_ads_and_grows_without():
+    """Новые объявления сокращают интервал до минимума, пустые опросы растягивают до максимума"""
+    interval = AdaptivePollInterval(30, 300)
+    assert interval.update(False) == 45
+    assert interval.update(False) == 67.5
+    assert interval.update(True) == 33.75
+    assert interval.update(True) == 30
+    for _ in range(20):
+        interval.update(False)
+    assert interval.current == 300
+
+
+def test_latency_percentiles():
+    """p50/p95 по последним значениям окна"""
+    stats = LatencyStats(window=100)
+    assert stats.percentile(50) is None
+    for value in range(1, 201):
+        stats.add(value)
+    assert len(stats) == 100
+    assert stats.percentile(50) == 151 and stats.percentile(95) == 196
+
+
+def test_latency_sample_is_bounded():
+    """Выборка не растет больше size и сохраняет перцентили всего потока"""
+    stats = LatencySample(size=1000, rng=random.Random(1))
+    for value in range(100000):
+        stats.add(value)
+    assert len(stats) == 1000 and stats.count == 100000
+    assert 45000 < stats.percentile(50) < 55000
+    assert 92000 < stats.percentile(95) < 98000
+
+
+if __name__ == "__main__":
+    test_interval_shrinks_on_new_ads_and_grows_without()
+    test_latency_percentiles()
+    test_latency_sample_is_bounded()
+    print("✅ All polling tests passed")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Тесты журнала запусков (итоги запуска, отчет сравнения запусков)
+"""
+
+import asyncio
+import datetime
+from contextlib import asynccontextmanager
+
+from scraper import main
+from scraper.config import Config
+from scraper.core.run_stats import RunStats, get_run_stats, reset_run_stats
+from scraper.core.shutdown import ShutdownCoordinator
+from scraper.core.transport import get_transport_stats, reset_transport_stats
+from scraper.database.runs import format_runs_report
+
+
+def test_run_row_includes_rates_and_percentiles():
+    """Строка запуска: доля телефонов, байты и p50/p95 загрузки из статистики транспорта"""
+    reset_transport_stats()
+    stats = get_transport_stats('aiohttp')
+    for latency in (0.1, 0.2, 0.3, 0.4):
+        stats.record_response(latency)
+    stats.record_bytes(2048)
+
+    run = RunStats('scrape')
+    run.record_batch(ok=3, skipped=1, failed=1)
+    run.record_phone(['+380501234567'])
+    run.record_phone(None)
+    run.parse_times.add(0.05)
+    row = run.as_row()
+
+    assert (row['ads_new'], row['ads_skipped'], row['ads_failed']) == (3, 1, 1)
+    assert row['phone_success_rate'] == 0.5 and row['bytes_in'] == 2048
+    assert (row['fetch_p50_ms'], row['fetch_p95_ms'], row['parse_p50_ms']) == (300.0, 400.0, 50.0)
+    assert row['db_rows_per_sec'] is None and 'SEMAPHORE_LIMIT' in row['config']
+    reset_transport_stats()
+
+
+def test_concurrent_runs_keep_separate_stats():
+    """Одновременные запуски в одном event loop (группы расписания, демон) не смешивают счетчики"""
+    async def run(mode, ads, delay):
+        reset_transport_stats()
+        reset_run_stats(mode)
+        await asyncio.sleep(delay)
+        # Дочерние задачи пишут в счетчики своего запуска
+        await asyncio.gather(*(asyncio.create_task(asyncio.sleep(0)) for _ in range(2)))
+        get_run_stats().record_batch(ok=ads, skipped=0, failed=0)
+        get_transport_stats('aiohttp').record_bytes(ads)
+        await asyncio.sleep(0.01)
+        row = get_run_stats().as_row()
+        return row['mode'], row['ads_new'], row['bytes_in']
+
+    async def main():
+        return await asyncio.gather(run('scrape', 5, 0.01), run('daemon', 2, 0))
+
+    assert asyncio.run(main()) == [('scrape', 5, 5), ('daemon', 2, 2)]
+
+
+def test_runs_report_shows_config_changes():
+    """Между запусками с разными настройками печатается строка с изменениями"""
+    started = datetime.datetime(2024, 5, 1, 1, 0, tzinfo=datetime.timezone.utc)
+
+    def run(hours, semaphore, new):
+        return {'mode': 'scrape', 'started_at': started + datetime.timedelta(hours=hours),
+                'finished_at': started + datetime.timedelta(hours=hours, minutes=10),
+                'pages': 5, 'ads_new': new, 'ads_failed': 0, 'phone_success_rate': None, 'bytes_in': 0,
+                'fetch_p50_ms': None, 'fetch_p95_ms': None, 'parse_p50_ms': 12.0, 'parse_p95_ms': 30.0,
+                'db_rows_per_sec': 100.0, 'config': {'SEMAPHORE_LIMIT': semaphore}}
+
+    report = format_runs_report([run(24, 4, 200), run(0, 2, 100)])
+    lines = report.splitlines()
+    assert len(lines) == 4
+    assert "10.0" in lines[1] and "20.0" in lines[3]
+    assert "SEMAPHORE_LIMIT=2->4" in lines[2]
+
+
+def test_daemon_writes_ledger_rows():
+    """Демон пишет строку журнала за каждое окно DAEMON_LEDGER_INTERVAL"""
+    rows = []
+    polls = []
+    coordinator = ShutdownCoordinator()
+
+    @asynccontextmanager
+    async def shared_session_pool():
+        yield None
+
+    async def load_known_ads_async():
+        return set()
+
+    async def collect_ad_urls_from_page(session, page_url):
+        polls.append(page_url)
+        if len(polls) == 2:
+            coordinator.request()
+        return [], None
+
+    async def record_run_async(row):
+        rows.append(row)
+
+    patched = {'shutdown': coordinator, 'shared_session_pool': shared_session_pool,
+               'load_known_ads_async': load_known_ads_async, 'collect_ad_urls_from_page': collect_ad_urls_from_page,
+               'record_run_async': record_run_async}
+    originals = {name: getattr(main, name) for name in patched}
+    config = (Config.DAEMON_LEDGER_INTERVAL, Config.DAEMON_MIN_INTERVAL, Config.DAEMON_MAX_INTERVAL, Config.DAEMON_PAGES)
+    for name, value in patched.items():
+        setattr(main, name, value)
+    Config.DAEMON_LEDGER_INTERVAL, Config.DAEMON_MIN_INTERVAL, Config.DAEMON_MAX_INTERVAL, Config.DAEMON_PAGES = 0, 0, 0, 1
+    try:
+        asyncio.run(main.poll_new_ads_async())
+    finally:
+        for name, value in originals.items():
+            setattr(main, name, value)
+        Config.DAEMON_LEDGER_INTERVAL, Config.DAEMON_MIN_INTERVAL, Config.DAEMON_MAX_INTERVAL, Config.DAEMON_PAGES = config
+
+    assert [(row['mode'], row['pages']) for row in rows] == [('daemon', 1), ('daemon', 1)]
+
+
+if __name__ == "__main__":
+    test_run_row_includes_rates_and_percentiles()
+    test_concurrent_runs_keep_separate_stats()
+    test_runs_report_shows_config_changes()
+    test_daemon_writes_ledger_rows()
+    print("✅ All run ledger tests passed")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Тесты сохранения пакетов: неудачная запись не считается сохранением
+"""
+
+import asyncio
+
+from scraper import main
+from scraper.config import Config
+from scraper.core.models import AdRecord
+from scraper.core.run_stats import get_run_stats, reset_run_stats
+from scraper.database import db_operations
+
+URLS = ["https://auto.ria.com/uk/auto_a_1.html", "https://auto.ria.com/uk/auto_b_2.html"]
+
+
+def _patch(save):
+    """Подмена парсинга, записи в БД и frontier; возвращает список URL, отмеченных сохраненными"""
+    marked = []
+
+    async def process_ad_batch(session, batch_urls, existing_ad_urls, semaphore, failures):
+        return [AdRecord(url=url) for url in batch_urls]
+
+    async def mark_saved_async(urls):
+        marked.extend(urls)
+
+    async def mark_failed_async(failures):
+        pass
+
+    main.process_ad_batch = process_ad_batch
+    main.save_data_to_postgresql_async = save
+    main.mark_saved_async = mark_saved_async
+    main.mark_failed_async = mark_failed_async
+    return marked
+
+
+def _run(save):
+    originals = {name: getattr(main, name) for name in
+                 ('process_ad_batch', 'save_data_to_postgresql_async', 'mark_saved_async', 'mark_failed_async')}
+    frontier, batch_delay = Config.FRONTIER_ENABLED, Config.BATCH_DELAY
+    Config.FRONTIER_ENABLED, Config.BATCH_DELAY = True, 0
+    main.unsaved_batches.clear()
+    try:
+        marked = _patch(save)
+
+        async def run():
+            reset_run_stats()
+            saved = await main.process_ad_urls_async(None, URLS, set(), asyncio.Semaphore(1))
+            return saved, get_run_stats().time_to_first_ad()
+
+        saved, first_ad = asyncio.run(run())
+        return saved, first_ad, marked, [ad.url for batch in main.unsaved_batches for ad in batch]
+    finally:
+        for name, value in originals.items():
+            setattr(main, name, value)
+        Config.FRONTIER_ENABLED, Config.BATCH_DELAY = frontier, batch_delay
+        main.unsaved_batches.clear()
+
+
+def test_failed_write_is_not_marked_saved():
+    """Ошибка записи: URL не отмечаются в frontier, пакет остается для повторного сохранения"""
+    async def failing_pool():
+        raise ConnectionError("connection refused")
+
+    get_db_pool_async = db_operations.get_db_pool_async
+    db_operations.get_db_pool_async = failing_pool
+    try:
+        # Настоящая функция записи: ошибка подключения должна дойти до вызывающего кода
+        saved, first_ad, marked, unsaved = _run(db_operations.save_data_to_postgresql_async)
+    finally:
+        db_operations.get_db_pool_async = get_db_pool_async
+    assert saved == 0 and first_ad is None
+    assert marked == []
+    assert unsaved == URLS
+
+
+def test_successful_write_is_marked_saved():
+    """Успешная запись отмечает URL и освобождает пакет"""
+    async def save(records):
+        pass
+
+    saved, first_ad, marked, unsaved = _run(save)
+    assert saved == 2 and first_ad is not None
+    assert marked == URLS and unsaved == []
+
+
+if __name__ == "__main__":
+    test_failed_write_is_not_marked_saved()
+    test_successful_write_is_marked_saved()
+    print("✅ All saving tests passed")
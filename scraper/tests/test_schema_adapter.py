@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Тесты SchemaAdapter: проекция AdRecord в строки UPSERT для новой и старой раскладки колонок
+"""
+
+import asyncio
+import datetime
+
+from scraper.core.models import AdRecord
+from scraper.database import db_operations
+from scraper.database import snapshots
+from scraper.database.db_operations import DuplicateAdsError, SchemaAdapter
+
+NEW_COLUMNS = {'url': 'text', 'price_usd': 'integer', 'ad_key': 'bigint'}
+LEGACY_COLUMNS = {'url': 'text', 'price': 'integer', 'phones': 'text'}
+
+
+def test_new_layout_groups_by_conflict_column_and_dedupes():
+    """Строки с id в URL идут с конфликтом по ad_key, без id - по url; повтор объявления схлопывается в последний"""
+    schema = SchemaAdapter(NEW_COLUMNS)
+    now = datetime.datetime.now()
+    first = AdRecord(url="https://auto.ria.com/uk/auto_bmw_x6_38365738.html", price_usd=38000)
+    again = AdRecord(url="https://auto.ria.com/auto_bmw_x6_38365738.html", price_usd=37500)
+    no_id = AdRecord(url="https://auto.ria.com/uk/newauto/bmw-x6.html", price_usd=90000)
+    rows = schema.project([first, no_id, again], now)
+    assert schema.writes_snapshots and set(rows) == {'ad_key', 'url'}
+    assert len(rows['ad_key']) == 1 and rows['ad_key'][0][2] == 37500
+    assert len(rows['ad_key'][0]) == 17 and rows['url'][0][-1] is None
+    assert "ON CONFLICT (ad_key)" in schema.async_sql['ad_key'] and "$17" in schema.async_sql['ad_key']
+    assert "VALUES %s" in schema.batch_sql['url']
+
+
+def test_legacy_layout_maps_columns():
+    """Старая раскладка: 11 колонок, телефон строкой, без снимков"""
+    schema = SchemaAdapter(LEGACY_COLUMNS)
+    now = datetime.datetime.now()
+    ad = AdRecord(url="https://auto.ria.com/uk/auto_bmw_x6_38365738.html", price_usd=38000, phone_number=380671234567)
+    rows = schema.project([ad], now)
+    assert not schema.writes_snapshots and list(rows) == ['url']
+    assert rows['url'] == [(ad.url, None, 38000, None, None, "380671234567", None, None, None, None, now)]
+    assert "mileage" in schema.async_sql['url'] and "$11" in schema.async_sql['url']
+
+
+class FakeMigrationConn:
+    """Соединение asyncpg для миграции ad_key: таблица с дублями одного объявления"""
+
+    def __init__(self, mark=None):
+        self.mark = mark
+        self.duplicates = [{'key': 38000001, 'urls': ["https://auto.ria.com/auto_bmw_x5_38000001.html",
+                                                      "https://auto.ria.com/uk/auto_bmw_x5_38000001.html"]}]
+        self.executed = []
+
+    async def fetch(self, sql):
+        if sql == db_operations.DUPLICATE_AD_KEYS_SQL:
+            return self.duplicates
+        if sql == db_operations.DELETE_DUPLICATE_ADS_SQL:
+            removed, self.duplicates = self.duplicates, []
+            return [{'url': group['urls'][0], 'kept_url': group['urls'][1]} for group in removed]
+        return [{'column_name': name, 'data_type': kind} for name, kind in NEW_COLUMNS.items()] + \
+            [{'column_name': name, 'data_type': 'text'} for name in ('first_seen', 'phone_hash', 'datetime_found')]
+
+    async def fetchval(self, sql):
+        assert sql == db_operations.AD_KEY_STATE_SQL
+        return self.mark
+
+    async def execute(self, sql):
+        self.executed.append(sql)
+        if sql == db_operations.MARK_AD_KEY_INDEX_SQL:
+            self.mark = db_operations.AD_KEY_MARK
+
+    def transaction(self):
+        conn = self
+
+        class Transaction:
+            async def __aenter__(self):
+                return conn
+
+            async def __aexit__(self, exc_type, exc, tb):
+                return False
+        return Transaction()
+
+
+def test_ad_key_migration_refuses_to_drop_duplicates():
+    """Без --dedupe merge миграция не удаляет строки, а останавливается с описанием дублей"""
+    conn = FakeMigrationConn()
+    try:
+        asyncio.run(db_operations.ensure_ads_table_async(conn))
+        assert False, "DuplicateAdsError expected"
+    except DuplicateAdsError as e:
+        assert "--dedupe merge" in str(e) and "auto_bmw_x5_38000001" in str(e)
+    assert db_operations.FILL_AD_KEY_SQL not in conn.executed
+    assert db_operations.GROUP_DUPLICATE_ADS_SQL not in conn.executed
+
+
+def test_ad_key_migration_merges_on_request_and_then_skips_scan():
+    """--dedupe merge сливает дубли и ставит отметку; при следующем запуске таблица не сканируется"""
+    conn = FakeMigrationConn()
+    asyncio.run(db_operations.ensure_ads_table_async(conn, merge_duplicates=True))
+    assert db_operations.FILL_AD_KEY_SQL in conn.executed and conn.mark == db_operations.AD_KEY_MARK
+
+    conn.executed.clear()
+    conn.duplicates = None  # полная проверка таблицы не должна выполняться
+    asyncio.run(db_operations.ensure_ads_table_async(conn))
+    assert db_operations.FILL_AD_KEY_SQL not in conn.executed
+    assert db_operations.CREATE_AD_KEY_INDEX_SQL in conn.executed
+
+
+def test_snapshot_rows_dedupe_repeated_ads():
+    """Повторы объявления в пакете дают один снимок - последнюю версию, как и UPSERT"""
+    ads = [AdRecord(url="https://auto.ria.com/uk/auto_bmw_x5_38000001.html", price_usd=30000),
+           AdRecord(url="https://auto.ria.com/auto_bmw_x5_38000001.html?utm=1", price_usd=29500),
+           AdRecord(url="https://auto.ria.com/uk/legacy-without-id", price_usd=1000),
+           AdRecord(url="https://auto.ria.com/uk/legacy-without-id", price_usd=900)]
+    urls, prices, _, _, keys = snapshots._snapshot_arrays(ads)
+    assert prices == [29500, 900] and keys == [38000001, None]
+    assert urls == [ads[1].url, ads[3].url]
+
+
+def test_snapshot_partitions_retry_in_own_transaction():
+    """Ошибка гонки при создании секции повторяется, секции создаются на текущий и следующий месяц"""
+    class RacingConn(FakeMigrationConn):
+        failures = 1
+
+        async def execute(self, sql):
+            if 'PARTITION OF' in sql and 'FOR VALUES' in sql and self.failures:
+                self.failures -= 1
+                raise RuntimeError('duplicate key value violates unique constraint "pg_type_typname_nsp_index"')
+            self.executed.append(sql)
+
+    conn = RacingConn()
+    snapshots._ensured_months.clear()
+    asyncio.run(snapshots.ensure_snapshot_partitions_async(conn, datetime.datetime(2026, 12, 20)))
+    created = [sql for sql in conn.executed if 'FOR VALUES' in sql]
+    assert [sql.split()[5] for sql in created] == ['auto_ria_ad_snapshots_2026_12', 'auto_ria_ad_snapshots_2027_01']
+
+    conn.executed.clear()
+    asyncio.run(snapshots.ensure_snapshot_partitions_async(conn, datetime.datetime(2026, 12, 21)))
+    assert conn.executed == []
+    snapshots._ensured_months.clear()
+
+
+if __name__ == "__main__":
+    test_new_layout_groups_by_conflict_column_and_dedupes()
+    test_legacy_layout_maps_columns()
+    test_ad_key_migration_refuses_to_drop_duplicates()
+    test_ad_key_migration_merges_on_request_and_then_skips_scan()
+    test_snapshot_rows_dedupe_repeated_ads()
+    test_snapshot_partitions_retry_in_own_transaction()
+    print("✅ All schema adapter tests passed")
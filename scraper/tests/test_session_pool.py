@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Тесты пула HTTP сессий (распределение запросов, замена заблокированных сессий)
+"""
+
+import asyncio
+
+from scraper.config import Config
+from scraper.core.session_pool import SessionPool
+
+
+class FakeCookieJar(dict):
+    def update_cookies(self, cookies):
+        self.update(cookies)
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+    async def read(self):
+        return b''
+
+
+class FakeRequest:
+    def __init__(self, session):
+        self._session = session
+
+    async def __aenter__(self):
+        self._session.requests += 1
+        if self._session.hang:
+            await asyncio.Event().wait()
+        return FakeResponse(self._session.status)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class FakeSession:
+    """Сессия, которая на все запросы отвечает заданным статусом"""
+
+    statuses = []
+    hang = False
+
+    def __init__(self):
+        self.status = FakeSession.statuses.pop(0) if FakeSession.statuses else 200
+        self.cookie_jar = FakeCookieJar()
+        self.requests = 0
+        self.closed = False
+
+    def get(self, url, **kwargs):
+        return FakeRequest(self)
+
+    async def close(self):
+        self.closed = True
+
+
+async def _fetch(pool, count):
+    for _ in range(count):
+        async with pool.get("https://auto.ria.com/uk/car/used/"):
+            pass
+
+
+def test_requests_spread_across_sessions():
+    """Запросы распределяются по всем сессиям, у каждой свои cookies"""
+    Config.SESSION_WARMUP_URL = ""
+
+    async def run():
+        FakeSession.statuses = []
+        async with SessionPool(3, session_factory=FakeSession) as pool:
+            await asyncio.gather(*(_fetch(pool, 1) for _ in range(6)))
+            return [member.session for member in pool.members]
+
+    sessions = asyncio.run(run())
+    assert [session.requests for session in sessions] == [2, 2, 2]
+    assert all(session.cookie_jar.get('chk') == '1' for session in sessions)
+    assert all('PHPSESSID' not in session.cookie_jar for session in sessions)
+
+
+def test_blocked_session_is_replaced():
+    """Сессия с ответами 429 подряд выводится из пула и закрывается"""
+    Config.SESSION_WARMUP_URL = ""
+    Config.SESSION_RETIRE_AFTER = 2
+
+    async def run():
+        FakeSession.statuses = [429]
+        async with SessionPool(1, session_factory=FakeSession) as pool:
+            await _fetch(pool, 4)
+            return pool
+
+    pool = asyncio.run(run())
+    assert len(pool.retired) == 1 and pool.retired[0].session.closed
+    assert pool.retired[0].requests == 2
+    assert len(pool.members) == 1 and pool.members[0].requests == 2
+
+
+def test_warm_connections_opens_parallel_requests():
+    """Прогрев делает per_session одновременных запросов к каждому URL в каждой сессии"""
+    Config.SESSION_WARMUP_URL = ""
+
+    async def run():
+        FakeSession.statuses = []
+        async with SessionPool(2, session_factory=FakeSession) as pool:
+            await pool.warm_connections(["https://auto.ria.com/robots.txt"], 3)
+            return [member.session.requests for member in pool.members]
+
+    assert asyncio.run(run()) == [3, 3]
+
+
+def test_cancelled_request_releases_session():
+    """Отмена задачи во время запроса не оставляет занятый слот сессии"""
+    Config.SESSION_WARMUP_URL = ""
+
+    async def run():
+        FakeSession.statuses = []
+        FakeSession.hang = True
+        try:
+            async with SessionPool(1, session_factory=FakeSession) as pool:
+                task = asyncio.create_task(_fetch(pool, 1))
+                await asyncio.sleep(0.01)
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                return pool.members[0].in_flight
+        finally:
+            FakeSession.hang = False
+
+    assert asyncio.run(run()) == 0
+
+
+if __name__ == "__main__":
+    test_requests_spread_across_sessions()
+    test_blocked_session_is_replaced()
+    test_warm_connections_opens_parallel_requests()
+    test_cancelled_request_releases_session()
+    print("✅ All session pool tests passed")
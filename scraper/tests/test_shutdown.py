@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Тесты остановки (прерывание пауз обхода, ожидание и отмена заданий по дедлайну)
+"""
+
+import asyncio
+import signal
+
+from scraper.core.shutdown import ShutdownCoordinator
+
+
+def test_request_interrupts_sleep():
+    """Пауза между страницами прерывается запросом остановки"""
+    async def run():
+        shutdown = ShutdownCoordinator()
+        asyncio.get_running_loop().call_later(0.05, shutdown.request)
+        stopped = await shutdown.sleep(10)
+        return stopped, shutdown.stopping
+
+    assert asyncio.run(run()) == (True, True)
+
+
+def test_drain_waits_for_jobs_then_cancels_after_deadline():
+    """Короткое задание дообрабатывается, долгое отменяется по истечении дедлайна"""
+    finished = []
+
+    async def page_job(seconds):
+        await asyncio.sleep(seconds)
+        finished.append(seconds)
+
+    async def run():
+        shutdown = ShutdownCoordinator()
+        tasks = [asyncio.create_task(shutdown.job(page_job)(seconds)) for seconds in (0.05, 5)]
+        await asyncio.sleep(0)
+        shutdown.request()
+        cancelled = await shutdown.drain(0.3)
+        return cancelled, tasks[1].cancelled()
+
+    assert asyncio.run(run()) == (1, True)
+    assert finished == [0.05]
+
+
+def test_install_falls_back_to_signal_signal():
+    """Без add_signal_handler (Windows) сигнал ставится через signal.signal и доходит до event loop"""
+    class WindowsLoop:
+        def __init__(self, loop):
+            self._loop = loop
+
+        def add_signal_handler(self, signum, callback, *args):
+            raise NotImplementedError
+
+        def call_soon_threadsafe(self, callback, *args):
+            return self._loop.call_soon_threadsafe(callback, *args)
+
+    previous = {signum: signal.getsignal(signum) for signum in (signal.SIGINT, signal.SIGTERM)}
+
+    async def run():
+        shutdown = ShutdownCoordinator()
+        shutdown.install(WindowsLoop(asyncio.get_running_loop()))
+        signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+        stopped = await shutdown.sleep(1)
+        return stopped, shutdown.signum
+
+    try:
+        assert asyncio.run(run()) == (True, signal.SIGTERM)
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+if __name__ == "__main__":
+    test_request_interrupts_sleep()
+    test_drain_waits_for_jobs_then_cancels_after_deadline()
+    test_install_falls_back_to_signal_signal()
+    print("✅ All shutdown tests passed")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Тесты извлечения полей объявления из JSON-LD разметки (без сетевых запросов)
+"""
+
+from scraper.core.structured_data import extract_structured_ad_data
+
+SAMPLE_HTML = """
+<html><head>
+<script type="application/ld+json">{"@context": "https://schema.org", "@type": "BreadcrumbList", "itemListElement": []}</script>
+<script type="application/ld+json">
+{"@context": "https://schema.org", "@graph": [
+  {"@type": ["Product", "Car"], "name": "BMW X6 2019",
+   "offers": {"@type": "Offer", "price": "38500", "priceCurrency": "USD"},
+   "mileageFromOdometer": {"@type": "QuantitativeValue", "value": 95000, "unitCode": "KMT"},
+   "vehicleIdentificationNumber": "WBAKV610X00Z12345",
+   "image": ["https://cdn.riastatic.com/photosnew/auto/photo/bmw_x6__1.jpg",
+             {"@type": "ImageObject", "contentUrl": "https://cdn.riastatic.com/photosnew/auto/photo/bmw_x6__2.jpg"}]}
+]}
+</script>
+</head><body><h1>BMW X6</h1></body></html>
+"""
+
+
+def test_extract_vehicle_fields():
+    """Все поля берутся из JSON-LD узла с типом Car/Product"""
+    data = extract_structured_ad_data(SAMPLE_HTML)
+    assert data["title"] == "BMW X6 2019"
+    assert data["price_usd"] == 38500
+    assert data["odometer"] == 95000
+    assert data["car_vin"] == "WBAKV610X00Z12345"
+    assert data["image_url"].endswith("bmw_x6__1.jpg")
+    assert data["images_count"] == 2
+
+
+def test_non_usd_price_and_missing_markup():
+    """Цена не в USD пропускается, страница без разметки дает пустой результат"""
+    html = ('<script type="application/ld+json">'
+            '{"@type": "Car", "name": "Kia Rio", "offers": {"price": 500000, "priceCurrency": "UAH"}}'
+            '</script>')
+    data = extract_structured_ad_data(html)
+    assert data == {"title": "Kia Rio"}
+    assert extract_structured_ad_data("<html><body>no data</body></html>") == {}
+
+
+if __name__ == "__main__":
+    test_extract_vehicle_fields()
+    test_non_usd_price_and_missing_markup()
+    print("✅ Structured data tests passed")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Тесты HTTP/2 транспорта на httpx (интерфейс ответа как у aiohttp)
+"""
+
+import asyncio
+import gzip
+
+import httpx
+
+from scraper.config import Config
+from scraper.core.scraper_core import LISTING_STOP_RE, fetch_ad_page_with_status, fetch_html_until
+from scraper.core.transport import HttpxSession, current_transport_stats, reset_transport_stats, response_wire_bytes
+
+AD_URL = "https://auto.ria.com/uk/auto_bmw_x5_38000001.html"
+LISTING_URL = "https://auto.ria.com/uk/search/?categories.main.id=1"
+
+
+def _session(handler):
+    session = HttpxSession()
+    session._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=True)
+    return session
+
+
+async def _fetch(handler):
+    reset_transport_stats()
+    async with _session(handler) as session:
+        return await fetch_ad_page_with_status(session, AD_URL)
+
+
+def test_httpx_redirect_to_listing_means_sold():
+    """Редирект со страницы объявления на поиск под httpx определяется как снятое объявление"""
+    def handler(request):
+        if str(request.url) == AD_URL:
+            return httpx.Response(302, headers={'Location': LISTING_URL})
+        return httpx.Response(200, text="<html>search</html>")
+
+    assert asyncio.run(_fetch(handler)) == (410, None)
+
+
+def test_httpx_ad_page_is_returned():
+    """Страница объявления без редиректа возвращается с телом"""
+    def handler(request):
+        return httpx.Response(200, text="<html>ad</html>")
+
+    assert asyncio.run(_fetch(handler)) == (200, "<html>ad</html>")
+
+
+def test_httpx_counts_compressed_bytes():
+    """Входящие байты - сжатое тело на проводе, а не распакованный HTML"""
+    html = "<html>" + "объявление " * 2000 + "</html>"
+    compressed = gzip.compress(html.encode('utf-8'))
+
+    class NetworkStream(httpx.AsyncByteStream):
+        # Как тело из сети: читается потоком (готовый content httpx считает уже скачанным)
+        async def __aiter__(self):
+            yield compressed
+
+    def handler(request):
+        return httpx.Response(200, stream=NetworkStream(),
+                              headers={'Content-Encoding': 'gzip', 'Content-Type': 'text/html; charset=utf-8'})
+
+    async def run():
+        status, body = await _fetch(handler)
+        return status, body, current_transport_stats()['httpx'].bytes_in
+
+    status, body, bytes_in = asyncio.run(run())
+    assert (status, body) == (200, html)
+    assert bytes_in == len(compressed) < len(html.encode('utf-8'))
+
+
+def test_wire_bytes_without_raw_counter():
+    """Старый aiohttp без счетчика сжатых байт: Content-Length для целого тела, иначе распакованный объем"""
+    class Response:
+        def __init__(self, encoding, content_length):
+            self.headers = {'Content-Encoding': encoding} if encoding else {}
+            self.content_length = content_length
+            self.content = object()
+
+    assert response_wire_bytes(Response('gzip', 900), 5000) == 900
+    assert response_wire_bytes(Response('gzip', 900), 2000, complete=False) == 2000
+    assert response_wire_bytes(Response(None, None), 5000) == 5000
+
+
+class ChunkStream(httpx.AsyncByteStream):
+    """Тело из сети кусками; consumed - сколько кусков успели прочитать"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.consumed = 0
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+
+async def _stream(stream, headers):
+    reset_transport_stats()
+    async with _session(lambda request: httpx.Response(200, stream=stream, headers=headers)) as session:
+        return await fetch_html_until(session, LISTING_URL, LISTING_STOP_RE)
+
+
+def test_stream_detects_meta_charset():
+    """Без charset в Content-Type кодировка берется из <meta charset>, а не жестко utf-8"""
+    html = '<html><head><meta charset="windows-1251"></head><body>Київ <a class="page-link js-next" href="?page=2">'
+    stream = ChunkStream([html.encode('cp1251')])
+
+    assert asyncio.run(_stream(stream, {'Content-Type': 'text/html'})) == html
+
+
+def test_stream_drains_small_remainder():
+    """Небольшой остаток после маркера дочитывается (соединение вернется в пул), большой - нет"""
+    head = b'<html><a class="page-link js-next" href="?page=2">'
+    original_limit = Config.STREAM_DRAIN_LIMIT
+    try:
+        Config.STREAM_DRAIN_LIMIT = 100000
+        small = ChunkStream([head, b'x' * 20000, b'</html>'])
+        html = asyncio.run(_stream(small, {'Content-Type': 'text/html; charset=utf-8'}))
+        assert html.startswith(head.decode()) and '</html>' not in html
+        assert small.consumed == 3
+
+        large = ChunkStream([head] + [b'x' * 60000] * 10)
+        asyncio.run(_stream(large, {'Content-Type': 'text/html; charset=utf-8'}))
+        assert large.consumed < 11
+
+        Config.STREAM_DRAIN_LIMIT = 0
+        closed = ChunkStream([head, b'x' * 20000, b'</html>'])
+        asyncio.run(_stream(closed, {'Content-Type': 'text/html; charset=utf-8'}))
+        assert closed.consumed < 3
+    finally:
+        Config.STREAM_DRAIN_LIMIT = original_limit
+
+
+if __name__ == "__main__":
+    test_httpx_redirect_to_listing_means_sold()
+    test_httpx_ad_page_is_returned()
+    test_httpx_counts_compressed_bytes()
+    test_wire_bytes_without_raw_counter()
+    test_stream_detects_meta_charset()
+    test_stream_drains_small_remainder()
+    print("✅ All transport tests passed")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Тесты автоподбора параметров (поиск по пробным обходам, запись в .env)
+"""
+
+import asyncio
+import os
+import tempfile
+
+from scraper import main
+from scraper.config import Config
+from scraper.core.tuning import ProbeResult, greedy_search, update_env_file
+
+
+def test_greedy_search_stops_at_error_threshold():
+    """Параллельность растет, пока доля ошибок в пределах лимита; задержки уменьшаются"""
+    space = {'SEMAPHORE_LIMIT': [2, 3, 4, 6], 'BATCH_DELAY': [2.0, 1.0, 0.0]}
+    probed = []
+
+    async def probe(params):
+        probed.append(params)
+        semaphore, delay = params['SEMAPHORE_LIMIT'], params['BATCH_DELAY']
+        # С 6 одновременными запросами сайт начинает отвечать 429
+        errors = 20 if semaphore >= 6 else 0
+        return ProbeResult(params, ads=semaphore * 10, attempted=100, failed=0,
+                           requests=100, errors=errors, seconds=60 * (1 + delay))
+
+    best, results = asyncio.run(greedy_search({'SEMAPHORE_LIMIT': 2, 'BATCH_DELAY': 2.0}, probe, space=space))
+    assert best.params == {'SEMAPHORE_LIMIT': 4, 'BATCH_DELAY': 0.0}
+    assert [params['SEMAPHORE_LIMIT'] for params in probed] == [2, 3, 4, 6, 4, 4]
+    assert len(results) == 6
+
+
+def test_update_env_file_replaces_and_appends():
+    """Существующие ключи заменяются на месте, остальные строки сохраняются"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, '.env')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("PG_HOST=localhost\nSEMAPHORE_LIMIT=2\n")
+        update_env_file(path, {'SEMAPHORE_LIMIT': 4, 'BATCH_DELAY': 0.5})
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    assert lines[:2] == ["PG_HOST=localhost", "SEMAPHORE_LIMIT=4"]
+    assert lines[-1] == "BATCH_DELAY=0.5"
+
+
+def test_probe_skips_phone_api_and_restores_config():
+    """Проба идет без запросов телефонов, а Config после нее возвращается к исходным значениям"""
+    seen = []
+
+    class FakePool:
+        members, retired = [], []
+
+        def __init__(self, size):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+    async def collect_ad_urls_from_page(session, page_url):
+        return ["https://auto.ria.com/uk/auto_a_1.html"], None
+
+    async def process_ad_batch(session, batch_urls, existing_ad_urls, semaphore, failures):
+        seen.append((Config.PHONE_ENRICHMENT, Config.SEMAPHORE_LIMIT))
+        return []
+
+    originals = {name: getattr(main, name) for name in ('SessionPool', 'collect_ad_urls_from_page', 'process_ad_batch')}
+    config = (Config.PHONE_ENRICHMENT, Config.SEMAPHORE_LIMIT, Config.TUNE_PAGES, Config.BATCH_DELAY)
+    main.SessionPool, main.collect_ad_urls_from_page, main.process_ad_batch = FakePool, collect_ad_urls_from_page, process_ad_batch
+    Config.PHONE_ENRICHMENT, Config.SEMAPHORE_LIMIT, Config.TUNE_PAGES, Config.BATCH_DELAY = 'inline', 2, 1, 0
+    try:
+        asyncio.run(main.run_tune_probe_async({'SEMAPHORE_LIMIT': 6}))
+        assert seen == [('deferred', 6)]
+        assert (Config.PHONE_ENRICHMENT, Config.SEMAPHORE_LIMIT) == ('inline', 2)
+    finally:
+        for name, value in originals.items():
+            setattr(main, name, value)
+        Config.PHONE_ENRICHMENT, Config.SEMAPHORE_LIMIT, Config.TUNE_PAGES, Config.BATCH_DELAY = config
+
+
+if __name__ == "__main__":
+    test_greedy_search_stops_at_error_threshold()
+    test_update_env_file_replaces_and_appends()
+    test_probe_skips_phone_api_and_restores_config()
+    print("✅ All tuning tests passed")
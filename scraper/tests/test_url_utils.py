@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Тесты построения URL страниц листинга для шардов и ключей объявлений
+"""
+
+from scraper.core.url_utils import AdKeySet, ad_key, listing_page_url
+
+
+def test_listing_page_url_keeps_filters():
+    """Номер страницы заменяется, фильтры поиска сохраняются"""
+    url = "https://auto.ria.com/uk/search/?categories.main.id=1&page=3&size=20"
+    result = listing_page_url(url, 7)
+    assert "categories.main.id=1" in result
+    assert "size=20" in result
+    assert "page=7" in result and "page=3" not in result
+    assert listing_page_url("https://auto.ria.com/uk/car/used/", 2) == "https://auto.ria.com/uk/car/used/?page=2"
+
+
+def test_ad_key_ignores_url_spelling():
+    """Разные написания URL одного объявления дают один ключ, newauto - отрицательный"""
+    assert ad_key("https://auto.ria.com/uk/auto_audi_a4_35123456.html") == 35123456
+    assert ad_key("/auto_audi_a4_35123456.html?utm_source=list") == 35123456
+    assert ad_key("https://auto.ria.com/uk/newauto/auto-skoda-octavia-2034567.html") == -2034567
+    assert ad_key("https://auto.ria.com/uk/car/used/") is None
+    # Объявления автосалонов - свой диапазон ключей, не пересекается с newauto и б/у
+    assert ad_key("https://auto.ria.com/uk/auto-skoda-octavia-2034567.html") == -(10 ** 12 + 2034567)
+    assert ad_key("/auto-skoda-octavia-2034567.html?from=salon") == ad_key("https://auto.ria.com/auto-skoda-octavia-2034567.html")
+
+    known = AdKeySet(["https://auto.ria.com/uk/auto_audi_a4_35123456.html", "https://auto.ria.com/uk/car/used/"])
+    assert "https://auto.ria.com/auto_audi_a4_35123456.html#photo" in known
+    assert "https://auto.ria.com/uk/car/used/" in known
+    assert "https://auto.ria.com/uk/newauto/auto-audi-a4-35123456.html" not in known
+
+
+if __name__ == "__main__":
+    test_listing_page_url_keeps_filters()
+    test_ad_key_ignores_url_spelling()
+    print("✅ URL utils tests passed")